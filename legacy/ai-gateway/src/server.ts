@@ -1,7 +1,7 @@
 import Fastify from 'fastify';
 import cors from '@fastify/cors';
 import { config as loadEnv } from 'dotenv';
-import { generateText, CoreMessage } from 'ai';
+import { generateText, streamText, CoreMessage } from 'ai';
 import { createOpenAI } from '@ai-sdk/openai';
 import { createAnthropic } from '@ai-sdk/anthropic';
 import { z } from 'zod';
@@ -51,6 +51,59 @@ fastify.get('/health', async () => {
   };
 });
 
+type ChatRequest = z.infer<typeof requestSchema>;
+
+function resolveModel(provider: ChatRequest['provider'], model: string) {
+  if (provider === 'openai') {
+    if (!openaiProvider) {
+      throw new Error('OpenAI provider not configured.');
+    }
+    return openaiProvider(model);
+  }
+
+  if (provider === 'anthropic') {
+    if (!anthropicProvider) {
+      throw new Error('Anthropic provider not configured.');
+    }
+    return anthropicProvider(model);
+  }
+
+  throw new Error(`Unsupported provider: ${provider}`);
+}
+
+function buildGenerateOptions({ model, provider, messages, maxTokens, temperature }: ChatRequest) {
+  const coreMessages: CoreMessage[] = messages.map((msg) => ({
+    role: msg.role,
+    content: msg.content,
+  }));
+
+  // Build the generateText options
+  const generateOptions: any = {
+    model: resolveModel(provider, model),
+    messages: coreMessages,
+  };
+
+  // Only add maxTokens if provided
+  if (maxTokens !== undefined) {
+    generateOptions.maxTokens = maxTokens;
+  }
+
+  // Only add temperature if provided AND if not using gpt-5
+  // gpt-5 models only support default temperature
+  const isGpt5Model = model.includes('gpt-5');
+  if (temperature !== undefined && !isGpt5Model) {
+    generateOptions.temperature = temperature;
+  }
+
+  return generateOptions;
+}
+
+function providerErrorStatus(error: unknown): number {
+  // Pass provider rate limits / outages through so callers can back off
+  const statusCode = (error as { statusCode?: unknown })?.statusCode;
+  return typeof statusCode === 'number' && statusCode >= 400 ? statusCode : 500;
+}
+
 fastify.post('/v1/chat/completions', async (request, reply) => {
   const parseResult = requestSchema.safeParse(request.body);
 
@@ -62,51 +115,8 @@ fastify.post('/v1/chat/completions', async (request, reply) => {
     };
   }
 
-    const { model, provider, messages, maxTokens, temperature } = parseResult.data;
-
   try {
-    const coreMessages: CoreMessage[] = messages.map((msg) => ({
-      role: msg.role,
-      content: msg.content,
-    }));
-
-    const resolvedModel = (() => {
-      if (provider === 'openai') {
-        if (!openaiProvider) {
-          throw new Error('OpenAI provider not configured.');
-        }
-        return openaiProvider(model);
-      }
-
-      if (provider === 'anthropic') {
-        if (!anthropicProvider) {
-          throw new Error('Anthropic provider not configured.');
-        }
-        return anthropicProvider(model);
-      }
-
-      throw new Error(`Unsupported provider: ${provider}`);
-    })();
-
-    // Build the generateText options
-    const generateOptions: any = {
-      model: resolvedModel,
-      messages: coreMessages,
-    };
-
-    // Only add maxTokens if provided
-    if (maxTokens !== undefined) {
-      generateOptions.maxTokens = maxTokens;
-    }
-
-    // Only add temperature if provided AND if not using gpt-5
-    // gpt-5 models only support default temperature
-    const isGpt5Model = model.includes('gpt-5');
-    if (temperature !== undefined && !isGpt5Model) {
-      generateOptions.temperature = temperature;
-    }
-
-    const result = await generateText(generateOptions);
+    const result = await generateText(buildGenerateOptions(parseResult.data));
 
     return {
       message: {
@@ -120,7 +130,7 @@ fastify.post('/v1/chat/completions', async (request, reply) => {
     };
   } catch (error) {
     request.log.error(error);
-    reply.code(500);
+    reply.code(providerErrorStatus(error));
 
     if (error instanceof Error) {
       return {
@@ -136,6 +146,64 @@ fastify.post('/v1/chat/completions', async (request, reply) => {
   }
 });
 
+// Server-sent events: one `{"delta": "..."}` event per text chunk, then a final
+// `{"done": true, ...}` event (or `{"error": ...}` if the provider fails mid-stream).
+fastify.post('/v1/chat/completions/stream', async (request, reply) => {
+  const parseResult = requestSchema.safeParse(request.body);
+
+  if (!parseResult.success) {
+    reply.code(400);
+    return {
+      error: 'invalid_request',
+      message: parseResult.error.message,
+    };
+  }
+
+  let generateOptions: any;
+  try {
+    generateOptions = buildGenerateOptions(parseResult.data);
+  } catch (error) {
+    request.log.error(error);
+    reply.code(500);
+    return {
+      error: 'provider_error',
+      message: error instanceof Error ? error.message : 'Unknown error while generating text.',
+    };
+  }
+
+  reply.hijack();
+  reply.raw.writeHead(200, {
+    'Content-Type': 'text/event-stream',
+    'Cache-Control': 'no-cache',
+    Connection: 'keep-alive',
+  });
+
+  const send = (data: unknown) => reply.raw.write(`data: ${JSON.stringify(data)}\n\n`);
+
+  try {
+    const result = streamText(generateOptions);
+
+    for await (const delta of result.textStream) {
+      send({ delta });
+    }
+
+    send({
+      done: true,
+      finishReason: await result.finishReason,
+      usage: await result.usage,
+    });
+  } catch (error) {
+    request.log.error(error);
+    send({
+      error: 'provider_error',
+      status: providerErrorStatus(error),
+      message: error instanceof Error ? error.message : 'Unknown error while generating text.',
+    });
+  } finally {
+    reply.raw.end();
+  }
+});
+
 try {
   await fastify.listen({ port: PORT, host: '0.0.0.0' });
   fastify.log.info(`AI Gateway listening on port ${PORT}`);
@@ -1,11 +1,25 @@
+import os
 import json
-from typing import List, Dict, Any
+import asyncio
+import functools
+from typing import List, Dict, Any, AsyncIterator, Awaitable, Callable, Optional
 from models import HouseholdProfile, HouseholdMember, CookingSkill, DietaryRestriction
 from services.recipe_service import RecipeService
-from services.llm_gateway import chat_completion
+from services.meal_planning_service import MEAL_PLAN_CONCURRENCY, MEAL_PLAN_DAY_TIMEOUT
+from services.llm_gateway import chat_completion, chat_completion_stream
+from services.llm_cache import EXTRACTION_CACHE
+from services.llm_scheduler import Priority, priority_scope
+from services.concurrency import run_bounded
+from services.history_compaction import RollingSummary, compact_history
+from services.structured_output import OutputSchema, StructuredOutputError, parse_structured, request_structured
+from services import metrics
 
 recipe_service = RecipeService()
 
+# One gateway call per chat turn returns the reply, the completion flag and the
+# structured data together, instead of a chat call plus an extraction call
+CHAT_COMBINED_TURNS = os.getenv("CHAT_COMBINED_TURNS", "false").lower() == "true"
+
 ONBOARDING_SYSTEM_PROMPT = """
 You are a friendly assistant for a meal planning app. Conduct a personal 4-question onboarding to learn about the user and their household.
 
@@ -87,6 +101,13 @@ Return ONLY valid JSON with no additional text:
 }
 """
 
+ONBOARDING_DRAFT_PROMPT = DATA_EXTRACTION_SYSTEM_PROMPT + """
+INCREMENTAL MODE:
+The conversation is still in progress. You are given the profile extracted so far (JSON, possibly empty) and the
+newest messages. Return the complete updated profile in the same JSON format: keep what is already there, add or
+correct only what the new messages say. Use null for cooking_skill and empty arrays for anything not mentioned yet.
+"""
+
 # ========== THREE-AGENT MEAL PLANNING ARCHITECTURE ==========
 
 INTERFACE_AGENT_PROMPT = """
@@ -174,6 +195,25 @@ Return ONLY valid JSON:
 }
 """
 
+WEEK_DAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+
+def _check_onboarding_profile(profile: Dict[str, Any]) -> None:
+    if not profile["members"]:
+        raise ValueError("profile has no household members")
+    if not profile["cooking_skill"]:
+        raise ValueError("profile has no cooking_skill")
+
+def _check_weekly_menu(menu: Dict[str, Any]) -> None:
+    blank = [day for day in WEEK_DAYS if not menu[day].strip()]
+    if blank:
+        raise ValueError(f"menu has no meal for {', '.join(blank)}")
+
+# Expected JSON from each agent (see services/structured_output.py)
+ONBOARDING_PROFILE_SCHEMA = OutputSchema("onboarding_profile", {"members": (list,), "cooking_skill": (str,)}, _check_onboarding_profile)
+ONBOARDING_DRAFT_SCHEMA = OutputSchema("onboarding_draft")
+WEEKLY_CONSTRAINTS_SCHEMA = OutputSchema("weekly_constraints", {day: (dict,) for day in WEEK_DAYS})
+WEEKLY_MENU_SCHEMA = OutputSchema("weekly_menu", {day: (str,) for day in WEEK_DAYS}, _check_weekly_menu)
+
 async def extract_onboarding_data(chat_history: List[Dict[str, str]]) -> Dict[str, Any]:
     """Extract structured data from completed onboarding conversation"""
 
@@ -188,20 +228,40 @@ async def extract_onboarding_data(chat_history: List[Dict[str, str]]) -> Dict[st
         {"role": "user", "content": f"Extract data from this conversation:\n\n{conversation_text}"}
     ]
 
-    response = await chat_completion(
-        messages=messages,
+    return await request_structured(
+        messages,
+        ONBOARDING_PROFILE_SCHEMA,
         model="gpt-5-mini",
         max_tokens=500,
         temperature=0.1,
+        cache=EXTRACTION_CACHE,
     )
 
-    try:
-        extracted_data = json.loads(response.get("message", {}).get("content", "").strip())
-        return extracted_data
-    except json.JSONDecodeError as e:
-        print(f"Data extraction failed: {e}")
-        print(f"Raw response: {response.get('message', {}).get('content')}")
-        raise ValueError("Failed to extract valid JSON from conversation")
+async def extract_onboarding_draft(
+    profile_draft: Optional[Dict[str, Any]],
+    new_messages: List[Dict[str, str]]
+) -> Dict[str, Any]:
+    """Fold the newest onboarding messages into a partially extracted profile (speculative, runs in the background)"""
+
+    conversation_text = "\n".join([
+        f"{msg['role'].title()}: {msg['content']}"
+        for msg in new_messages
+    ])
+
+    messages = [
+        {"role": "system", "content": ONBOARDING_DRAFT_PROMPT},
+        {"role": "user", "content": f"Profile so far:\n{json.dumps(profile_draft or {})}\n\nNew messages:\n\n{conversation_text}"}
+    ]
+
+    return await request_structured(
+        messages,
+        ONBOARDING_DRAFT_SCHEMA,
+        model="gpt-5-mini",
+        max_tokens=500,
+        temperature=0.1,
+        cache=EXTRACTION_CACHE,
+        priority=Priority.BACKGROUND,
+    )
 
 async def parse_weekly_constraints(chat_history: List[Dict[str, str]]) -> Dict[str, Any]:
     """Parse weekly planning conversation into structured constraints"""
@@ -216,23 +276,26 @@ async def parse_weekly_constraints(chat_history: List[Dict[str, str]]) -> Dict[s
         {"role": "user", "content": f"Parse this weekly planning conversation:\n\n{conversation_text}"}
     ]
 
-    response = await chat_completion(
-        messages=messages,
+    return await request_structured(
+        messages,
+        WEEKLY_CONSTRAINTS_SCHEMA,
         model="gpt-5-mini",
         max_tokens=800,
         temperature=0.1,
+        cache=EXTRACTION_CACHE,
     )
 
-    try:
-        constraints = json.loads(response.get("message", {}).get("content", "").strip())
-        return constraints
-    except json.JSONDecodeError as e:
-        print(f"Constraint parsing failed: {e}")
-        print(f"Raw response: {response.get('message', {}).get('content')}")
-        raise ValueError("Failed to extract valid JSON from weekly conversation")
+async def generate_weekly_menu(
+    household_profile: Dict[str, Any],
+    weekly_constraints: Dict[str, Any],
+    on_day: Optional[Callable[[str, Dict[str, Any]], Awaitable[None]]] = None
+) -> Dict[str, Any]:
+    """
+    Generate balanced weekly menu using household profile and constraints with detailed recipes
 
-async def generate_weekly_menu(household_profile: Dict[str, Any], weekly_constraints: Dict[str, Any]) -> Dict[str, Any]:
-    """Generate balanced weekly menu using household profile and constraints with detailed recipes"""
+    `on_day(day, entry)` is awaited as each day's menu entry is ready: days
+    without cooking right away, the others as their recipes finish.
+    """
 
     # Step 1: Generate meal titles using Menu Generation Agent
     prompt = f"""
@@ -250,87 +313,161 @@ Generate a balanced, varied weekly menu following the guidelines in your system
         {"role": "user", "content": prompt}
     ]
 
-    response = await chat_completion(
-        messages=messages,
-        model="gpt-5-mini",
-        max_tokens=1000,
-        temperature=0.3,
-    )
-
     try:
-        menu_titles = json.loads(response.get("message", {}).get("content", "").strip())
-
-        # Step 2: Use RecipeAgent to generate detailed recipes for each meal
-        detailed_menu = {}
-        for day, meal_title in menu_titles.items():
-            # Skip days with no cooking
-            if meal_title in ["Dining Out", "No Cooking Planned"]:
-                detailed_menu[day] = {"name": meal_title, "type": "no_cooking"}
-                continue
-
-            # Get constraints for this day
-            day_constraints = weekly_constraints.get(day, {})
-
-            # Infer cuisine and meal type from title
-            cuisine_hint = household_profile.get('favorite_cuisines', ['American'])[0] if household_profile.get('favorite_cuisines') else 'American'
-
-            # Prepare requirements for RecipeAgent
-            requirements = {
-                "meal_type": "dinner",
-                "cuisine": cuisine_hint,
-                "dietary_restrictions": household_profile.get('dislikes', []),
-                "max_cooking_time": 30 if day_constraints.get('complexity') == 'simple' else 45,
-                "skill_level": household_profile.get('cooking_skill', 'intermediate'),
-                "servings": len(household_profile.get('members', [])) or 4,
-                "special_requests": f"Create a recipe for: {meal_title}. Constraints: {day_constraints.get('notes', 'None')}"
-            }
-
-            try:
-                print(f"🍳 Generating detailed recipe for {day}: {meal_title}")
-                recipe = await recipe_service.develop_recipe(requirements, household_profile)
-                detailed_menu[day] = {
-                    "name": meal_title,
-                    "recipe": recipe,
-                    "type": "cooked_meal"
-                }
-                print(f"✅ Recipe generated for {day}")
-            except Exception as e:
-                print(f"⚠️ Failed to generate recipe for {day}, using simple title")
-                print(f"❌ Full error: {type(e).__name__}: {str(e)}")
-                import traceback
-                print(f"❌ Traceback: {traceback.format_exc()}")
-                # Fallback to simple title if recipe generation fails
-                detailed_menu[day] = {"name": meal_title, "type": "simple_title"}
-
-        return detailed_menu
-
-    except json.JSONDecodeError as e:
+        menu_titles = await request_structured(
+            messages,
+            WEEKLY_MENU_SCHEMA,
+            model="gpt-5-mini",
+            max_tokens=1000,
+            temperature=0.3,
+        )
+    except StructuredOutputError as e:
         print(f"Menu generation failed: {e}")
-        print(f"Raw response: {response.get('message', {}).get('content')}")
         raise ValueError("Failed to generate valid menu JSON")
 
-async def process_chat_message(
+    # Step 2: Use RecipeAgent to generate detailed recipes for each meal (concurrently)
+    recipe_jobs = {}
+    finished = []
+    entries = {}
+
+    def menu_entry(day: str, result: Any) -> Dict[str, Any]:
+        meal_title = menu_titles[day]
+        if isinstance(result, BaseException):
+            print(f"⚠️ Failed to generate recipe for {day}, using simple title")
+            print(f"❌ Full error: {type(result).__name__}: {str(result)}")
+            import traceback
+            print(f"❌ Traceback: {''.join(traceback.format_exception(result))}")
+            # Fallback to simple title if recipe generation fails
+            return {"name": meal_title, "type": "simple_title"}
+
+        print(f"✅ Recipe generated for {day}")
+        return {
+            "name": meal_title,
+            "recipe": result,
+            "type": "cooked_meal"
+        }
+
+    async def day_done(day: str, result: Any) -> None:
+        entries[day] = menu_entry(day, result)
+        if on_day is not None:
+            await on_day(day, entries[day])
+
+    async def develop(requirements: Dict[str, Any]) -> Dict[str, Any]:
+        recipe = await recipe_service.develop_recipe(requirements, household_profile)
+        finished.append(recipe)
+        return recipe
+
+    for day, meal_title in menu_titles.items():
+        # Skip days with no cooking
+        if meal_title in ["Dining Out", "No Cooking Planned"]:
+            entries[day] = {"name": meal_title, "type": "no_cooking"}
+            if on_day is not None:
+                await on_day(day, entries[day])
+            continue
+
+        # Get constraints for this day
+        day_constraints = weekly_constraints.get(day, {})
+
+        # Infer cuisine and meal type from title
+        cuisine_hint = household_profile.get('favorite_cuisines', ['American'])[0] if household_profile.get('favorite_cuisines') else 'American'
+
+        # Prepare requirements for RecipeAgent
+        requirements = {
+            "meal_type": "dinner",
+            "cuisine": cuisine_hint,
+            "dietary_restrictions": household_profile.get('dislikes', []),
+            "max_cooking_time": 30 if day_constraints.get('complexity') == 'simple' else 45,
+            "skill_level": household_profile.get('cooking_skill', 'intermediate'),
+            "servings": len(household_profile.get('members', [])) or 4,
+            "special_requests": f"Create a recipe for: {meal_title}. Constraints: {day_constraints.get('notes', 'None')}"
+        }
+
+        print(f"🍳 Generating detailed recipe for {day}: {meal_title}")
+        recipe_jobs[day] = functools.partial(develop, requirements)
+
+    try:
+        recipes = await run_bounded(recipe_jobs, limit=MEAL_PLAN_CONCURRENCY, timeout=MEAL_PLAN_DAY_TIMEOUT, on_result=day_done)
+    except asyncio.CancelledError:
+        # Nobody will see this menu, but the recipes that did finish can serve later plans
+        for recipe in finished:
+            recipe_service.queue_recipe_save(recipe)
+        metrics.increment("cancelled.recipes_salvaged", len(finished))
+        raise
+
+    # Assemble results in menu order
+    detailed_menu = {}
+    for day in menu_titles:
+        if day in entries:
+            detailed_menu[day] = entries[day]
+        elif day in recipes:
+            detailed_menu[day] = menu_entry(day, recipes[day])
+        else:
+            detailed_menu[day] = {"name": menu_titles[day], "type": "no_cooking"}
+
+    return detailed_menu
+
+# Sentinel the assistant emits when each chat type has gathered enough information
+COMPLETION_SENTINELS = {
+    "onboarding": "PROFILE_COMPLETE",
+    "weekly_planning": "WEEK_UNDERSTOOD",
+}
+
+HISTORY_SUMMARY_PROMPT = """
+You maintain a running summary of a meal planning chat so it can stand in for the older messages.
+
+Keep every concrete fact the user gave (names, ages, dietary restrictions, cooking skill, likes and dislikes,
+busy days, events, guests, budget) and every question the assistant has already asked. Drop pleasantries.
+Write short plain-text bullet points, no more than 150 words.
+"""
+
+def _build_chat_messages(
     message: str,
     chat_history: List[Dict[str, str]],
-    chat_type: str = "onboarding"
-) -> Dict[str, Any]:
-    """Process a chat message and return response with any extracted data"""
-
+    chat_type: str,
+    summary: Optional[RollingSummary] = None,
+    first_sequence: int = 0
+) -> List[Dict[str, str]]:
     system_prompt = ONBOARDING_SYSTEM_PROMPT if chat_type == "onboarding" else INTERFACE_AGENT_PROMPT
 
+    # Recent turns verbatim, older ones folded into the rolling summary, within the type's budget
+    history = compact_history(chat_history, chat_type, summary=summary, first_sequence=first_sequence)
+    metrics.increment(f"chat_prompt.{chat_type}.history_tokens_sent", history.tokens_after)
+    metrics.increment(f"chat_prompt.{chat_type}.history_tokens_saved", history.tokens_saved)
+    if history.tokens_saved > 0:
+        print(f"✂️ Compacted {chat_type} history: ~{history.tokens_before} → ~{history.tokens_after} tokens ({history.tokens_saved} saved)")
+
     messages = [{"role": "system", "content": system_prompt}]
-    messages.extend(chat_history)
+    messages.extend(history.messages)
     messages.append({"role": "user", "content": message})
+    return messages
+
+async def summarize_history(previous_summary: Optional[str], chat_history: List[Dict[str, str]]) -> str:
+    """Fold older chat messages into the rolling summary (runs in the background)"""
+
+    conversation_text = "\n".join([
+        f"{msg['role'].title()}: {msg['content']}"
+        for msg in chat_history
+    ])
+
+    content = f"Conversation to summarize:\n\n{conversation_text}"
+    if previous_summary:
+        content = f"Summary so far:\n{previous_summary}\n\nUpdate it with these later messages:\n\n{conversation_text}"
 
     response = await chat_completion(
-        messages=messages,
+        messages=[
+            {"role": "system", "content": HISTORY_SUMMARY_PROMPT},
+            {"role": "user", "content": content}
+        ],
         model="gpt-5-mini",
-        max_tokens=500,
-        temperature=0.7,
+        max_tokens=300,
+        temperature=0.1,
+        cache=EXTRACTION_CACHE,
+        priority=Priority.BACKGROUND,
     )
 
-    assistant_message = response.get("message", {}).get("content", "")
+    return response.get("message", {}).get("content", "").strip()
 
+def _build_chat_result(assistant_message: str, chat_type: str) -> Dict[str, Any]:
     result = {
         "message": assistant_message,
         "completed": False,
@@ -338,41 +475,250 @@ async def process_chat_message(
     }
 
     # Check if profile/context is complete
-    if chat_type == "onboarding" and "PROFILE_COMPLETE" in assistant_message:
+    sentinel = COMPLETION_SENTINELS.get(chat_type)
+    if sentinel and sentinel in assistant_message:
         result["completed"] = True
-        # Remove PROFILE_COMPLETE from the message
-        result["message"] = assistant_message.replace("PROFILE_COMPLETE", "").strip()
+        # Remove the sentinel from the message
+        result["message"] = assistant_message.replace(sentinel, "").strip()
 
-    elif chat_type == "weekly_planning" and "WEEK_UNDERSTOOD" in assistant_message:
-        result["completed"] = True
-        # Remove WEEK_UNDERSTOOD from the message
-        result["message"] = assistant_message.replace("WEEK_UNDERSTOOD", "").strip()
+    return result
+
+async def process_chat_message(
+    message: str,
+    chat_history: List[Dict[str, str]],
+    chat_type: str = "onboarding",
+    summary: Optional[RollingSummary] = None,
+    first_sequence: int = 0
+) -> Dict[str, Any]:
+    """
+    Process a chat message and return response with any extracted data
+
+    `chat_history` holds session messages `first_sequence` onwards; `summary`
+    covers the ones before (see services/history_compaction.py).
+    """
+
+    response = await chat_completion(
+        messages=_build_chat_messages(message, chat_history, chat_type, summary, first_sequence),
+        model="gpt-5-mini",
+        max_tokens=500,
+        temperature=0.7,
+        priority=Priority.INTERACTIVE,
+    )
 
+    assistant_message = response.get("message", {}).get("content", "")
+
+    return _build_chat_result(assistant_message, chat_type)
+
+COMBINED_TURN_PROMPT = """
+
+RESPONSE FORMAT:
+While you talk with the user you also keep their {label} up to date. What is known so far:
+{state}
+
+Respond with ONLY a JSON object, no other text:
+{{"reply": "your message to the user", "completed": true or false, "data": {data_format}}}
+
+- "reply" is exactly what you would otherwise say, without the {sentinel} marker
+- "completed" is true exactly when you would have said {sentinel}
+- "data" is the complete updated {label}: keep what is known, add or correct what the user just said
+"""
+
+# What the combined turn extracts for each chat type (same format as the separate extraction prompts)
+COMBINED_TURN_DATA = {
+    "onboarding": {
+        "label": "household profile",
+        "format": '{"members": [{"name": "string", "age": int|null, "is_adult": bool, "dietary_restrictions": []}], '
+                  '"cooking_skill": "beginner|intermediate|advanced|null", "favorite_cuisines": [], "dislikes": []}',
+    },
+    "weekly_planning": {
+        "label": "weekly meal planning constraints",
+        "format": '{"<day of week>": {"portions": "normal|extra|none|reduced", "complexity": "simple|normal|complex", '
+                  '"notes": "any specific requests"}} with an entry for each of the seven days',
+    },
+}
+
+def _validate_combined_turn(payload: Any, chat_type: str) -> Dict[str, Any]:
+    """Check a combined turn response against the expected shape; raises ValueError"""
+    if not isinstance(payload, dict):
+        raise ValueError("response is not a JSON object")
+    if not isinstance(payload.get("reply"), str) or not payload["reply"].strip():
+        raise ValueError("missing reply")
+    if not isinstance(payload.get("completed"), bool):
+        raise ValueError("missing completed flag")
+
+    data = payload.get("data")
+    if not isinstance(data, dict):
+        raise ValueError("missing data object")
+
+    if chat_type == "onboarding":
+        members = data.get("members", [])
+        if not isinstance(members, list) or not all(isinstance(member, dict) and member.get("name") for member in members):
+            raise ValueError("members must be a list of named members")
+        if data.get("cooking_skill") not in (None, "beginner", "intermediate", "advanced"):
+            raise ValueError(f"unknown cooking_skill {data.get('cooking_skill')!r}")
+        for field in ("favorite_cuisines", "dislikes"):
+            if not isinstance(data.get(field, []), list):
+                raise ValueError(f"{field} must be a list")
+    elif chat_type == "weekly_planning":
+        for day, constraints in data.items():
+            if day not in WEEK_DAYS or not isinstance(constraints, dict):
+                raise ValueError(f"unexpected constraints entry {day!r}")
+
+    return payload
+
+async def process_chat_turn_combined(
+    message: str,
+    chat_history: List[Dict[str, str]],
+    chat_type: str = "onboarding",
+    state: Optional[Dict[str, Any]] = None,
+    summary: Optional[RollingSummary] = None,
+    first_sequence: int = 0
+) -> Dict[str, Any]:
+    """
+    process_chat_message that also returns the chat's structured data.
+
+    `state` is the data extracted so far; the result carries the updated copy
+    under "structured". A response that isn't valid JSON of the expected shape
+    falls back to a plain process_chat_message call (no "structured" key), and
+    the data is then extracted separately as before.
+    """
+
+    data = COMBINED_TURN_DATA[chat_type]
+    messages = _build_chat_messages(message, chat_history, chat_type, summary, first_sequence)
+    messages[0] = {
+        "role": "system",
+        "content": messages[0]["content"] + COMBINED_TURN_PROMPT.format(
+            label=data["label"],
+            state=json.dumps(state or {}),
+            data_format=data["format"],
+            sentinel=COMPLETION_SENTINELS[chat_type],
+        )
+    }
+
+    response = await chat_completion(
+        messages=messages,
+        model="gpt-5-mini",
+        max_tokens=1200,
+        temperature=0.7,
+        priority=Priority.INTERACTIVE,
+    )
+    content = response.get("message", {}).get("content", "")
+
+    schema = OutputSchema(
+        f"combined_turn_{chat_type}",
+        {"reply": (str,), "completed": (bool,), "data": (dict,)},
+        check=lambda payload: _validate_combined_turn(payload, chat_type)
+    )
+    try:
+        parsed = parse_structured(content, schema)
+        if parsed.missing:
+            raise StructuredOutputError(f"missing {parsed.missing}")
+        payload = parsed.data
+    except StructuredOutputError as e:
+        print(f"⚠️ Combined {chat_type} turn unusable ({e}); falling back to separate calls")
+        print(f"Raw response: {content}")
+        metrics.increment(f"combined_turn.{chat_type}.fallback")
+        return await process_chat_message(message, chat_history, chat_type, summary, first_sequence)
+
+    metrics.increment(f"combined_turn.{chat_type}.ok")
+    result = _build_chat_result(payload["reply"], chat_type)
+    result["completed"] = payload["completed"] or result["completed"]
+    result["structured"] = payload["data"]
     return result
 
+class _SentinelFilter:
+    """Strips a completion sentinel from streamed text, even when it is split across chunks"""
+
+    def __init__(self, sentinel: Optional[str]):
+        self.sentinel = sentinel or ""
+        self._pending = ""
+
+    def feed(self, chunk: str) -> str:
+        if not self.sentinel:
+            return chunk
+
+        text = (self._pending + chunk).replace(self.sentinel, "")
+
+        # Hold back a tail that could be the start of a sentinel
+        hold = 0
+        for size in range(min(len(self.sentinel) - 1, len(text)), 0, -1):
+            if self.sentinel.startswith(text[-size:]):
+                hold = size
+                break
+
+        self._pending = text[len(text) - hold:] if hold else ""
+        return text[:len(text) - hold] if hold else text
+
+    def flush(self) -> str:
+        pending, self._pending = self._pending, ""
+        return pending
+
+async def process_chat_message_stream(
+    message: str,
+    chat_history: List[Dict[str, str]],
+    chat_type: str = "onboarding",
+    summary: Optional[RollingSummary] = None,
+    first_sequence: int = 0
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Streaming variant of process_chat_message.
+
+    Yields {"delta": text} events as tokens arrive (with the completion
+    sentinel filtered out), then a final {"result": ...} event with the same
+    shape process_chat_message returns.
+    """
+
+    sentinel_filter = _SentinelFilter(COMPLETION_SENTINELS.get(chat_type))
+    chunks = []
+
+    async for chunk in chat_completion_stream(
+        messages=_build_chat_messages(message, chat_history, chat_type, summary, first_sequence),
+        model="gpt-5-mini",
+        max_tokens=500,
+        temperature=0.7,
+        priority=Priority.INTERACTIVE,
+    ):
+        chunks.append(chunk)
+        visible = sentinel_filter.feed(chunk)
+        if visible:
+            yield {"delta": visible}
+
+    tail = sentinel_filter.flush()
+    if tail:
+        yield {"delta": tail}
+
+    yield {"result": _build_chat_result("".join(chunks), chat_type)}
+
 async def create_comprehensive_meal_plan(
     household_id: str,
     chat_history: List[Dict[str, str]],
-    household_profile: Dict[str, Any]
+    household_profile: Dict[str, Any],
+    weekly_constraints: Optional[Dict[str, Any]] = None,
+    on_day: Optional[Callable[[str, Dict[str, Any]], Awaitable[None]]] = None
 ) -> Dict[str, Any]:
     """
     Complete three-agent meal plan generation workflow:
-    1. Parse weekly conversation into constraints (Admin Agent)
+    1. Parse weekly conversation into constraints (Admin Agent), unless the
+       chat already extracted them (combined turns)
     2. Generate balanced menu (Menu Generation Agent)
     3. Return comprehensive meal plan
     """
     from datetime import datetime, timedelta
 
     try:
-        # Step 1: Parse weekly constraints using Admin Agent
-        print("🔍 Step 1: Parsing weekly constraints...")
-        weekly_constraints = await parse_weekly_constraints(chat_history)
-        print(f"✅ Constraints parsed: {weekly_constraints}")
-
-        # Step 2: Generate menu using Menu Generation Agent
-        print("🍽️ Step 2: Generating balanced menu...")
-        weekly_menu = await generate_weekly_menu(household_profile, weekly_constraints)
-        print(f"✅ Menu generated: {weekly_menu}")
+        with priority_scope(Priority.PLAN_GENERATION):
+            # Step 1: Parse weekly constraints using Admin Agent
+            if weekly_constraints:
+                print(f"✅ Step 1: Using constraints extracted during the chat: {weekly_constraints}")
+            else:
+                print("🔍 Step 1: Parsing weekly constraints...")
+                weekly_constraints = await parse_weekly_constraints(chat_history)
+                print(f"✅ Constraints parsed: {weekly_constraints}")
+
+            # Step 2: Generate menu using Menu Generation Agent
+            print("🍽️ Step 2: Generating balanced menu...")
+            weekly_menu = await generate_weekly_menu(household_profile, weekly_constraints, on_day=on_day)
+            print(f"✅ Menu generated: {weekly_menu}")
 
         # Step 3: Calculate week start date (most recent Sunday, or today if today is Sunday)
         today = datetime.now()
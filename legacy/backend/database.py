@@ -1,19 +1,34 @@
-from supabase import create_client, Client
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
-supabase_url = os.getenv("SUPABASE_URL")
-supabase_key = os.getenv("SUPABASE_KEY")
+# "supabase" (default) or "sqlite" for a local database with no network access
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "supabase").lower()
+SQLITE_DB_PATH = os.getenv("SQLITE_DB_PATH", "meal_plan.db")
 
-if not supabase_url or not supabase_key:
-    raise ValueError("Missing Supabase credentials in environment variables. Please set SUPABASE_URL and SUPABASE_KEY.")
+if STORAGE_BACKEND == "sqlite":
+    from sqlite_database import create_sqlite_client
 
-try:
-    supabase: Client = create_client(supabase_url, supabase_key)
-except Exception as client_error:
-    raise ValueError(f"Failed to create Supabase client: {client_error}")
+    supabase = create_sqlite_client(SQLITE_DB_PATH)
 
-def get_supabase_client() -> Client:
-    return supabase
\ No newline at end of file
+elif STORAGE_BACKEND == "supabase":
+    from supabase import create_client
+
+    supabase_url = os.getenv("SUPABASE_URL")
+    supabase_key = os.getenv("SUPABASE_KEY")
+
+    if not supabase_url or not supabase_key:
+        raise ValueError("Missing Supabase credentials in environment variables. Please set SUPABASE_URL and SUPABASE_KEY.")
+
+    try:
+        supabase = create_client(supabase_url, supabase_key)
+    except Exception as client_error:
+        raise ValueError(f"Failed to create Supabase client: {client_error}")
+
+else:
+    raise ValueError(f"Unknown STORAGE_BACKEND '{STORAGE_BACKEND}'. Use 'supabase' or 'sqlite'.")
+
+def get_supabase_client():
+    """The configured storage client (supabase-py or its SQLite stand-in)"""
+    return supabase
@@ -1,16 +1,45 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 import os
 from routes.chat import router as chat_router
 from routes.household import router as household_router
-from routes.meal_plans import router as meal_plans_router
+from routes.meal_plans import router as meal_plans_router, meal_plan_stream_stats
 from routes.grocery import router as grocery_router
 from routes.recipes import router as recipes_router
+from services.llm_gateway import start_gateway_client, close_gateway_client
+from services.llm_cache import response_cache
+from services.llm_scheduler import llm_scheduler
+from services.recipe_index import recipe_index
+from services.recipe_writer import recipe_writer
+from services.repository import db
+from services.session_cache import session_cache
+from services.structured_output import structured_output_stats
+from services.meal_plan_jobs import meal_plan_jobs
+from services import metrics
 
 load_dotenv()
 
-app = FastAPI(title="Meal Plan API", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Open pooled AI gateway connections once per process
+    await start_gateway_client()
+    await recipe_index.start()
+    recipe_writer.start()
+    await meal_plan_jobs.start()
+    try:
+        yield
+    finally:
+        # Stop running jobs, then flush write-behind queues before tearing anything else down
+        await meal_plan_jobs.stop()
+        await session_cache.flush_all()
+        await recipe_writer.stop()
+        await recipe_index.stop()
+        await close_gateway_client()
+        db.close()
+
+app = FastAPI(title="Meal Plan API", version="1.0.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -40,6 +69,22 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/debug/metrics")
+async def debug_metrics():
+    """Process-local performance counters (cache hits/misses etc.)"""
+    return {
+        "llm_cache": response_cache.stats(),
+        "llm_scheduler": llm_scheduler.stats(),
+        "recipe_index": {"loaded": recipe_index.loaded, "recipes": len(recipe_index)},
+        "recipe_writer": recipe_writer.stats(),
+        "db": db.stats(),
+        "session_cache": session_cache.stats(),
+        "structured_output": structured_output_stats(),
+        "meal_plan_jobs": meal_plan_jobs.stats(),
+        "meal_plan_stream": meal_plan_stream_stats(),
+        "counters": metrics.snapshot(),
+    }
+
 @app.get("/debug/supabase")
 async def debug_supabase():
     """Debug endpoint to check Supabase configuration"""
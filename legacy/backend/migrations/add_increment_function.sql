@@ -0,0 +1,7 @@
+-- Bump a cached recipe's usage counter (see RecipeService.increment_recipe_usage);
+-- returns the new count. The SQLite backend implements the same function in sqlite_database.py.
+CREATE OR REPLACE FUNCTION increment(row_id UUID)
+RETURNS INTEGER AS $$
+    UPDATE recipes SET times_used = COALESCE(times_used, 0) + 1 WHERE id = row_id
+    RETURNING times_used;
+$$ LANGUAGE sql;
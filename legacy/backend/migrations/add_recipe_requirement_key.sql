@@ -0,0 +1,8 @@
+-- Canonical requirement key for cached recipes (see services/recipe_requirements.py)
+ALTER TABLE recipes ADD COLUMN IF NOT EXISTS requirement_key TEXT;
+
+CREATE INDEX IF NOT EXISTS idx_recipes_requirement_key ON recipes(requirement_key);
+
+-- Existing rows are brought to the canonical cuisine/tag spellings, and given a
+-- requirement_key, by scripts/backfill_recipe_requirements.py: the alias tables
+-- live in Python, so the backfill runs there rather than in SQL.
@@ -0,0 +1,26 @@
+-- Append-only chat message log: one row per message instead of rewriting
+-- chat_sessions.messages on every turn
+CREATE TABLE IF NOT EXISTS chat_messages (
+    id UUID DEFAULT gen_random_uuid() PRIMARY KEY,
+    session_id UUID NOT NULL REFERENCES chat_sessions(id) ON DELETE CASCADE,
+    sequence INTEGER NOT NULL, -- 0-based position within the session
+    role TEXT NOT NULL CHECK (role IN ('user', 'assistant', 'system')),
+    content TEXT NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    UNIQUE (session_id, sequence)
+);
+
+CREATE INDEX IF NOT EXISTS idx_chat_messages_session_sequence ON chat_messages(session_id, sequence DESC);
+
+-- Number of messages logged for the session (next sequence to write)
+ALTER TABLE chat_sessions ADD COLUMN IF NOT EXISTS message_count INTEGER DEFAULT 0;
+
+-- Backfill existing sessions from the old messages array
+INSERT INTO chat_messages (session_id, sequence, role, content)
+SELECT s.id, m.ordinality - 1, m.value->>'role', m.value->>'content'
+FROM chat_sessions s, jsonb_array_elements(s.messages) WITH ORDINALITY AS m(value, ordinality)
+ON CONFLICT (session_id, sequence) DO NOTHING;
+
+UPDATE chat_sessions
+SET message_count = jsonb_array_length(messages)
+WHERE COALESCE(message_count, 0) = 0 AND jsonb_array_length(messages) > 0;
@@ -1,10 +1,27 @@
-from fastapi import APIRouter, HTTPException, Body, Query
+from fastapi import APIRouter, HTTPException, Body, Query, BackgroundTasks, Response
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 from pydantic import BaseModel
 from typing import List, Dict, Any, Optional
-from database import get_supabase_client
-from chat import process_chat_message, extract_onboarding_data
+from services.repository import db
+from chat import (
+    CHAT_COMBINED_TURNS,
+    process_chat_message,
+    process_chat_turn_combined,
+    process_chat_message_stream,
+    extract_onboarding_data,
+    extract_onboarding_draft,
+    summarize_history,
+)
+from services.chat_message_store import chat_message_store, message_count
+from services.session_cache import AFFINITY_HEADER, CHAT_STICKY_SESSIONS, WORKER_ID, CachedSession, session_cache
+from services.history_compaction import RollingSummary, summary_target
+from services import metrics
 from services.household_service import HouseholdService
+import copy
+import json
 import uuid
+import asyncio
 from datetime import datetime
 
 router = APIRouter(prefix="/chat", tags=["chat"])
@@ -21,20 +38,24 @@ class ChatResponse(BaseModel):
     completed: bool
     extracted_data: Optional[Dict[str, Any]] = None
 
+def _affinity(response: Response) -> None:
+    """Tell a sticky proxy which worker holds the session in its cache"""
+    if CHAT_STICKY_SESSIONS:
+        response.headers[AFFINITY_HEADER] = WORKER_ID
+
 @router.post("/onboarding/start")
-async def start_onboarding():
+async def start_onboarding(response: Response):
     """Start a new onboarding chat session"""
-    supabase = get_supabase_client()
-
     session_id = str(uuid.uuid4())
 
     # Create new chat session
-    result = supabase.table("chat_sessions").insert({
+    result = await db.table("chat_sessions").insert({
         "id": session_id,
         "session_type": "onboarding",
-        "messages": [],
         "completed": False
     }).execute()
+    session_cache.remember(result.data[0])
+    _affinity(response)
 
     welcome_message = """Hi! I'm here to help you set up your meal planning profile quickly.
 
@@ -48,86 +69,285 @@ First question: Tell me about your household - how many people, their names, age
         completed=False
     )
 
-@router.post("/onboarding/{session_id}")
-async def continue_onboarding(session_id: str, chat_message: ChatMessage, user_id: Optional[str] = Query(default=None)):
-    """Continue an onboarding conversation"""
-    supabase = get_supabase_client()
-
-    # Get existing session
-    session_result = supabase.table("chat_sessions").select("*").eq("id", session_id).execute()
+async def _load_turn(session_id: str) -> CachedSession:
+    """Session state plus the window of recent messages the prompt needs (cached between turns)"""
+    entry = await session_cache.load(session_id)
 
-    if not session_result.data:
+    if entry is None:
         raise HTTPException(status_code=404, detail="Chat session not found")
 
-    session = session_result.data[0]
-    chat_history = session["messages"]
-
-    # Add user message to history
-    chat_history.append({"role": "user", "content": chat_message.message})
-
-    # Process with AI
-    result = await process_chat_message(
-        chat_message.message,
-        chat_history,
-        chat_type="onboarding"
+    return entry
+
+ONBOARDING_REQUIRED_FIELDS = ["members", "cooking_skill"]
+
+def _start_profile_draft(entry: CachedSession, message: str) -> None:
+    """
+    Speculatively fold the user's answer into the session's profile draft while
+    the assistant reply is generated, so completion rarely needs an extraction call
+    """
+    if not session_cache.write_behind:
+        return  # drafts live on the cached session
+
+    previous = entry.draft_task
+    window_start = entry.first_sequence
+    window = list(entry.recent) + [{"role": "user", "content": message}]
+    through = entry.first_sequence + len(window)
+
+    async def update() -> None:
+        if previous is not None:
+            await asyncio.gather(previous, return_exceptions=True)
+        if entry.draft_through < window_start:
+            return  # messages before the window were never drafted; completion extracts in full
+        new_messages = window[entry.draft_through - window_start:]
+        try:
+            entry.draft = await extract_onboarding_draft(entry.draft, new_messages)
+            entry.draft_through = through
+            metrics.increment("onboarding_draft.updated")
+        except Exception as e:
+            # The next update retries these messages along with its own
+            print(f"⚠️ Onboarding draft update failed: {e}")
+
+    entry.draft_task = asyncio.create_task(update())
+
+def _draft_current(entry: CachedSession) -> bool:
+    """Whether the draft has seen every user message so far (assistant replies add nothing)"""
+    return entry.draft_through >= message_count(entry.session) - 1
+
+async def _process_turn(entry: CachedSession, chat_type: str, message: str) -> Dict[str, Any]:
+    """Run the assistant for one (non-streaming) turn"""
+    if CHAT_COMBINED_TURNS:
+        # The draft is only worth continuing if it covers everything before this turn
+        return await process_chat_turn_combined(
+            message,
+            list(entry.recent),
+            chat_type=chat_type,
+            state=entry.draft if _draft_current(entry) else None,
+            summary=entry.summary,
+            first_sequence=entry.first_sequence
+        )
+
+    return await process_chat_message(
+        message,
+        list(entry.recent),
+        chat_type=chat_type,
+        summary=entry.summary,
+        first_sequence=entry.first_sequence
     )
 
-    # Add assistant response to history
-    chat_history.append({"role": "assistant", "content": result["message"]})
+def _apply_structured(entry: CachedSession, result: Dict[str, Any]) -> None:
+    """Take the structured data a combined turn returned as the session's draft"""
+    structured = result.pop("structured", None)
+    if structured is None:
+        return
+    # A fresh (uncached) entry or a turn that fell back leaves a gap the model never saw
+    if _draft_current(entry):
+        entry.draft = structured
+        entry.draft_through = message_count(entry.session) + 1
+
+async def _drafted(
+    entry: CachedSession,
+    chat_type: str,
+    through: int,
+    required_fields: Optional[List[str]] = None
+) -> Optional[Dict[str, Any]]:
+    """The session's draft, if it covers the conversation up to `through` and is complete"""
+    if entry.draft_task is not None:
+        await asyncio.gather(entry.draft_task, return_exceptions=True)
+
+    draft = entry.draft
+    if entry.draft_through < through or not draft or not all(draft.get(field) for field in required_fields or []):
+        metrics.increment(f"{chat_type}_draft.miss")
+        return None
+
+    metrics.increment(f"{chat_type}_draft.hit")
+    return copy.deepcopy(draft)
+
+async def _complete_onboarding(
+    entry: CachedSession,
+    turn: List[Dict[str, str]],
+    user_id: Optional[str],
+    update_data: Dict[str, Any],
+    result: Dict[str, Any]
+) -> None:
+    """Extract the profile from a finished onboarding chat and create the household"""
+    session_id = entry.session["id"]
+    chat_history = None
+    try:
+        # The draft has seen every user message; the closing assistant reply adds nothing
+        extracted_data = await _drafted(entry, "onboarding", message_count(entry.session) + 1, ONBOARDING_REQUIRED_FIELDS)
+
+        if extracted_data is None:
+            print("Onboarding conversation completed. Extracting data...")
+            # Extraction needs the whole conversation, read once at completion
+            await session_cache.flush(session_id, entry)
+            chat_history = await chat_message_store.history(session_id) + turn
+            extracted_data = await extract_onboarding_data(chat_history)
+        else:
+            print("Onboarding conversation completed. Using the profile extracted during the conversation")
+
+        # Add user_id to the profile data if provided
+        if user_id:
+            extracted_data["user_id"] = user_id
+
+        # Validate required fields
+        for field in ONBOARDING_REQUIRED_FIELDS:
+            if field not in extracted_data:
+                print(f"WARNING: Missing required field '{field}' in extracted data")
+
+        # Ensure arrays exist
+        if "favorite_cuisines" not in extracted_data:
+            extracted_data["favorite_cuisines"] = []
+        if "dislikes" not in extracted_data:
+            extracted_data["dislikes"] = []
+
+        # Saved before replying (even with write-behind sessions): the client
+        # reads the household by this ID right away, and must hear if it failed
+        household_service = HouseholdService()
+        print(f"Attempting to save profile data to Supabase: {extracted_data}")
+        household_id = await household_service.create_household_profile(extracted_data)
+        print(f"SUCCESS: Created household profile with ID: {household_id}")
+
+        update_data["household_id"] = household_id
+
+        # Add household_id to extracted_data for frontend
+        result["extracted_data"] = extracted_data
+
+    except Exception as e:
+        print(f"CRITICAL: Data extraction or household creation failed: {e}")
+        print(f"Chat history: {chat_history}")
+        import traceback
+        print(f"Full error traceback: {traceback.format_exc()}")
+        # This is a critical error - profile data not saved to Supabase
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to extract data or save profile: {str(e)}"
+        )
+
+async def _finish_turn(
+    entry: CachedSession,
+    chat_type: str,
+    message: str,
+    result: Dict[str, Any],
+    user_id: Optional[str] = None
+) -> None:
+    """Record the turn's messages, run completion work and update the session"""
+    session_id = entry.session["id"]
+    turn = [
+        {"role": "user", "content": message},
+        {"role": "assistant", "content": result["message"]},
+    ]
 
-    # Update session
     update_data = {
-        "messages": chat_history,
         "completed": result["completed"],
         "updated_at": datetime.now().isoformat()
     }
 
-    if result["completed"]:
+    _apply_structured(entry, result)
+
+    if chat_type == "onboarding" and result["completed"]:
         # When conversation is complete, use data extraction agent
+        await _complete_onboarding(entry, turn, user_id, update_data, result)
+    elif chat_type == "weekly_planning" and result["completed"]:
+        # Constraints extracted during the chat spare meal plan generation the parsing call
+        result["extracted_data"] = await _drafted(entry, chat_type, message_count(entry.session) + 1)
+
+    # Only this turn is written: message rows and a small session update
+    session_cache.record_turn(entry, turn, update_data)
+    if not session_cache.write_behind:
+        await session_cache.flush(session_id, entry)
+
+async def _after_turn(entry: CachedSession, chat_type: str) -> None:
+    """Background work once the reply is out: persist the turn, then roll the history summary forward"""
+    session_id = entry.session["id"]
+    if not session_cache.write_behind:
+        return  # turn already persisted; nowhere to keep a summary between turns
+    await session_cache.flush_quietly(session_id)
+
+    target = summary_target(chat_type, entry.session.get("message_count") or 0, entry.summary)
+    if target is None or entry.summarizing or entry.dirty:
+        return
+
+    entry.summarizing = True
+    try:
+        covered = entry.summary.through if entry.summary else 0
+        older = await chat_message_store.history(session_id, after_sequence=covered - 1)
+        text = await summarize_history(entry.summary.text if entry.summary else None, older[:target - covered])
+        if text:
+            entry.summary = RollingSummary(text=text, through=target)
+            print(f"📝 Summarized first {target} messages of chat session {session_id}")
+    except Exception as e:
+        print(f"⚠️ History summary failed for chat session {session_id}: {e}")
+    finally:
+        entry.summarizing = False
+
+def _sse(data: Dict[str, Any]) -> str:
+    return f"data: {json.dumps(data)}\n\n"
+
+def _stream_turn(
+    entry: CachedSession,
+    chat_type: str,
+    message: str,
+    user_id: Optional[str] = None
+) -> StreamingResponse:
+    """Stream an assistant turn as server-sent events, persisting it once the stream ends"""
+
+    async def events():
         try:
-            print("Onboarding conversation completed. Extracting data...")
-            extracted_data = await extract_onboarding_data(chat_history)
-
-            # Add user_id to the profile data if provided
-            if user_id:
-                extracted_data["user_id"] = user_id
-
-            # Validate required fields
-            required_fields = ["members", "cooking_skill"]
-            for field in required_fields:
-                if field not in extracted_data:
-                    print(f"WARNING: Missing required field '{field}' in extracted data")
-
-            # Ensure arrays exist
-            if "favorite_cuisines" not in extracted_data:
-                extracted_data["favorite_cuisines"] = []
-            if "dislikes" not in extracted_data:
-                extracted_data["dislikes"] = []
-
-            print(f"Attempting to save profile data to Supabase: {extracted_data}")
+            result = None
+            async for event in process_chat_message_stream(
+                message,
+                list(entry.recent),
+                chat_type=chat_type,
+                summary=entry.summary,
+                first_sequence=entry.first_sequence
+            ):
+                if "delta" in event:
+                    yield _sse({"delta": event["delta"]})
+                else:
+                    result = event["result"]
+
+            await _finish_turn(entry, chat_type, message, result, user_id=user_id)
+
+            yield _sse({
+                "done": True,
+                **ChatResponse(
+                    message=result["message"],
+                    session_id=entry.session["id"],
+                    completed=result["completed"],
+                    extracted_data=result["extracted_data"]
+                ).model_dump()
+            })
+        except HTTPException as e:
+            yield _sse({"error": e.detail, "status": e.status_code})
+        except Exception as e:
+            print(f"❌ Streaming {chat_type} turn failed: {e}")
+            yield _sse({"error": str(e), "status": 500})
+
+    response = StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(_after_turn, entry, chat_type)
+    )
+    _affinity(response)
+    return response
 
-            household_service = HouseholdService()
-            household_id = await household_service.create_household_profile(extracted_data)
-            update_data["household_id"] = household_id
+@router.post("/onboarding/{session_id}")
+async def continue_onboarding(session_id: str, chat_message: ChatMessage, background_tasks: BackgroundTasks, response: Response, user_id: Optional[str] = Query(default=None)):
+    """Continue an onboarding conversation"""
+    # Get existing session and the recent conversation
+    entry = await _load_turn(session_id)
+    if not CHAT_COMBINED_TURNS:
+        _start_profile_draft(entry, chat_message.message)
 
-            # Add household_id to extracted_data for frontend
-            extracted_data["id"] = household_id
-            result["extracted_data"] = extracted_data
+    # Process with AI
+    result = await _process_turn(entry, "onboarding", chat_message.message)
 
-            print(f"SUCCESS: Created household profile with ID: {household_id}")
+    await _finish_turn(entry, "onboarding", chat_message.message, result, user_id=user_id)
 
-        except Exception as e:
-            print(f"CRITICAL: Data extraction or household creation failed: {e}")
-            print(f"Chat history: {chat_history}")
-            import traceback
-            print(f"Full error traceback: {traceback.format_exc()}")
-            # This is a critical error - profile data not saved to Supabase
-            raise HTTPException(
-                status_code=500,
-                detail=f"Failed to extract data or save profile: {str(e)}"
-            )
-
-    supabase.table("chat_sessions").update(update_data).eq("id", session_id).execute()
+    # Persist and summarize after the response is sent
+    background_tasks.add_task(_after_turn, entry, "onboarding")
+    _affinity(response)
 
     return ChatResponse(
         message=result["message"],
@@ -136,14 +356,21 @@ async def continue_onboarding(session_id: str, chat_message: ChatMessage, user_i
         extracted_data=result["extracted_data"]
     )
 
+@router.post("/onboarding/{session_id}/stream")
+async def continue_onboarding_stream(session_id: str, chat_message: ChatMessage, user_id: Optional[str] = Query(default=None)):
+    """Continue an onboarding conversation, streaming the reply as server-sent events"""
+    entry = await _load_turn(session_id)
+    _start_profile_draft(entry, chat_message.message)
+
+    return _stream_turn(entry, "onboarding", chat_message.message, user_id=user_id)
+
 @router.post("/weekly-planning/start")
 async def start_weekly_planning(
+    response: Response,
     request: Optional[WeeklyPlanningStartRequest] = Body(default=None),
     household_id: Optional[str] = Query(default=None)
 ):
     """Start a new weekly planning chat session"""
-    supabase = get_supabase_client()
-
     resolved_household_id = household_id or (request.household_id if request else None)
 
     if household_id and request and request.household_id and household_id != request.household_id:
@@ -153,20 +380,21 @@ async def start_weekly_planning(
         raise HTTPException(status_code=422, detail="household_id is required")
 
     # Verify household exists
-    household_result = supabase.table("household_profiles").select("*").eq("id", resolved_household_id).execute()
+    household_result = await db.table("household_profiles").select("*").eq("id", resolved_household_id).execute()
     if not household_result.data:
         raise HTTPException(status_code=404, detail="Household profile not found")
 
     session_id = str(uuid.uuid4())
 
     # Create new chat session
-    result = supabase.table("chat_sessions").insert({
+    result = await db.table("chat_sessions").insert({
         "id": session_id,
         "session_type": "weekly_planning",
         "household_id": resolved_household_id,
-        "messages": [],
         "completed": False
     }).execute()
+    session_cache.remember(result.data[0])
+    _affinity(response)
 
     welcome_message = """Great! Let's plan your meals for this week.
 
@@ -179,40 +407,19 @@ Tell me about your upcoming week - any busy days, special events, or family sche
     )
 
 @router.post("/weekly-planning/{session_id}")
-async def continue_weekly_planning(session_id: str, chat_message: ChatMessage):
+async def continue_weekly_planning(session_id: str, chat_message: ChatMessage, background_tasks: BackgroundTasks, response: Response):
     """Continue a weekly planning conversation"""
-    supabase = get_supabase_client()
-
-    # Get existing session
-    session_result = supabase.table("chat_sessions").select("*").eq("id", session_id).execute()
-
-    if not session_result.data:
-        raise HTTPException(status_code=404, detail="Chat session not found")
-
-    session = session_result.data[0]
-    chat_history = session["messages"]
-
-    # Add user message to history
-    chat_history.append({"role": "user", "content": chat_message.message})
+    # Get existing session and the recent conversation
+    entry = await _load_turn(session_id)
 
     # Process with AI
-    result = await process_chat_message(
-        chat_message.message,
-        chat_history,
-        chat_type="weekly_planning"
-    )
+    result = await _process_turn(entry, "weekly_planning", chat_message.message)
 
-    # Add assistant response to history
-    chat_history.append({"role": "assistant", "content": result["message"]})
-
-    # Update session
-    update_data = {
-        "messages": chat_history,
-        "completed": result["completed"],
-        "updated_at": datetime.now().isoformat()
-    }
+    await _finish_turn(entry, "weekly_planning", chat_message.message, result)
 
-    supabase.table("chat_sessions").update(update_data).eq("id", session_id).execute()
+    # Persist and summarize after the response is sent
+    background_tasks.add_task(_after_turn, entry, "weekly_planning")
+    _affinity(response)
 
     return ChatResponse(
         message=result["message"],
@@ -220,3 +427,10 @@ async def continue_weekly_planning(session_id: str, chat_message: ChatMessage):
         completed=result["completed"],
         extracted_data=result["extracted_data"]
     )
+
+@router.post("/weekly-planning/{session_id}/stream")
+async def continue_weekly_planning_stream(session_id: str, chat_message: ChatMessage):
+    """Continue a weekly planning conversation, streaming the reply as server-sent events"""
+    entry = await _load_turn(session_id)
+
+    return _stream_turn(entry, "weekly_planning", chat_message.message)
@@ -1,13 +1,24 @@
-from fastapi import APIRouter, HTTPException
+import json
+import time
+import asyncio
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import Dict, Any, List
+from typing import Dict, Any, AsyncIterator, Awaitable, Callable, List, Optional
 from services.meal_planning_service import MealPlanningService
+from services.deadline import MEAL_PLAN_DEADLINE_SECONDS, DeadlineExceeded, deadline_scope
+from services.concurrency import ClientDisconnected, run_until_disconnected
+from services.meal_plan_jobs import meal_plan_jobs
+from services import metrics
 from chat import create_comprehensive_meal_plan
 
 router = APIRouter(prefix="/meal-plans", tags=["meal-plans"])
 
 meal_planning_service = MealPlanningService()
 
+# Non-standard (nginx) status for a request the client abandoned; nobody reads it
+CLIENT_CLOSED_REQUEST = 499
+
 class MealPlanRequest(BaseModel):
     household_id: str
     weekly_context: Dict[str, Any]
@@ -16,33 +27,220 @@ class ComprehensiveMealPlanRequest(BaseModel):
     household_id: str
     chat_history: List[Dict[str, str]]
     household_profile: Dict[str, Any]
+    weekly_constraints: Optional[Dict[str, Any]] = None  # extracted during the chat, if available
 
 @router.post("/generate")
-async def generate_meal_plan(request: MealPlanRequest):
-    """Generate a new meal plan for a household"""
+async def generate_meal_plan(
+    request: MealPlanRequest,
+    http_request: Request,
+    response: Response,
+    background_tasks: BackgroundTasks,
+    wait: bool = Query(default=False),
+    mode: str = Query(default="standard", pattern="^(standard|instant)$"),
+    upgrade: bool = Query(default=False)
+):
+    """
+    Queue generation of a new meal plan for a household; poll
+    GET /meal-plans/jobs/{job_id} for progress and the meal_plan_id.
+    With ?wait=true the plan is generated within the request instead.
+
+    ?mode=instant assembles the plan from the recipe library right away (no
+    LLM calls) and reports the constraints relaxed per day; with
+    &upgrade=true those days are regenerated in the background afterwards.
+    """
+    if mode == "instant":
+        try:
+            result = await meal_planning_service.assemble_instant_meal_plan(
+                request.household_id,
+                request.weekly_context
+            )
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        upgrading = result["upgradable_days"] if upgrade else []
+        if upgrading:
+            background_tasks.add_task(meal_planning_service.upgrade_days, result["meal_plan_id"], upgrading)
+        return {**result, "upgrading_days": upgrading, "message": "Meal plan assembled from the recipe library"}
+
+    if not wait:
+        job = await meal_plan_jobs.submit(request.household_id, request.weekly_context)
+        response.status_code = 202
+        return _job_status(job)
+
     try:
-        meal_plan_id = await meal_planning_service.generate_meal_plan(
-            request.household_id,
-            request.weekly_context
-        )
+        # Days that can't be generated within the budget get fallback recipes;
+        # if the client leaves, generation stops and nothing is saved
+        with deadline_scope(MEAL_PLAN_DEADLINE_SECONDS):
+            meal_plan_id = await run_until_disconnected(
+                meal_planning_service.generate_meal_plan(
+                    request.household_id,
+                    request.weekly_context
+                ),
+                http_request.is_disconnected,
+                label="meal_plan"
+            )
         return {"meal_plan_id": meal_plan_id, "message": "Meal plan generated successfully"}
+    except ClientDisconnected:
+        return Response(status_code=CLIENT_CLOSED_REQUEST)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.post("/generate-comprehensive")
-async def generate_comprehensive_meal_plan(request: ComprehensiveMealPlanRequest):
+async def generate_comprehensive_meal_plan(request: ComprehensiveMealPlanRequest, http_request: Request):
     """Generate comprehensive meal plan using three-agent workflow"""
     try:
-        meal_plan = await create_comprehensive_meal_plan(
-            request.household_id,
-            request.chat_history,
-            request.household_profile
-        )
+        with deadline_scope(MEAL_PLAN_DEADLINE_SECONDS):
+            meal_plan = await run_until_disconnected(
+                create_comprehensive_meal_plan(
+                    request.household_id,
+                    request.chat_history,
+                    request.household_profile,
+                    request.weekly_constraints
+                ),
+                http_request.is_disconnected,
+                label="comprehensive_meal_plan"
+            )
         return meal_plan
+    except ClientDisconnected:
+        return Response(status_code=CLIENT_CLOSED_REQUEST)
+    except DeadlineExceeded as e:
+        print(f"⏱️ Comprehensive meal plan ran out of time: {e}")
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
         print(f"❌ Error in comprehensive meal plan generation: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def _sse(data: Dict[str, Any]) -> str:
+    return f"data: {json.dumps(data)}\n\n"
+
+def _stream_days(
+    produce: Callable[[Callable[[str, Dict[str, Any]], Awaitable[None]]], Awaitable[Dict[str, Any]]],
+    label: str
+) -> StreamingResponse:
+    """
+    Stream a meal plan as server-sent events: one {"day", "meal"} event as each
+    day is ready, then {"done": true, ...} with whatever `produce(on_day)`
+    returns. If the client goes away the generation is cancelled.
+    """
+
+    async def events() -> AsyncIterator[str]:
+        days: asyncio.Queue = asyncio.Queue()
+
+        async def on_day(day: str, meal: Dict[str, Any]) -> None:
+            await days.put((day, meal))
+
+        started = time.monotonic()
+        metrics.increment("meal_plan_stream.streams")
+        with deadline_scope(MEAL_PLAN_DEADLINE_SECONDS):
+            task = asyncio.create_task(produce(on_day))
+        getter = None
+        try:
+            sent = 0
+            while True:
+                getter = asyncio.create_task(days.get())
+                await asyncio.wait({getter, task}, return_when=asyncio.FIRST_COMPLETED)
+                if not getter.done():
+                    getter.cancel()
+                    break
+                day, meal = getter.result()
+                if not sent:
+                    metrics.increment("meal_plan_stream.first_days")
+                    metrics.increment("meal_plan_stream.first_day_seconds_total", time.monotonic() - started)
+                sent += 1
+                yield _sse({"day": day, "meal": meal})
+
+            # Days reported in the same step the work finished
+            while not days.empty():
+                day, meal = days.get_nowait()
+                sent += 1
+                yield _sse({"day": day, "meal": meal})
+            metrics.increment("meal_plan_stream.days", sent)
+
+            yield _sse({"done": True, **task.result()})
+        except DeadlineExceeded as e:
+            print(f"⏱️ Streamed {label} ran out of time: {e}")
+            yield _sse({"error": str(e), "status": 504})
+        except Exception as e:
+            print(f"❌ Streamed {label} failed: {e}")
+            yield _sse({"error": str(e), "status": 500})
+        finally:
+            if getter is not None and not getter.done():
+                getter.cancel()
+            # The client went away (or the stream broke) mid-plan: stop generating
+            if not task.done():
+                task.cancel()
+                metrics.increment(f"cancelled.requests.{label}")
+                print(f"🔌 Client left the {label} stream; generation cancelled")
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def meal_plan_stream_stats() -> Dict[str, Any]:
+    """Streamed plan counters, plus the average wait for the first day"""
+    stats: Dict[str, Any] = {
+        name[len("meal_plan_stream."):]: value for name, value in metrics.snapshot("meal_plan_stream.").items()
+    }
+    first_days = stats.get("first_days", 0)
+    if first_days:
+        stats["avg_first_day_seconds"] = round(stats.get("first_day_seconds_total", 0) / first_days, 3)
+    return stats
+
+@router.post("/generate/stream")
+async def stream_meal_plan(request: MealPlanRequest):
+    """
+    Generate a meal plan, streaming each day's meal (cached days first) as
+    soon as it's ready. The meal plan is saved once every day is present and
+    its id arrives in the final event.
+    """
+    async def produce(on_day):
+        meal_plan_id = await meal_planning_service.generate_meal_plan(
+            request.household_id,
+            request.weekly_context,
+            on_day=on_day
+        )
+        return {"meal_plan_id": meal_plan_id}
+
+    return _stream_days(produce, "meal_plan")
+
+@router.post("/generate-comprehensive/stream")
+async def stream_comprehensive_meal_plan(request: ComprehensiveMealPlanRequest):
+    """Three-agent workflow, streaming each day's menu entry as its recipe is ready"""
+    async def produce(on_day):
+        meal_plan = await create_comprehensive_meal_plan(
+            request.household_id,
+            request.chat_history,
+            request.household_profile,
+            request.weekly_constraints,
+            on_day=on_day
+        )
+        return {"meal_plan": meal_plan}
+
+    return _stream_days(produce, "comprehensive_meal_plan")
+
+def _job_status(job: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "job_id": job["id"],
+        "status": job["status"],
+        "days_completed": job["days_completed"],
+        "days_total": job["days_total"],
+        "completed_days": job["completed_days"],
+        "meal_plan_id": job["meal_plan_id"],
+        "error": job["error"],
+        "created_at": job["created_at"],
+        "updated_at": job["updated_at"],
+    }
+
+@router.get("/jobs/{job_id}")
+async def get_meal_plan_job(job_id: str):
+    """Progress of a queued meal plan generation"""
+    job = await meal_plan_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Meal plan job not found")
+    return _job_status(job)
+
 @router.get("/{meal_plan_id}")
 async def get_meal_plan(meal_plan_id: str):
     """Get a specific meal plan"""
@@ -51,6 +249,27 @@ async def get_meal_plan(meal_plan_id: str):
         raise HTTPException(status_code=404, detail="Meal plan not found")
     return meal_plan
 
+@router.patch("/{meal_plan_id}/days/{day}")
+async def regenerate_meal_plan_day(meal_plan_id: str, day: str, http_request: Request):
+    """Swap one day's meal for a new recipe and update the plan's grocery list"""
+    try:
+        with deadline_scope(MEAL_PLAN_DEADLINE_SECONDS):
+            result = await run_until_disconnected(
+                meal_planning_service.regenerate_day(meal_plan_id, day.lower()),
+                http_request.is_disconnected,
+                label="meal_plan_day"
+            )
+    except ClientDisconnected:
+        return Response(status_code=CLIENT_CLOSED_REQUEST)
+    except DeadlineExceeded as e:
+        raise HTTPException(status_code=504, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if not result:
+        raise HTTPException(status_code=404, detail="Meal plan not found")
+    return result
+
 @router.get("/household/{household_id}")
 async def get_household_meal_plans(household_id: str):
     """Get all meal plans for a household"""
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Bring existing recipes to the canonical spellings new saves use.
+
+Run once after migrations/add_recipe_requirement_key.sql. Cuisines and dietary
+tags go through the same alias tables as cache lookups
+(services/recipe_requirements.py), and rows without a requirement_key get one
+derived from the recipe, so the existing library is found by canonical keys.
+Safe to re-run: only rows that still differ are updated.
+
+    python scripts/backfill_recipe_requirements.py [--dry-run]
+"""
+
+import sys
+import asyncio
+from pathlib import Path
+
+# Add parent directory to path to import services
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from services.recipe_requirements import canonical_recipe_fields
+from services.repository import db
+
+BACKFILL_COLUMNS = "id, name, cuisine, meal_type, prep_time, cook_time, servings, dietary_tags, requirement_key"
+PAGE_SIZE = 500
+
+
+async def backfill(dry_run: bool = False) -> int:
+    """Canonicalize every recipe row; returns how many rows changed"""
+    changed = 0
+    last_id = None
+
+    while True:
+        query = db.table("recipes").select(BACKFILL_COLUMNS)
+        if last_id is not None:
+            query = query.gt("id", last_id)
+        rows = (await query.order("id").limit(PAGE_SIZE).execute()).data or []
+
+        for row in rows:
+            changes = canonical_recipe_fields(row)
+            if not changes:
+                continue
+            changed += 1
+            print(f"   {'Would update' if dry_run else 'Updating'} '{row.get('name')}': {changes}")
+            if not dry_run:
+                await db.table("recipes").update(changes).eq("id", row["id"]).execute()
+
+        if len(rows) < PAGE_SIZE:
+            return changed
+        last_id = rows[-1]["id"]
+
+
+async def main():
+    dry_run = "--dry-run" in sys.argv[1:]
+    print("🔧 Canonicalizing stored recipes" + (" (dry run)" if dry_run else ""))
+    changed = await backfill(dry_run)
+    print(f"✅ {changed} recipe(s) {'would change' if dry_run else 'updated'}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Measure how many concurrent database-backed requests one worker can serve,
+calling supabase-py directly on the event loop versus through the repository
+layer (services/repository.py).
+
+Usage:
+    python scripts/benchmark_db_access.py --requests 200 --concurrency 50 --table household_profiles
+"""
+
+import sys
+import time
+import asyncio
+import argparse
+from pathlib import Path
+
+# Add parent directory to path to import services
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from database import get_supabase_client
+from services.repository import Repository
+
+
+async def blocking_request(table: str):
+    # What the handlers used to do: a synchronous round trip inside `async def`
+    return get_supabase_client().table(table).select("id").limit(1).execute()
+
+
+def repository_request(repository: Repository):
+    async def request(table: str):
+        return await repository.table(table).select("id").limit(1).execute()
+    return request
+
+
+async def measure_loop_lag(stop: asyncio.Event) -> float:
+    """Worst delay seen by a 10ms ticker - how long the loop was unable to run other work"""
+    worst = 0.0
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(0.01)
+        worst = max(worst, time.perf_counter() - started - 0.01)
+    return worst
+
+
+async def run(name: str, request, table: str, total: int, concurrency: int) -> None:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one():
+        async with semaphore:
+            started = time.perf_counter()
+            await request(table)
+            latencies.append(time.perf_counter() - started)
+
+    stop = asyncio.Event()
+    lag_task = asyncio.create_task(measure_loop_lag(stop))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    worst_lag = await lag_task
+
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2]
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(
+        f"{name:<12} {total / elapsed:8.1f} req/s   p50 {p50 * 1000:7.1f}ms   "
+        f"p95 {p95 * 1000:7.1f}ms   worst loop stall {worst_lag * 1000:7.1f}ms"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--table", default="household_profiles")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=16, help="repository thread pool size")
+    args = parser.parse_args()
+
+    print(f"📊 {args.requests} reads from '{args.table}', {args.concurrency} concurrent\n")
+
+    # Warm up the HTTP connection so neither run pays for the TLS handshake
+    await blocking_request(args.table)
+
+    repository = Repository(max_workers=args.workers)
+    try:
+        await run("blocking", blocking_request, args.table, args.requests, args.concurrency)
+        await run("repository", repository_request(repository), args.table, args.requests, args.concurrency)
+    finally:
+        repository.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
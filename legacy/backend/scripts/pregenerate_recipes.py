@@ -13,7 +13,9 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from services.recipe_service import RecipeService
-from database import supabase
+from services.llm_gateway import close_gateway_client
+from services.llm_scheduler import Priority, priority_scope
+from services.repository import db
 
 # Recipe generation templates
 RECIPE_TEMPLATES = [
@@ -163,21 +165,24 @@ async def main():
     failed = 0
 
     # Check current recipe count
-    result = supabase.table("recipes").select("id").execute()
+    result = await db.table("recipes").select("id").execute()
     current_count = len(result.data) if result.data else 0
     print(f"📊 Current database has {current_count} recipes\n")
 
-    # Generate recipes
-    for i, template in enumerate(RECIPE_TEMPLATES):
-        success = await generate_recipe(recipe_service, template, i, len(RECIPE_TEMPLATES))
+    # Generate recipes at background priority; the LLM scheduler paces them and
+    # backs off on rate limits, so they only use spare gateway capacity
+    with priority_scope(Priority.BACKGROUND):
+        results = await asyncio.gather(*(
+            generate_recipe(recipe_service, template, i, len(RECIPE_TEMPLATES))
+            for i, template in enumerate(RECIPE_TEMPLATES)
+        ))
+
+    for success in results:
         if success:
             successful += 1
         else:
             failed += 1
 
-        # Small delay to avoid rate limiting
-        await asyncio.sleep(2)
-
     # Final report
     print("\n" + "=" * 60)
     print("📊 Generation Complete!")
@@ -187,6 +192,8 @@ async def main():
     print(f"📈 Total recipes in database: {current_count + successful}")
     print("=" * 60)
 
+    await close_gateway_client()
+
 
 if __name__ == "__main__":
     asyncio.run(main())
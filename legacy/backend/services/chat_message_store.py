@@ -0,0 +1,74 @@
+import os
+from typing import Any, Dict, List, Optional
+
+from services.repository import db
+from services import metrics
+
+# Most recent messages sent with each chat turn (the onboarding flow fits comfortably)
+CHAT_HISTORY_WINDOW = int(os.getenv("CHAT_HISTORY_WINDOW", "20"))
+
+# Session columns needed to run a turn; the legacy `messages` array is never read
+SESSION_COLUMNS = "id, session_type, household_id, completed, message_count"
+
+
+class ChatMessageStore:
+    """
+    Append-only chat log in the `chat_messages` table.
+
+    Each turn inserts only its new messages (sequence numbers continue from
+    the session's `message_count`) and prompts read only a recent window, so
+    a turn costs the same however long the conversation gets.
+    """
+
+    async def append(
+        self,
+        session_id: str,
+        start_sequence: int,
+        messages: List[Dict[str, str]]
+    ) -> int:
+        """Append messages starting at `start_sequence`; returns the new message count"""
+        if not messages:
+            return start_sequence
+
+        rows = [
+            {
+                "session_id": session_id,
+                "sequence": start_sequence + offset,
+                "role": message["role"],
+                "content": message["content"],
+            }
+            for offset, message in enumerate(messages)
+        ]
+        # (session_id, sequence) is unique, so a racing duplicate turn fails here
+        await db.table("chat_messages").insert(rows).execute()
+        metrics.increment("chat_messages.appended", len(rows))
+        return start_sequence + len(rows)
+
+    async def recent(self, session_id: str, limit: int) -> List[Dict[str, str]]:
+        """The last `limit` messages of a session, oldest first"""
+        result = await (
+            db.table("chat_messages")
+            .select("role, content")
+            .eq("session_id", session_id)
+            .order("sequence", desc=True)
+            .limit(limit)
+            .execute()
+        )
+        metrics.increment("chat_messages.read", len(result.data or []))
+        return list(reversed(result.data or []))
+
+    async def history(self, session_id: str, after_sequence: Optional[int] = None) -> List[Dict[str, str]]:
+        """Every message of a session (or those after `after_sequence`), oldest first"""
+        query = db.table("chat_messages").select("role, content").eq("session_id", session_id)
+        if after_sequence is not None:
+            query = query.gt("sequence", after_sequence)
+        result = await query.order("sequence").execute()
+        metrics.increment("chat_messages.read", len(result.data or []))
+        return result.data or []
+
+
+def message_count(session: Dict[str, Any]) -> int:
+    return session.get("message_count") or 0
+
+
+chat_message_store = ChatMessageStore()
@@ -0,0 +1,126 @@
+import os
+import asyncio
+import inspect
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from services.deadline import call_timeout
+from services import metrics
+
+# How often long-running routes check whether their client is still connected
+CLIENT_DISCONNECT_POLL_SECONDS = float(os.getenv("CLIENT_DISCONNECT_POLL_SECONDS", "1"))
+
+
+class ClientDisconnected(Exception):
+    """The HTTP client went away, so the work for it was cancelled"""
+
+
+async def run_bounded(
+    jobs: Dict[str, Callable[[], Awaitable[Any]]],
+    *,
+    limit: int,
+    timeout: Optional[float] = None,
+    on_result: Optional[Callable[[str, Any], Any]] = None
+) -> Dict[str, Any]:
+    """
+    Run keyed coroutine factories concurrently, at most `limit` at a time.
+
+    Each job gets its own `timeout` (measured from when it starts running, not
+    while it waits for a slot), capped by the request deadline if there is one;
+    a job whose turn comes after the deadline fails with DeadlineExceeded
+    without running. A failing or timed-out job does not affect its
+    siblings: its exception is returned in place of a result. If the caller is
+    cancelled (shutdown, client went away), every outstanding job is cancelled
+    before the cancellation propagates.
+
+    `on_result(key, result_or_exception)` (sync or async) is called as each
+    job finishes, e.g. to report progress; cancelled jobs aren't reported.
+
+    Results are returned in the same key order as `jobs`.
+    """
+    semaphore = asyncio.Semaphore(max(1, limit))
+
+    async def run_job(factory: Callable[[], Awaitable[Any]]) -> Any:
+        async with semaphore:
+            job_timeout = call_timeout(timeout, what="job")
+            if job_timeout is None:
+                return await factory()
+            return await asyncio.wait_for(factory(), timeout=job_timeout)
+
+    async def run_one(key: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+        try:
+            result = await run_job(factory)
+        except Exception as e:
+            await _notify(on_result, key, e)
+            raise
+        await _notify(on_result, key, result)
+        return result
+
+    tasks = {key: asyncio.ensure_future(run_one(key, factory)) for key, factory in jobs.items()}
+
+    try:
+        await asyncio.gather(*tasks.values(), return_exceptions=True)
+    except asyncio.CancelledError:
+        for task in tasks.values():
+            task.cancel()
+        await asyncio.gather(*tasks.values(), return_exceptions=True)
+        metrics.increment("cancelled.jobs", sum(1 for task in tasks.values() if task.cancelled()))
+        raise
+
+    results: Dict[str, Any] = {}
+    for key, task in tasks.items():
+        if task.cancelled():
+            results[key] = asyncio.CancelledError()
+        elif task.exception() is not None:
+            results[key] = task.exception()
+        else:
+            results[key] = task.result()
+
+    return results
+
+
+async def _notify(on_result: Optional[Callable[[str, Any], Any]], key: str, result: Any) -> None:
+    if on_result is None:
+        return
+    try:
+        outcome = on_result(key, result)
+        if inspect.isawaitable(outcome):
+            await outcome
+    except Exception as e:
+        # A broken progress callback must not fail the job itself
+        print(f"⚠️ Result callback for {key} failed: {e}")
+
+
+async def run_until_disconnected(
+    work: Awaitable[Any],
+    is_disconnected: Callable[[], Awaitable[bool]],
+    label: str
+) -> Any:
+    """
+    Await `work` while polling `is_disconnected` (e.g. Request.is_disconnected).
+    If the client goes away first, `work` is cancelled - and with it every LLM
+    call and job it is waiting on - and ClientDisconnected is raised.
+    """
+    task = asyncio.ensure_future(work)
+
+    async def watch() -> None:
+        while not await is_disconnected():
+            await asyncio.sleep(CLIENT_DISCONNECT_POLL_SECONDS)
+
+    watcher = asyncio.ensure_future(watch())
+    try:
+        await asyncio.wait({task, watcher}, return_when=asyncio.FIRST_COMPLETED)
+    except asyncio.CancelledError:
+        watcher.cancel()
+        task.cancel()
+        raise
+
+    if not task.done() and watcher.exception() is None:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        metrics.increment(f"cancelled.requests.{label}")
+        print(f"🔌 Client disconnected, cancelled {label}")
+        raise ClientDisconnected(label)
+
+    # Done, or the watcher itself failed: just wait for the work
+    watcher.cancel()
+    return await task
@@ -0,0 +1,64 @@
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from services import metrics
+
+# Total time a meal plan request may spend generating before days fall back
+MEAL_PLAN_DEADLINE_SECONDS = float(os.getenv("MEAL_PLAN_DEADLINE_SECONDS", "120"))
+
+# A gateway call isn't started with less budget left than this
+DEADLINE_MIN_CALL_SECONDS = float(os.getenv("DEADLINE_MIN_CALL_SECONDS", "3"))
+
+
+class DeadlineExceeded(TimeoutError):
+    """The request's time budget ran out before this work could finish"""
+
+
+# Absolute time.monotonic() deadline of the current request, if it has one
+_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+
+@contextmanager
+def deadline_scope(seconds: float):
+    """
+    Give everything run inside the block (including spawned tasks) at most
+    `seconds`. A nested scope can only shorten the deadline, never extend it.
+    """
+    deadline = time.monotonic() + seconds
+    current = _deadline.get()
+    token = _deadline.set(deadline if current is None else min(current, deadline))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """Seconds left in the current request's budget (None without a deadline)"""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def require(seconds: float, what: str) -> None:
+    """Raise DeadlineExceeded unless at least `seconds` of budget remain for `what`"""
+    left = remaining()
+    if left is not None and left < seconds:
+        metrics.increment("deadline.exceeded")
+        raise DeadlineExceeded(f"{what} needs ~{seconds:g}s but only {max(left, 0):.1f}s of the request budget is left")
+
+
+def call_timeout(default: Optional[float], minimum: float = 0.0, what: str = "call") -> Optional[float]:
+    """
+    Timeout for one call: `default`, capped by the remaining budget. Raises
+    DeadlineExceeded if less than `minimum` seconds remain.
+    """
+    left = remaining()
+    if left is None:
+        return default
+    require(max(minimum, 0.001), what)
+    return left if default is None else min(default, left)
@@ -1,11 +1,11 @@
-from typing import Dict, List, Any
-from database import get_supabase_client
+from typing import Dict, List, Any, Optional
+from services.repository import db
 import uuid
 import re
 
 class GroceryService:
     def __init__(self):
-        self.supabase = get_supabase_client()
+        self.db = db
 
         # Standard grocery store categories for organization
         self.categories = {
@@ -79,18 +79,8 @@ class GroceryService:
 
         return combined
 
-    async def generate_grocery_list(self, meal_plan_id: str) -> str:
-        """Generate and save grocery list for a meal plan"""
-
-        # Get meal plan
-        meal_plan_result = self.supabase.table("meal_plans").select("*").eq("id", meal_plan_id).execute()
-
-        if not meal_plan_result.data:
-            raise ValueError("Meal plan not found")
-
-        meal_plan = meal_plan_result.data[0]
-        meals = meal_plan["meals"]
-
+    def _build_items(self, meals: Dict[str, Any]) -> Dict[str, List[str]]:
+        """Categorized, combined shopping items for a plan's meals"""
         # Extract all ingredients
         all_ingredients = []
         for day, recipe in meals.items():
@@ -124,6 +114,19 @@ class GroceryService:
         for category in categorized_items:
             categorized_items[category].sort()
 
+        return categorized_items
+
+    async def generate_grocery_list(self, meal_plan_id: str) -> str:
+        """Generate and save grocery list for a meal plan"""
+
+        # Get meal plan
+        meal_plan_result = await self.db.table("meal_plans").select("*").eq("id", meal_plan_id).execute()
+
+        if not meal_plan_result.data:
+            raise ValueError("Meal plan not found")
+
+        categorized_items = self._build_items(meal_plan_result.data[0]["meals"])
+
         # Save grocery list to database
         grocery_list_data = {
             "id": str(uuid.uuid4()),
@@ -132,17 +135,29 @@ class GroceryService:
             "total_estimated_cost": None  # Could implement cost estimation later
         }
 
-        result = self.supabase.table("grocery_lists").insert(grocery_list_data).execute()
+        result = await self.db.table("grocery_lists").insert(grocery_list_data).execute()
 
         if result.data:
             return result.data[0]["id"]
         else:
             raise Exception("Failed to save grocery list")
 
+    async def refresh_grocery_list(self, meal_plan_id: str, meals: Dict[str, Any]) -> Optional[str]:
+        """
+        Rebuild the items of a meal plan's existing grocery list after its meals
+        changed, keeping the list's id. Returns None if the plan has no list yet.
+        """
+        existing = await self.get_grocery_list_by_meal_plan(meal_plan_id)
+        if not existing:
+            return None
+
+        await self.db.table("grocery_lists").update({"items": self._build_items(meals)}).eq("id", existing["id"]).execute()
+        return existing["id"]
+
     async def get_grocery_list(self, grocery_list_id: str) -> Dict[str, Any]:
         """Get grocery list by ID"""
 
-        result = self.supabase.table("grocery_lists").select("*").eq("id", grocery_list_id).execute()
+        result = await self.db.table("grocery_lists").select("*").eq("id", grocery_list_id).execute()
 
         if result.data:
             return result.data[0]
@@ -151,7 +166,7 @@ class GroceryService:
     async def get_grocery_list_by_meal_plan(self, meal_plan_id: str) -> Dict[str, Any]:
         """Get grocery list for a meal plan"""
 
-        result = self.supabase.table("grocery_lists").select("*").eq("meal_plan_id", meal_plan_id).execute()
+        result = await self.db.table("grocery_lists").select("*").eq("meal_plan_id", meal_plan_id).execute()
 
         if result.data:
             return result.data[0]
@@ -160,6 +175,6 @@ class GroceryService:
     async def delete_grocery_list(self, grocery_list_id: str) -> bool:
         """Delete grocery list"""
 
-        result = self.supabase.table("grocery_lists").delete().eq("id", grocery_list_id).execute()
+        result = await self.db.table("grocery_lists").delete().eq("id", grocery_list_id).execute()
 
         return bool(result.data)
\ No newline at end of file
@@ -0,0 +1,88 @@
+import os
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+# Rough token estimate for prompt accounting (no tokenizer dependency)
+CHARS_PER_TOKEN = 4
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# History token budget per chat type (system prompt and current message not included)
+HISTORY_TOKEN_BUDGETS = {
+    "onboarding": int(os.getenv("ONBOARDING_HISTORY_TOKEN_BUDGET", "1500")),
+    "weekly_planning": int(os.getenv("WEEKLY_PLANNING_HISTORY_TOKEN_BUDGET", "1200")),
+}
+
+# Most recent turns (user + assistant pairs) always kept verbatim, budget permitting
+HISTORY_VERBATIM_TURNS = {
+    "onboarding": int(os.getenv("ONBOARDING_HISTORY_VERBATIM_TURNS", "4")),
+    "weekly_planning": int(os.getenv("WEEKLY_PLANNING_HISTORY_VERBATIM_TURNS", "3")),
+}
+
+# Don't re-summarize until this many messages have aged out of the verbatim window
+SUMMARY_MIN_NEW_MESSAGES = int(os.getenv("HISTORY_SUMMARY_MIN_NEW_MESSAGES", "4"))
+
+
+@dataclass
+class RollingSummary:
+    text: str
+    through: int  # number of leading session messages the summary covers
+
+
+@dataclass
+class CompactedHistory:
+    messages: List[Dict[str, str]]
+    tokens_before: int
+    tokens_after: int
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.tokens_before - self.tokens_after
+
+
+def estimate_tokens(messages: List[Dict[str, str]]) -> int:
+    return sum(len(message.get("content") or "") // CHARS_PER_TOKEN + MESSAGE_OVERHEAD_TOKENS for message in messages)
+
+
+def verbatim_messages(chat_type: str) -> int:
+    return 2 * HISTORY_VERBATIM_TURNS.get(chat_type, 3)
+
+
+def compact_history(
+    chat_history: List[Dict[str, str]],
+    chat_type: str,
+    summary: Optional[RollingSummary] = None,
+    first_sequence: int = 0
+) -> CompactedHistory:
+    """
+    Fit `chat_history` (messages `first_sequence`.. of the session) into the
+    chat type's token budget: messages covered by the rolling summary are
+    replaced by it, the last turns are kept verbatim, and the oldest remaining
+    messages are dropped while over budget.
+    """
+    budget = HISTORY_TOKEN_BUDGETS.get(chat_type, 1500)
+    tokens_before = estimate_tokens(chat_history)
+
+    covered = max(0, min(len(chat_history), summary.through - first_sequence)) if summary else 0
+    # The summary never replaces the verbatim tail
+    covered = min(covered, max(0, len(chat_history) - verbatim_messages(chat_type)))
+
+    kept = chat_history[covered:]
+    prefix: List[Dict[str, str]] = []
+    if summary and summary.text:
+        prefix = [{"role": "system", "content": f"Summary of the earlier conversation:\n{summary.text}"}]
+
+    # Over budget: drop the oldest messages, always keeping the latest exchange
+    while len(kept) > 2 and estimate_tokens(prefix + kept) > budget:
+        kept = kept[1:]
+
+    compacted = prefix + kept
+    return CompactedHistory(messages=compacted, tokens_before=tokens_before, tokens_after=estimate_tokens(compacted))
+
+
+def summary_target(chat_type: str, message_count: int, summary: Optional[RollingSummary]) -> Optional[int]:
+    """How many leading messages the summary should cover now, or None if it's fresh enough"""
+    target = message_count - verbatim_messages(chat_type)
+    covered = summary.through if summary else 0
+    if target - covered < SUMMARY_MIN_NEW_MESSAGES:
+        return None
+    return target
@@ -1,12 +1,12 @@
 from typing import Optional, List
-from database import get_supabase_client
+from services.repository import db
 from models import HouseholdProfile
 import uuid
 from datetime import datetime
 
 class HouseholdService:
     def __init__(self):
-        self.supabase = get_supabase_client()
+        self.db = db
 
     async def create_household_profile(self, profile_data: dict) -> str:
         """Create a new household profile and return the ID"""
@@ -15,7 +15,7 @@ class HouseholdService:
         profile_data["created_at"] = datetime.now().isoformat()
         profile_data["updated_at"] = datetime.now().isoformat()
 
-        result = self.supabase.table("household_profiles").insert(profile_data).execute()
+        result = await self.db.table("household_profiles").insert(profile_data).execute()
 
         if result.data:
             return result.data[0]["id"]
@@ -25,7 +25,7 @@ class HouseholdService:
     async def get_household_profile(self, household_id: str) -> Optional[dict]:
         """Get household profile by ID"""
 
-        result = self.supabase.table("household_profiles").select("*").eq("id", household_id).execute()
+        result = await self.db.table("household_profiles").select("*").eq("id", household_id).execute()
 
         if result.data:
             return result.data[0]
@@ -34,7 +34,7 @@ class HouseholdService:
     async def get_household_profile_by_user_id(self, user_id: str) -> Optional[dict]:
         """Get household profile by user ID"""
 
-        result = self.supabase.table("household_profiles").select("*").eq("user_id", user_id).execute()
+        result = await self.db.table("household_profiles").select("*").eq("user_id", user_id).execute()
 
         if result.data:
             return result.data[0]
@@ -46,7 +46,7 @@ class HouseholdService:
         updates["updated_at"] = datetime.now().isoformat()
 
         print(f"🔄 Updating household profile {household_id} with updates: {updates}")
-        result = self.supabase.table("household_profiles").update(updates).eq("id", household_id).execute()
+        result = await self.db.table("household_profiles").update(updates).eq("id", household_id).execute()
         print(f"✅ Update result: {result.data}")
 
         return bool(result.data)
@@ -54,13 +54,13 @@ class HouseholdService:
     async def list_household_profiles(self) -> List[dict]:
         """List all household profiles (for admin/debug purposes)"""
 
-        result = self.supabase.table("household_profiles").select("*").execute()
+        result = await self.db.table("household_profiles").select("*").execute()
 
         return result.data or []
 
     async def delete_household_profile(self, household_id: str) -> bool:
         """Delete household profile and all related data"""
 
-        result = self.supabase.table("household_profiles").delete().eq("id", household_id).execute()
+        result = await self.db.table("household_profiles").delete().eq("id", household_id).execute()
 
         return bool(result.data)
\ No newline at end of file
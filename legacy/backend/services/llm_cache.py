@@ -0,0 +1,157 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+from services import metrics
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "512"))
+# Optional on-disk tier; leave unset to keep the cache purely in memory
+LLM_CACHE_DB_PATH = os.getenv("LLM_CACHE_DB_PATH")
+
+
+@dataclass(frozen=True)
+class CachePolicy:
+    """How a call site wants its chat completions cached"""
+    name: str
+    ttl_seconds: float
+    persist: bool = False  # also store in the on-disk tier
+
+
+# Deterministic extraction/parsing calls (temperature 0.1): safe to reuse for a day.
+# Creative calls (recipe generation, chat replies) are never cached: a repeated
+# prompt there means "another one", not "the same one again".
+EXTRACTION_CACHE = CachePolicy(name="extraction", ttl_seconds=24 * 3600, persist=True)
+
+
+def payload_key(payload: Dict[str, Any]) -> str:
+    """Canonical content hash of a JSON-serializable payload (e.g. model, messages, sampling params)"""
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class _DiskTier:
+    """SQLite-backed tier so cached responses survive restarts"""
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            "key TEXT PRIMARY KEY, policy TEXT NOT NULL, response TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Tuple[Dict[str, Any], float]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, expires_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] <= time.time():
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+        return json.loads(row[0]), row[1]
+
+    def set(self, key: str, policy: str, response: Dict[str, Any], expires_at: float) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, policy, response, expires_at) VALUES (?, ?, ?, ?)",
+                (key, policy, json.dumps(response), expires_at),
+            )
+            self._conn.commit()
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+
+
+class ResponseCache:
+    """
+    Two-tier cache of gateway responses keyed on `payload_key`:
+    an in-memory LRU with per-entry TTL, plus an optional SQLite tier.
+    """
+
+    def __init__(self, max_entries: int = LLM_CACHE_MAX_ENTRIES, db_path: Optional[str] = LLM_CACHE_DB_PATH):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[Dict[str, Any], float]]" = OrderedDict()
+        self._disk = _DiskTier(db_path) if db_path else None
+
+    async def get(self, key: str, policy: CachePolicy) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            response, expires_at = entry
+            if expires_at > time.time():
+                self._entries.move_to_end(key)
+                metrics.increment("llm_cache.memory_hit")
+                metrics.increment(f"llm_cache.{policy.name}.hit")
+                return response
+            del self._entries[key]
+
+        if self._disk is not None and policy.persist:
+            stored = await asyncio.to_thread(self._disk.get, key)
+            if stored is not None:
+                response, expires_at = stored
+                self._remember(key, response, expires_at)
+                metrics.increment("llm_cache.disk_hit")
+                metrics.increment(f"llm_cache.{policy.name}.hit")
+                return response
+
+        metrics.increment("llm_cache.miss")
+        metrics.increment(f"llm_cache.{policy.name}.miss")
+        return None
+
+    async def set(self, key: str, policy: CachePolicy, response: Dict[str, Any]) -> None:
+        expires_at = time.time() + policy.ttl_seconds
+        self._remember(key, response, expires_at)
+
+        if self._disk is not None and policy.persist:
+            try:
+                await asyncio.to_thread(self._disk.set, key, policy.name, response, expires_at)
+            except Exception as e:
+                print(f"⚠️ Failed to persist LLM cache entry: {e}")
+
+    async def delete(self, key: str) -> None:
+        """Drop an entry from both tiers (e.g. a response the caller couldn't use)"""
+        self._entries.pop(key, None)
+        if self._disk is not None:
+            try:
+                await asyncio.to_thread(self._disk.delete, key)
+            except Exception as e:
+                print(f"⚠️ Failed to delete LLM cache entry: {e}")
+
+    def _remember(self, key: str, response: Dict[str, Any], expires_at: float) -> None:
+        self._entries[key] = (response, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            metrics.increment("llm_cache.evicted")
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": LLM_CACHE_ENABLED,
+            "memory_entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "disk_entries": self._disk.count() if self._disk is not None else None,
+            "counters": metrics.snapshot("llm_cache."),
+        }
+
+
+response_cache = ResponseCache()
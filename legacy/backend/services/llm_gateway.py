@@ -1,10 +1,107 @@
 import os
-from typing import List, Dict, Any
+import json
+import asyncio
+import time
+from typing import List, Dict, Any, AsyncIterator, Optional
 
 import httpx
 
+from services.llm_cache import CachePolicy, LLM_CACHE_ENABLED, payload_key, response_cache
+from services.single_flight import SingleFlight
+from services.llm_scheduler import Priority, llm_scheduler
+from services.deadline import DEADLINE_MIN_CALL_SECONDS, DeadlineExceeded, call_timeout
+from services import metrics
+
 AI_GATEWAY_URL = os.getenv("AI_GATEWAY_URL", "http://localhost:8787")
 
+# Connection pool settings for the shared gateway client
+AI_GATEWAY_TIMEOUT = float(os.getenv("AI_GATEWAY_TIMEOUT", "60"))
+AI_GATEWAY_MAX_CONNECTIONS = int(os.getenv("AI_GATEWAY_MAX_CONNECTIONS", "32"))
+AI_GATEWAY_MAX_KEEPALIVE = int(os.getenv("AI_GATEWAY_MAX_KEEPALIVE", "16"))
+AI_GATEWAY_KEEPALIVE_EXPIRY = float(os.getenv("AI_GATEWAY_KEEPALIVE_EXPIRY", "60"))
+AI_GATEWAY_HTTP2 = os.getenv("AI_GATEWAY_HTTP2", "true").lower() == "true"
+AI_GATEWAY_WARM_CONNECTIONS = int(os.getenv("AI_GATEWAY_WARM_CONNECTIONS", "4"))
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+class GatewayError(RuntimeError):
+    """Non-2xx response from the AI gateway"""
+
+    def __init__(self, message: str, status_code: int):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+# Identical payloads that are in flight at the same time share one gateway call
+_in_flight = SingleFlight("chat_completion")
+
+
+def _http2_available() -> bool:
+    """HTTP/2 needs the optional `h2` package (installed via httpx[http2])"""
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def _build_client() -> httpx.AsyncClient:
+    # HTTP/2 is negotiated via ALPN, so it only kicks in for https gateways.
+    # Plain http gateways keep using pooled HTTP/1.1 keep-alive connections.
+    http2 = AI_GATEWAY_HTTP2 and _http2_available()
+
+    return httpx.AsyncClient(
+        base_url=AI_GATEWAY_URL.rstrip("/"),
+        http2=http2,
+        timeout=httpx.Timeout(AI_GATEWAY_TIMEOUT),
+        limits=httpx.Limits(
+            max_connections=AI_GATEWAY_MAX_CONNECTIONS,
+            max_keepalive_connections=AI_GATEWAY_MAX_KEEPALIVE,
+            keepalive_expiry=AI_GATEWAY_KEEPALIVE_EXPIRY,
+        ),
+    )
+
+
+def get_gateway_client() -> httpx.AsyncClient:
+    """Return the process-wide gateway client, creating it on first use"""
+    global _client
+
+    if _client is None or _client.is_closed:
+        _client = _build_client()
+
+    return _client
+
+
+async def start_gateway_client() -> None:
+    """Open the shared client and warm up pooled connections to the gateway"""
+    client = get_gateway_client()
+
+    # A single HTTP/2 connection multiplexes every request, so one warm-up is enough
+    warm_count = 1 if AI_GATEWAY_HTTP2 and _http2_available() else AI_GATEWAY_WARM_CONNECTIONS
+    if warm_count <= 0:
+        return
+
+    results = await asyncio.gather(
+        *(client.get("/health") for _ in range(warm_count)),
+        return_exceptions=True,
+    )
+
+    failures = [r for r in results if isinstance(r, Exception)]
+    if failures:
+        print(f"⚠️ AI gateway warm-up failed for {len(failures)}/{warm_count} connections: {failures[0]}")
+    else:
+        print(f"🔌 Warmed {warm_count} AI gateway connection(s) to {AI_GATEWAY_URL}")
+
+
+async def close_gateway_client() -> None:
+    """Close the shared client and release its pooled connections"""
+    global _client
+
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+    _client = None
+
 
 async def chat_completion(
     messages: List[Dict[str, str]],
@@ -12,10 +109,78 @@ async def chat_completion(
     model: str = "gpt-5-mini",
     provider: str = "openai",
     max_tokens: int | None = None,
-    temperature: float | None = None
+    temperature: float | None = None,
+    cache: CachePolicy | None = None,
+    priority: Priority | None = None
 ) -> Dict[str, Any]:
-    """Call the external AI gateway for a chat completion."""
+    """
+    Call the external AI gateway for a chat completion.
+
+    Pass a `cache` policy to reuse responses for identical payloads; calls
+    without one (e.g. conversational turns) always hit the gateway.
+    Calls are admitted by the LLM scheduler at `priority`, defaulting to the
+    priority of the surrounding `priority_scope`. Inside a `deadline_scope`
+    the call (queueing included) is bounded by the remaining budget, and
+    raises DeadlineExceeded rather than starting with almost none left.
+    """
+
+    payload = _completion_payload(messages, model, provider, max_tokens, temperature)
+    key = payload_key(payload)
+    use_cache = cache is not None and LLM_CACHE_ENABLED
+
+    if use_cache:
+        cached = await response_cache.get(key, cache)
+        if cached is not None:
+            return cached
+
+    timeout = call_timeout(AI_GATEWAY_TIMEOUT, minimum=DEADLINE_MIN_CALL_SECONDS, what="LLM call")
+
+    # The shared call always gets the full gateway timeout: it may be serving
+    # callers with more budget left. Each caller's deadline only bounds its own wait.
+    call = _in_flight.do(
+        key,
+        lambda: llm_scheduler.run(
+            provider,
+            model,
+            lambda: _post_completion(payload, key, cache if use_cache else None),
+            priority=priority,
+        ),
+    )
+    try:
+        if timeout >= AI_GATEWAY_TIMEOUT:
+            return await call
+        return await asyncio.wait_for(call, timeout=timeout)
+    except asyncio.TimeoutError:
+        metrics.increment("deadline.llm_call_timeouts")
+        raise DeadlineExceeded(f"LLM call ran out of the request budget ({timeout:.1f}s)")
+    except asyncio.CancelledError:
+        # Caller went away (client disconnect, shutdown); shared calls keep running for other waiters
+        metrics.increment("cancelled.llm_calls")
+        raise
+
 
+async def forget_completion(
+    messages: List[Dict[str, str]],
+    *,
+    model: str = "gpt-5-mini",
+    provider: str = "openai",
+    max_tokens: int | None = None,
+    temperature: float | None = None
+) -> None:
+    """
+    Drop the cached response for a chat_completion call, so a response the
+    caller couldn't use isn't served again
+    """
+    await response_cache.delete(payload_key(_completion_payload(messages, model, provider, max_tokens, temperature)))
+
+
+def _completion_payload(
+    messages: List[Dict[str, str]],
+    model: str,
+    provider: str,
+    max_tokens: int | None,
+    temperature: float | None
+) -> Dict[str, Any]:
     payload: Dict[str, Any] = {
         "model": model,
         "provider": provider,
@@ -28,20 +193,95 @@ async def chat_completion(
     if temperature is not None:
         payload["temperature"] = temperature
 
-    url = f"{AI_GATEWAY_URL.rstrip('/')}/v1/chat/completions"
+    return payload
+
+
+async def _post_completion(
+    payload: Dict[str, Any],
+    key: str,
+    cache: CachePolicy | None
+) -> Dict[str, Any]:
+    client = get_gateway_client()
 
-    async with httpx.AsyncClient(timeout=httpx.Timeout(60.0)) as client:
+    try:
+        response = await client.post("/v1/chat/completions", json=payload)
+        response.raise_for_status()
+    except httpx.HTTPStatusError as exc:
+        error_payload: Dict[str, Any] = {}
         try:
-            response = await client.post(url, json=payload)
-            response.raise_for_status()
-        except httpx.HTTPStatusError as exc:
-            error_payload: Dict[str, Any] = {}
-            try:
-                error_payload = exc.response.json()
-            except Exception:
-                error_payload = {"raw": exc.response.text}
-            raise RuntimeError(
-                f"AI gateway request failed with status {exc.response.status_code}: {error_payload}"
-            ) from exc
-
-        return response.json()
+            error_payload = exc.response.json()
+        except Exception:
+            error_payload = {"raw": exc.response.text}
+        raise GatewayError(
+            f"AI gateway request failed with status {exc.response.status_code}: {error_payload}",
+            status_code=exc.response.status_code,
+        ) from exc
+
+    result = response.json()
+
+    if cache is not None and result.get("message", {}).get("content"):
+        await response_cache.set(key, cache, result)
+
+    return result
+
+
+async def chat_completion_stream(
+    messages: List[Dict[str, str]],
+    *,
+    model: str = "gpt-5-mini",
+    provider: str = "openai",
+    max_tokens: int | None = None,
+    temperature: float | None = None,
+    priority: Priority | None = None
+) -> AsyncIterator[str]:
+    """
+    Stream a chat completion from the AI gateway, yielding text deltas as they arrive.
+
+    Scheduled like `chat_completion` (priority, defaulting to the surrounding
+    `priority_scope`). Inside a `deadline_scope` the whole stream, queueing
+    included, is bounded by the remaining budget and raises DeadlineExceeded
+    when it runs out.
+    """
+
+    payload = _completion_payload(messages, model, provider, max_tokens, temperature)
+    client = get_gateway_client()
+
+    budget = call_timeout(None, minimum=DEADLINE_MIN_CALL_SECONDS, what="LLM stream")
+    deadline_at = None if budget is None else time.monotonic() + budget
+
+    def time_left() -> float | None:
+        return None if deadline_at is None else max(0.0, deadline_at - time.monotonic())
+
+    try:
+        async with llm_scheduler.slot(provider, model, priority=priority, timeout=time_left()):
+            async with client.stream("POST", "/v1/chat/completions/stream", json=payload) as response:
+                if response.status_code >= 400:
+                    body = await response.aread()
+                    raise GatewayError(
+                        f"AI gateway stream failed with status {response.status_code}: {body.decode(errors='replace')}",
+                        status_code=response.status_code,
+                    )
+
+                lines = response.aiter_lines()
+                while True:
+                    try:
+                        line = await asyncio.wait_for(lines.__anext__(), timeout=time_left())
+                    except StopAsyncIteration:
+                        return
+                    if not line.startswith("data:"):
+                        continue
+
+                    event = json.loads(line[len("data:"):].strip())
+
+                    if "error" in event:
+                        raise GatewayError(
+                            f"AI gateway stream failed: {event.get('message', event['error'])}",
+                            status_code=event.get("status", 500),
+                        )
+                    if event.get("done"):
+                        return
+                    if event.get("delta"):
+                        yield event["delta"]
+    except asyncio.TimeoutError:
+        metrics.increment("deadline.llm_call_timeouts")
+        raise DeadlineExceeded(f"LLM stream ran out of the request budget ({budget:.1f}s)")
@@ -0,0 +1,228 @@
+import os
+import json
+import time
+import heapq
+import random
+import asyncio
+import itertools
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from enum import IntEnum
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from services import metrics
+
+
+class Priority(IntEnum):
+    """Scheduling class of an LLM call; lower values are served first"""
+    INTERACTIVE = 0       # chat turns a user is waiting on
+    PLAN_GENERATION = 1   # meal plan fan-outs
+    BACKGROUND = 2        # batch jobs such as recipe pre-generation
+
+
+# Adaptive concurrency per provider/model (AIMD)
+LLM_CONCURRENCY_INITIAL = int(os.getenv("LLM_CONCURRENCY_INITIAL", "8"))
+LLM_CONCURRENCY_MIN = int(os.getenv("LLM_CONCURRENCY_MIN", "1"))
+LLM_CONCURRENCY_MAX = int(os.getenv("LLM_CONCURRENCY_MAX", "32"))
+# Optional per-model caps, e.g. '{"openai/gpt-5-mini": 16}'
+LLM_CONCURRENCY_CAPS: Dict[str, int] = json.loads(os.getenv("LLM_CONCURRENCY_CAPS", "{}"))
+# Slots that non-interactive work may never take, so chat turns rarely queue
+LLM_INTERACTIVE_RESERVE = int(os.getenv("LLM_INTERACTIVE_RESERVE", "1"))
+
+# Retries on 429/5xx, with exponential backoff
+MAX_RETRIES = {
+    Priority.INTERACTIVE: 1,
+    Priority.PLAN_GENERATION: 2,
+    Priority.BACKGROUND: 5,
+}
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 30.0
+
+_current_priority: ContextVar[Priority] = ContextVar("llm_priority", default=Priority.INTERACTIVE)
+
+
+@contextmanager
+def priority_scope(priority: Priority):
+    """Run every LLM call made inside the block (including spawned tasks) at `priority`"""
+    token = _current_priority.set(priority)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+def current_priority() -> Priority:
+    return _current_priority.get()
+
+
+def is_overload_error(exc: BaseException) -> bool:
+    """Rate limits and server errors mean the provider wants us to slow down"""
+    status_code = getattr(exc, "status_code", None)
+    return status_code == 429 or (status_code is not None and 500 <= status_code < 600)
+
+
+class AdaptiveLimiter:
+    """
+    Priority-ordered concurrency limiter whose limit follows AIMD:
+    +1/limit per success, halved (at most once per cooldown) on overload.
+    """
+
+    def __init__(self, name: str, max_limit: int):
+        self.name = name
+        self.max_limit = max_limit
+        self.limit = float(min(LLM_CONCURRENCY_INITIAL, max_limit))
+        self.in_flight = 0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self._last_decrease = 0.0
+
+    def _capacity(self, priority: Priority) -> int:
+        capacity = max(1, int(self.limit))
+        if priority != Priority.INTERACTIVE:
+            capacity = max(1, capacity - LLM_INTERACTIVE_RESERVE)
+        return capacity
+
+    async def acquire(self, priority: Priority) -> None:
+        if not self._waiters and self.in_flight < self._capacity(priority):
+            self.in_flight += 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (int(priority), next(self._sequence), future))
+        # A higher-priority caller may fit where the queued ones don't (the
+        # interactive reserve): admit it now rather than at the next release
+        self._wake()
+        if future.done():
+            return
+        metrics.increment(f"llm_scheduler.{self.name}.queued")
+        started = time.monotonic()
+
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Slot was granted just as we were cancelled; give it back
+                self.release()
+            else:
+                future.cancel()
+            raise
+        finally:
+            metrics.increment(f"llm_scheduler.{self.name}.queue_wait_seconds", time.monotonic() - started)
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        self._wake()
+
+    def _wake(self) -> None:
+        while self._waiters:
+            priority, _, future = self._waiters[0]
+            if future.cancelled():
+                heapq.heappop(self._waiters)
+                continue
+            if self.in_flight >= self._capacity(Priority(priority)):
+                return
+            heapq.heappop(self._waiters)
+            self.in_flight += 1
+            future.set_result(None)
+
+    def on_success(self) -> None:
+        self.limit = min(float(self.max_limit), self.limit + 1.0 / max(self.limit, 1.0))
+        self._wake()
+
+    def on_overload(self) -> None:
+        now = time.monotonic()
+        # One decrease per cooldown: a burst of 429s from the same window counts once
+        if now - self._last_decrease < 1.0:
+            return
+        self._last_decrease = now
+        self.limit = max(float(LLM_CONCURRENCY_MIN), self.limit / 2)
+        metrics.increment(f"llm_scheduler.{self.name}.decreased")
+        print(f"⚠️ LLM overload on {self.name}, concurrency limit now {self.limit:.1f}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limit": round(self.limit, 2),
+            "max_limit": self.max_limit,
+            "in_flight": self.in_flight,
+            "queued": sum(1 for _, _, f in self._waiters if not f.cancelled()),
+        }
+
+
+class LLMScheduler:
+    """Admission control in front of the AI gateway, one limiter per provider/model"""
+
+    def __init__(self):
+        self._limiters: Dict[str, AdaptiveLimiter] = {}
+
+    def _limiter(self, provider: str, model: str) -> AdaptiveLimiter:
+        name = f"{provider}/{model}"
+        limiter = self._limiters.get(name)
+        if limiter is None:
+            limiter = AdaptiveLimiter(name, LLM_CONCURRENCY_CAPS.get(name, LLM_CONCURRENCY_MAX))
+            self._limiters[name] = limiter
+        return limiter
+
+    async def run(
+        self,
+        provider: str,
+        model: str,
+        factory: Callable[[], Awaitable[Any]],
+        priority: Optional[Priority] = None
+    ) -> Any:
+        priority = current_priority() if priority is None else priority
+        limiter = self._limiter(provider, model)
+        attempt = 0
+
+        while True:
+            await limiter.acquire(priority)
+            try:
+                result = await factory()
+            except Exception as exc:
+                if not is_overload_error(exc):
+                    raise
+                limiter.on_overload()
+                if attempt >= MAX_RETRIES[priority]:
+                    raise
+            else:
+                limiter.on_success()
+                return result
+            finally:
+                limiter.release()
+
+            attempt += 1
+            metrics.increment(f"llm_scheduler.{limiter.name}.retries")
+            delay = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** (attempt - 1))
+            await asyncio.sleep(delay * random.uniform(0.5, 1.0))
+
+    @asynccontextmanager
+    async def slot(
+        self,
+        provider: str,
+        model: str,
+        priority: Optional[Priority] = None,
+        timeout: Optional[float] = None
+    ) -> AsyncIterator[None]:
+        """
+        Hold one slot for the duration of the block (used for streamed calls, which are not retried).
+        `timeout` bounds only the wait in the queue; asyncio.TimeoutError if it runs out.
+        """
+        priority = current_priority() if priority is None else priority
+        limiter = self._limiter(provider, model)
+
+        await asyncio.wait_for(limiter.acquire(priority), timeout)
+        try:
+            yield
+        except Exception as exc:
+            if is_overload_error(exc):
+                limiter.on_overload()
+            raise
+        else:
+            limiter.on_success()
+        finally:
+            limiter.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {name: limiter.stats() for name, limiter in self._limiters.items()}
+
+
+llm_scheduler = LLMScheduler()
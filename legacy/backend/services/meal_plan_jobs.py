@@ -0,0 +1,335 @@
+import os
+import json
+import uuid
+import time
+import asyncio
+import fcntl
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from services.repository import db
+from services.meal_planning_service import MealPlanningService
+from services.deadline import MEAL_PLAN_DEADLINE_SECONDS, deadline_scope
+from services import metrics
+
+# Where queued jobs live: "memory" (lost on restart) or "sqlite" (a local file,
+# so queued and interrupted jobs resume after a restart). No broker either way:
+# a job file belongs to one process at a time, which runs every job in it.
+MEAL_PLAN_JOB_BACKEND = os.getenv("MEAL_PLAN_JOB_BACKEND", "memory").lower()
+MEAL_PLAN_JOB_DB_PATH = os.getenv("MEAL_PLAN_JOB_DB_PATH", "meal_plan_jobs.db")
+MEAL_PLAN_JOB_WORKERS = int(os.getenv("MEAL_PLAN_JOB_WORKERS", "2"))
+MEAL_PLAN_JOB_POLL_SECONDS = float(os.getenv("MEAL_PLAN_JOB_POLL_SECONDS", "1"))
+# How long the in-memory store keeps completed/failed jobs around for status polls
+MEAL_PLAN_JOB_RETENTION_SECONDS = float(os.getenv("MEAL_PLAN_JOB_RETENTION_SECONDS", "3600"))
+
+MEAL_PLAN_DAYS = 7
+
+JOB_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS meal_plan_jobs (
+    id TEXT PRIMARY KEY,
+    household_id TEXT NOT NULL,
+    weekly_context TEXT NOT NULL,
+    status TEXT NOT NULL,
+    days_total INTEGER NOT NULL,
+    days_completed INTEGER NOT NULL DEFAULT 0,
+    completed_days TEXT NOT NULL DEFAULT '[]',
+    meal_plan_id TEXT,
+    error TEXT,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+)
+"""
+
+JSON_FIELDS = ("weekly_context", "completed_days")
+TERMINAL_STATUSES = ("completed", "failed")
+
+
+class InProcessJobStore:
+    """
+    Jobs in a dict; fine for a single worker process that can lose queued jobs
+    on restart. Finished jobs are forgotten MEAL_PLAN_JOB_RETENTION_SECONDS
+    after they finish, so the dict doesn't grow for the life of the process.
+    """
+
+    name = "memory"
+
+    def __init__(self, retention_seconds: float = MEAL_PLAN_JOB_RETENTION_SECONDS):
+        self.retention_seconds = retention_seconds
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._finished: Dict[str, float] = {}  # job id -> monotonic finish time, oldest first
+
+    async def create(self, job: Dict[str, Any]) -> None:
+        self._evict()
+        self._jobs[job["id"]] = dict(job)
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        self._evict()
+        job = self._jobs.get(job_id)
+        return dict(job) if job else None
+
+    async def update(self, job_id: str, fields: Dict[str, Any]) -> None:
+        if job_id in self._jobs:
+            self._jobs[job_id].update(fields)
+            if fields.get("status") in TERMINAL_STATUSES:
+                self._finished[job_id] = time.monotonic()
+
+    def _evict(self) -> None:
+        cutoff = time.monotonic() - self.retention_seconds
+        for job_id, finished_at in list(self._finished.items()):
+            if finished_at > cutoff:
+                break
+            del self._finished[job_id]
+            self._jobs.pop(job_id, None)
+            metrics.increment("meal_plan_jobs.evicted")
+
+    async def claim_next(self) -> Optional[Dict[str, Any]]:
+        for job in self._jobs.values():  # insertion order = submission order
+            if job["status"] == "queued":
+                job["status"] = "running"
+                return dict(job)
+        return None
+
+    async def open(self) -> None:
+        pass
+
+    async def requeue_running(self) -> int:
+        return 0  # nothing survives a restart
+
+
+class SQLiteJobStore:
+    """Jobs in a local SQLite file, queried on the repository's thread pool"""
+
+    name = "sqlite"
+
+    def __init__(self, path: str = MEAL_PLAN_JOB_DB_PATH):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._owner = None  # open lock file while this process owns the job file
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(JOB_TABLE_SQL)
+        return self._conn
+
+    def _execute(self, sql: str, params: tuple = ()) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._connection().execute(sql, params).fetchall()
+        jobs = [dict(row) for row in rows]
+        for job in jobs:
+            for field in JSON_FIELDS:
+                if field in job:  # RETURNING may select only some columns
+                    job[field] = json.loads(job[field]) if job[field] else None
+        return jobs
+
+    async def _run(self, sql: str, params: tuple = ()) -> List[Dict[str, Any]]:
+        return await db.run(lambda: self._execute(sql, params), "meal_plan_jobs")
+
+    async def open(self) -> None:
+        """
+        Take ownership of the job file. Requeueing at startup treats every
+        running job as interrupted, which is only safe if no other process
+        is working on the same file.
+        """
+        if self._owner is not None:
+            return
+        owner = open(f"{self.path}.lock", "w")
+        try:
+            fcntl.flock(owner, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            owner.close()
+            raise RuntimeError(
+                f"Meal plan job file {self.path} is in use by another process; "
+                "give each process its own MEAL_PLAN_JOB_DB_PATH"
+            )
+        self._owner = owner
+
+    async def create(self, job: Dict[str, Any]) -> None:
+        row = {key: json.dumps(value) if key in JSON_FIELDS else value for key, value in job.items()}
+        columns = ", ".join(row)
+        await self._run(
+            f"INSERT INTO meal_plan_jobs ({columns}) VALUES ({', '.join('?' for _ in row)})",
+            tuple(row.values())
+        )
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        jobs = await self._run("SELECT * FROM meal_plan_jobs WHERE id = ?", (job_id,))
+        return jobs[0] if jobs else None
+
+    async def update(self, job_id: str, fields: Dict[str, Any]) -> None:
+        assignments = ", ".join(f"{key} = ?" for key in fields)
+        values = tuple(json.dumps(value) if key in JSON_FIELDS else value for key, value in fields.items())
+        await self._run(f"UPDATE meal_plan_jobs SET {assignments} WHERE id = ?", values + (job_id,))
+
+    async def claim_next(self) -> Optional[Dict[str, Any]]:
+        # One statement, so two of this process's workers never claim the same job
+        jobs = await self._run(
+            "UPDATE meal_plan_jobs SET status = 'running', updated_at = ? "
+            "WHERE id = (SELECT id FROM meal_plan_jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1) "
+            "RETURNING *",
+            (datetime.now().isoformat(),)
+        )
+        return jobs[0] if jobs else None
+
+    async def requeue_running(self) -> int:
+        """Jobs interrupted by a restart start over (the file is ours, see open())"""
+        jobs = await self._run(
+            "UPDATE meal_plan_jobs SET status = 'queued', days_completed = 0, completed_days = '[]' "
+            "WHERE status = 'running' RETURNING id"
+        )
+        return len(jobs)
+
+
+def create_job_store():
+    if MEAL_PLAN_JOB_BACKEND == "sqlite":
+        return SQLiteJobStore()
+    if MEAL_PLAN_JOB_BACKEND != "memory":
+        raise ValueError(f"Unknown MEAL_PLAN_JOB_BACKEND '{MEAL_PLAN_JOB_BACKEND}' (expected 'memory' or 'sqlite')")
+    return InProcessJobStore()
+
+
+class MealPlanJobQueue:
+    """
+    Background meal plan generation.
+
+    `submit()` records a job and returns at once; a pool of worker tasks in
+    this process claims queued jobs and runs
+    MealPlanningService.generate_meal_plan, updating the job's progress as each
+    day's meal is ready. The finished plan is saved as usual and its id stored
+    on the job.
+    """
+
+    def __init__(self, store=None, workers: int = MEAL_PLAN_JOB_WORKERS):
+        self.store = store or create_job_store()
+        self.workers = workers
+        self.meal_planning_service = MealPlanningService()
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+
+    async def start(self) -> None:
+        if self._tasks:
+            return
+        await self.store.open()
+        requeued = await self.store.requeue_running()
+        if requeued:
+            print(f"🔁 Re-queued {requeued} interrupted meal plan job(s)")
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(max(1, self.workers))]
+        print(f"👷 Started {len(self._tasks)} meal plan worker(s) ({self.store.name} job store)")
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(self, household_id: str, weekly_context: Dict[str, Any]) -> Dict[str, Any]:
+        now = datetime.now().isoformat()
+        job = {
+            "id": str(uuid.uuid4()),
+            "household_id": household_id,
+            "weekly_context": weekly_context,
+            "status": "queued",
+            "days_total": MEAL_PLAN_DAYS,
+            "days_completed": 0,
+            "completed_days": [],
+            "meal_plan_id": None,
+            "error": None,
+            "created_at": now,
+            "updated_at": now,
+        }
+        await self.store.create(job)
+        metrics.increment("meal_plan_jobs.submitted")
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return job
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await self.store.get(job_id)
+
+    async def _worker(self) -> None:
+        while True:
+            try:
+                job = await self.store.claim_next()
+            except Exception as e:
+                print(f"⚠️ Failed to claim a meal plan job: {e}")
+                job = None
+
+            if job is None:
+                # Poll as well, so a failed claim is retried without a new submission
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=MEAL_PLAN_JOB_POLL_SECONDS)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+                continue
+
+            try:
+                await self._run(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Usually the store failing to record the outcome; the job stays
+                # running until the next restart requeues it, but the worker lives on
+                print(f"⚠️ Meal plan job {job['id']} couldn't be recorded: {e}")
+                metrics.increment("meal_plan_jobs.worker_errors")
+
+    async def _run(self, job: Dict[str, Any]) -> None:
+        job_id = job["id"]
+        completed: List[str] = []
+        progress_lock = asyncio.Lock()
+
+        async def on_day(day: str, meal: Dict[str, Any]) -> None:
+            # Serialized so progress never goes backwards in the store
+            async with progress_lock:
+                completed.append(day)
+                await self.store.update(job_id, {
+                    "days_completed": len(completed),
+                    "completed_days": list(completed),
+                    "updated_at": datetime.now().isoformat(),
+                })
+
+        print(f"🍳 Running meal plan job {job_id} for household {job['household_id']}")
+        try:
+            with deadline_scope(MEAL_PLAN_DEADLINE_SECONDS):
+                meal_plan_id = await self.meal_planning_service.generate_meal_plan(
+                    job["household_id"],
+                    job["weekly_context"],
+                    on_day=on_day
+                )
+        except asyncio.CancelledError:
+            # Shutting down: a persistent store hands the job to the next start
+            # (which requeues it anyway if this update doesn't make it)
+            try:
+                await self.store.update(job_id, {"status": "queued", "updated_at": datetime.now().isoformat()})
+            except Exception as e:
+                print(f"⚠️ Couldn't requeue meal plan job {job_id} on shutdown: {e}")
+            raise
+        except Exception as e:
+            print(f"❌ Meal plan job {job_id} failed: {e}")
+            metrics.increment("meal_plan_jobs.failed")
+            await self.store.update(job_id, {"status": "failed", "error": str(e), "updated_at": datetime.now().isoformat()})
+            return
+
+        metrics.increment("meal_plan_jobs.completed")
+        await self.store.update(job_id, {
+            "status": "completed",
+            "meal_plan_id": meal_plan_id,
+            "updated_at": datetime.now().isoformat(),
+        })
+        print(f"✅ Meal plan job {job_id} completed: {meal_plan_id}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.store.name,
+            "workers": len(self._tasks),
+            "counters": metrics.snapshot("meal_plan_jobs."),
+        }
+
+
+meal_plan_jobs = MealPlanJobQueue()
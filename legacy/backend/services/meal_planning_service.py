@@ -1,10 +1,41 @@
 import json
-from typing import Dict, List, Any
+import os
+import time
+import asyncio
+import weakref
+from typing import Awaitable, Callable, Dict, List, Any, Optional
 from datetime import datetime, timedelta
-from database import get_supabase_client
+from services.repository import db
 from services.recipe_service import RecipeService
+from services.grocery_service import GroceryService
+from services.concurrency import run_bounded
+from services.llm_scheduler import Priority, priority_scope
+from services import metrics
 import uuid
-import asyncio
+import functools
+
+# How many days of a plan may be generated at once, and how long each day may take
+MEAL_PLAN_CONCURRENCY = int(os.getenv("MEAL_PLAN_CONCURRENCY", "4"))
+MEAL_PLAN_DAY_TIMEOUT = float(os.getenv("MEAL_PLAN_DAY_TIMEOUT", "90"))
+
+# Cached recipe picks steer away from the household's last N plans (instant
+# plans avoid those recipes outright)
+RECENT_PLAN_WEEKS = int(os.getenv("RECENT_PLAN_WEEKS", "3"))
+
+PLAN_DAYS = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
+
+# Per-plan locks serializing read-modify-write of a plan's meals (and the grocery
+# list refresh that follows), so concurrent swaps of different days don't
+# overwrite each other. Unrelated plans never wait on each other; a lock goes
+# away once nobody holds or awaits it.
+_meals_write_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+
+def _meals_write_lock(meal_plan_id: str) -> asyncio.Lock:
+    lock = _meals_write_locks.get(meal_plan_id)
+    if lock is None:
+        lock = _meals_write_locks[meal_plan_id] = asyncio.Lock()
+    return lock
 
 MEAL_PLANNING_PROMPT = """
 You are an expert meal planner. Create a 7-day dinner meal plan based on the household profile and weekly context provided.
@@ -45,53 +76,86 @@ Respond with a JSON object in this exact format:
 """
 
 class MealPlanningService:
-    def __init__(self):
-        self.supabase = get_supabase_client()
+    def __init__(self, max_concurrency: Optional[int] = None, day_timeout: Optional[float] = None):
+        self.db = db
         self.recipe_service = RecipeService()
+        self.grocery_service = GroceryService()
+        self.max_concurrency = max_concurrency or MEAL_PLAN_CONCURRENCY
+        self.day_timeout = day_timeout or MEAL_PLAN_DAY_TIMEOUT
+
+    async def generate_meal_plan(
+        self,
+        household_id: str,
+        weekly_context: Dict[str, Any],
+        on_day: Optional[Callable[[str, Dict[str, Any]], Awaitable[None]]] = None,
+        instant: bool = False
+    ) -> str:
+        """
+        Generate a meal plan for a household using RecipeAgent and save it to the database
+
+        `on_day(day, meal)` is awaited as each day's meal is ready (fallbacks included).
+        With `instant`, the plan is assembled from the recipe library only
+        (see assemble_instant_meal_plan).
+        """
+        if instant:
+            return (await self.assemble_instant_meal_plan(household_id, weekly_context, on_day=on_day))["meal_plan_id"]
+
+        household_profile = await self._household_profile(household_id)
+        history = await self._recent_recipes(household_id)
+
+        # Meal slot for each day, with cuisine variety across the week
+        days = PLAN_DAYS
+        slots = {day: self._meal_slot(day, household_profile, weekly_context) for day in days}
+
+        ready = {}
+
+        async def day_done(day: str, result: Any) -> None:
+            ready[day] = self._meal_for_day(day, result, household_profile)
+            if on_day is not None:
+                await on_day(day, ready[day])
+
+        # Cached days take milliseconds: serve them all before any generation
+        # starts, instead of letting them queue behind generated days for a slot.
+        # One at a time, so each pick can steer away from the days before it.
+        for day in days:
+            try:
+                recipe = await self.recipe_service.get_cached_recipe_for_meal_slot(
+                    **slots[day],
+                    exclude=list(ready.values()),
+                    history=history
+                )
+            except Exception as e:
+                print(f"⚠️ Cache lookup for {day} failed: {e}")
+                continue
+            if recipe is not None:
+                await day_done(day, recipe)
+
+        # Generate recipes for the remaining days using RecipeAgent, steering
+        # away from the cached days and the household's recent plans
+        cached_days = list(ready.values())
+        recipe_jobs = {
+            day: functools.partial(
+                self.recipe_service.get_recipe_for_meal_slot, **slots[day], exclude=cached_days, history=history
+            )
+            for day in days
+            if day not in ready
+        }
 
-    async def generate_meal_plan(self, household_id: str, weekly_context: Dict[str, Any]) -> str:
-        """Generate a meal plan for a household using RecipeAgent and save it to the database"""
-
-        # Get household profile
-        household_result = self.supabase.table("household_profiles").select("*").eq("id", household_id).execute()
-
-        if not household_result.data:
-            raise ValueError("Household profile not found")
-
-        household_profile = household_result.data[0]
-
-        # Define days and plan variety
-        days = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
-        favorite_cuisines = household_profile.get('favorite_cuisines', [])
-
-        # Create cuisine plan with variety
-        cuisine_plan = self._plan_cuisine_variety(favorite_cuisines, weekly_context)
+        # Execute all recipe generation tasks concurrently (bounded, with a per-day
+        # timeout, all within the request's deadline)
+        with priority_scope(Priority.PLAN_GENERATION):
+            results = await run_bounded(recipe_jobs, limit=self.max_concurrency, timeout=self.day_timeout, on_result=day_done)
 
-        # Generate recipes for each day using RecipeAgent
-        meals = {}
-        recipe_tasks = []
+        # Every day is present before the plan row is written
+        meals = {
+            day: ready[day] if day in ready else self._meal_for_day(day, results[day], household_profile)
+            for day in days
+        }
 
-        for i, day in enumerate(days):
-            cuisine = cuisine_plan[i] if i < len(cuisine_plan) else "comfort"
-            special_requirements = self._get_day_requirements(day, weekly_context)
+        return await self._save_meal_plan(household_id, weekly_context, meals)
 
-            recipe_task = self.recipe_service.get_recipe_for_meal_slot(
-                meal_type="dinner",
-                cuisine=cuisine,
-                household_profile=household_profile,
-                special_requirements=special_requirements
-            )
-            recipe_tasks.append((day, recipe_task))
-
-        # Execute all recipe generation tasks concurrently
-        for day, recipe_task in recipe_tasks:
-            try:
-                recipe = await recipe_task
-                meals[day] = recipe
-            except Exception as e:
-                print(f"Failed to generate recipe for {day}: {e}")
-                # Fallback to a simple recipe if RecipeAgent fails
-                meals[day] = self._create_fallback_recipe(day, household_profile)
+    async def _save_meal_plan(self, household_id: str, weekly_context: Dict[str, Any], meals: Dict[str, Any]) -> str:
+        """Insert a complete week of meals as a new plan starting next Monday"""
 
         # Calculate week start date (next Monday)
         today = datetime.now().date()
@@ -117,17 +181,191 @@ class MealPlanningService:
                     recipe = meal['recipe']
                     print(f"      recipe keys: {list(recipe.keys()) if isinstance(recipe, dict) else 'not a dict'}")
 
-        result = self.supabase.table("meal_plans").insert(meal_plan_data).execute()
+        result = await self.db.table("meal_plans").insert(meal_plan_data).execute()
 
         if result.data:
             return result.data[0]["id"]
         else:
             raise Exception("Failed to save meal plan")
 
+    async def _household_profile(self, household_id: str) -> Dict[str, Any]:
+        household_result = await self.db.table("household_profiles").select("*").eq("id", household_id).execute()
+
+        if not household_result.data:
+            raise ValueError("Household profile not found")
+
+        return household_result.data[0]
+
+    async def assemble_instant_meal_plan(
+        self,
+        household_id: str,
+        weekly_context: Dict[str, Any],
+        on_day: Optional[Callable[[str, Dict[str, Any]], Awaitable[None]]] = None
+    ) -> Dict[str, Any]:
+        """
+        Build and save a meal plan purely from the cached recipe library, with
+        no LLM calls: for returning households, or when generation is
+        overloaded. Each day uses the same slot as a generated plan (dietary
+        restrictions, time limits, cuisine rotation) and avoids recipes from
+        the household's recent plans; soft constraints are relaxed only when
+        the library has nothing that fits. A day with no usable library
+        recipe gets the fallback recipe.
+
+        Returns the meal_plan_id, the constraints relaxed for each day, and
+        the days worth upgrading with a fresh recipe (see upgrade_days).
+        """
+        started = time.monotonic()
+        household_profile = await self._household_profile(household_id)
+        recent = await self._recent_recipes(household_id)
+
+        # Pick days in order so no recipe is used twice in the week
+        chosen: Dict[str, Dict[str, Any]] = {}
+        relaxed: Dict[str, List[str]] = {}
+        for day in PLAN_DAYS:
+            summary, relaxed[day] = await self.recipe_service.find_library_recipe(
+                **self._meal_slot(day, household_profile, weekly_context),
+                week=list(chosen.values()),
+                recent=recent
+            )
+            if summary is not None:
+                chosen[day] = summary
+
+        recipes = await asyncio.gather(*(self.recipe_service.load_recipe(summary["id"]) for summary in chosen.values()))
+        loaded = dict(zip(chosen, recipes))
+
+        meals = {}
+        for day in PLAN_DAYS:
+            recipe = loaded.get(day)
+            if recipe is None:
+                relaxed[day] = ["library"]
+                metrics.increment("meal_plan.day_fallbacks")
+                recipe = self._create_fallback_recipe(day, household_profile)
+            meals[day] = recipe
+            for constraint in relaxed[day]:
+                metrics.increment(f"instant_plan.relaxed.{constraint}")
+            if on_day is not None:
+                await on_day(day, recipe)
+
+        meal_plan_id = await self._save_meal_plan(household_id, weekly_context, meals)
+
+        metrics.increment("instant_plan.plans")
+        metrics.increment("instant_plan.seconds", time.monotonic() - started)
+        upgradable = [day for day in PLAN_DAYS if relaxed[day]]
+        print(f"⚡ Instant meal plan {meal_plan_id} assembled from the library; relaxed days: {upgradable or 'none'}")
+
+        return {
+            "meal_plan_id": meal_plan_id,
+            "relaxed": {day: constraints for day, constraints in relaxed.items() if constraints},
+            "upgradable_days": upgradable,
+        }
+
+    async def _recent_recipes(self, household_id: str) -> List[Dict[str, Any]]:
+        """Recipes served in the household's most recent plans"""
+        result = await self.db.table("meal_plans").select("meals").eq("household_id", household_id).order("created_at", desc=True).limit(RECENT_PLAN_WEEKS).execute()
+
+        return [
+            meal
+            for plan in result.data or []
+            for meal in (plan.get("meals") or {}).values()
+            if isinstance(meal, dict) and meal.get("id")
+        ]
+
+    async def upgrade_days(self, meal_plan_id: str, days: List[str]) -> None:
+        """
+        Replace the given days of a plan with freshly generated recipes, at
+        background priority (meant to run after an instant plan was returned).
+        One day at a time, so each new recipe knows about the ones before it.
+        """
+        for day in days:
+            try:
+                await asyncio.wait_for(
+                    self.regenerate_day(meal_plan_id, day, priority=Priority.BACKGROUND),
+                    timeout=self.day_timeout
+                )
+                metrics.increment("instant_plan.days_upgraded")
+            except Exception as e:
+                print(f"⚠️ Couldn't upgrade {day} of meal plan {meal_plan_id}: {type(e).__name__}: {e}")
+
+    async def regenerate_day(
+        self,
+        meal_plan_id: str,
+        day: str,
+        priority: Priority = Priority.INTERACTIVE
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Replace one day's meal in an existing plan, and refresh the plan's
+        grocery list if it has one. Uses the same slot as the original plan
+        (household profile, weekly context, cuisine rotation) and avoids the
+        recipes already in the week, so it costs at most one recipe
+        generation. Returns None if the plan doesn't exist.
+        """
+        if day not in PLAN_DAYS:
+            raise ValueError(f"Unknown day '{day}' (expected one of {', '.join(PLAN_DAYS)})")
+
+        meal_plan = await self.get_meal_plan(meal_plan_id)
+        if not meal_plan:
+            return None
+
+        household_profile = await self._household_profile(meal_plan["household_id"])
+
+        weekly_context = meal_plan.get("weekly_context") or {}
+        if isinstance(weekly_context, str):
+            weekly_context = json.loads(weekly_context)
+
+        # The rest of the week, plus the meal being replaced
+        week = [meal for meal in (meal_plan.get("meals") or {}).values() if isinstance(meal, dict)]
+
+        print(f"🔄 Regenerating {day} of meal plan {meal_plan_id}")
+        with priority_scope(priority):
+            meal = await self.recipe_service.get_recipe_for_meal_slot(
+                **self._meal_slot(day, household_profile, weekly_context),
+                exclude=week,
+                history=await self._recent_recipes(meal_plan["household_id"])
+            )
+        metrics.increment("meal_plan.days_regenerated")
+
+        async with _meals_write_lock(meal_plan_id):
+            # Re-read so a concurrent swap of another day isn't lost
+            current = await self.get_meal_plan(meal_plan_id)
+            if not current:
+                return None
+            meals = dict(current.get("meals") or {})
+            meals[day] = meal
+            await self.db.table("meal_plans").update({"meals": meals}).eq("id", meal_plan_id).execute()
+
+            # Under the lock too, so a list built from an older week can't land last
+            grocery_list_id = await self.grocery_service.refresh_grocery_list(meal_plan_id, meals)
+
+        return {"meal_plan_id": meal_plan_id, "day": day, "meal": meal, "grocery_list_id": grocery_list_id}
+
+    def _meal_slot(self, day: str, household_profile: Dict[str, Any], weekly_context: Dict[str, Any]) -> Dict[str, Any]:
+        """get_recipe_for_meal_slot arguments for one day of the plan"""
+        cuisine_plan = self._plan_cuisine_variety(household_profile.get('favorite_cuisines', []), weekly_context)
+        i = PLAN_DAYS.index(day)
+        return {
+            "meal_type": "dinner",
+            "cuisine": cuisine_plan[i] if i < len(cuisine_plan) else "comfort",
+            "household_profile": household_profile,
+            "special_requirements": self._get_day_requirements(day, weekly_context),
+        }
+
+    def _meal_for_day(self, day: str, result: Any, household_profile: Dict[str, Any]) -> Dict[str, Any]:
+        """A day's generated recipe, or the fallback if generation failed or ran out of time"""
+        if isinstance(result, TimeoutError):
+            print(f"⏱️ Out of time for {day}'s recipe, using fallback: {result or 'day timeout'}")
+        elif isinstance(result, BaseException):
+            print(f"Failed to generate recipe for {day}: {type(result).__name__}: {result}")
+        else:
+            return result
+
+        # Fallback to a simple recipe if RecipeAgent fails
+        metrics.increment("meal_plan.day_fallbacks")
+        return self._create_fallback_recipe(day, household_profile)
+
     async def get_meal_plan(self, meal_plan_id: str) -> Dict[str, Any]:
         """Get meal plan by ID"""
 
-        result = self.supabase.table("meal_plans").select("*").eq("id", meal_plan_id).execute()
+        result = await self.db.table("meal_plans").select("*").eq("id", meal_plan_id).execute()
 
         if result.data:
             return result.data[0]
@@ -136,14 +374,14 @@ class MealPlanningService:
     async def get_household_meal_plans(self, household_id: str) -> List[Dict[str, Any]]:
         """Get all meal plans for a household"""
 
-        result = self.supabase.table("meal_plans").select("*").eq("household_id", household_id).order("created_at", desc=True).execute()
+        result = await self.db.table("meal_plans").select("*").eq("household_id", household_id).order("created_at", desc=True).execute()
 
         return result.data or []
 
     async def delete_meal_plan(self, meal_plan_id: str) -> bool:
         """Delete meal plan"""
 
-        result = self.supabase.table("meal_plans").delete().eq("id", meal_plan_id).execute()
+        result = await self.db.table("meal_plans").delete().eq("id", meal_plan_id).execute()
 
         return bool(result.data)
 
@@ -0,0 +1,30 @@
+import threading
+from collections import defaultdict
+from typing import Dict, Optional
+
+# Process-local counters, exposed through the /debug/metrics endpoint.
+# Names are dotted, e.g. "llm_cache.memory_hit".
+_counters: Dict[str, float] = defaultdict(float)
+_lock = threading.Lock()
+
+
+def increment(name: str, value: float = 1) -> None:
+    """Add `value` to the named counter"""
+    with _lock:
+        _counters[name] += value
+
+
+def get(name: str) -> float:
+    """Current value of a counter (0 if it was never incremented)"""
+    with _lock:
+        return _counters.get(name, 0)
+
+
+def snapshot(prefix: Optional[str] = None) -> Dict[str, float]:
+    """Copy of all counters, optionally limited to names starting with `prefix`"""
+    with _lock:
+        return {
+            name: value
+            for name, value in sorted(_counters.items())
+            if prefix is None or name.startswith(prefix)
+        }
@@ -0,0 +1,368 @@
+import os
+import bisect
+import asyncio
+import heapq
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from services.repository import db
+from services import metrics
+from services.recipe_requirements import (
+    CanonicalRequirements,
+    dislike_terms,
+    normalize_cuisine,
+    normalize_meal_type,
+    normalize_tags,
+)
+
+RECIPE_INDEX_ENABLED = os.getenv("RECIPE_INDEX_ENABLED", "true").lower() == "true"
+RECIPE_INDEX_REFRESH_SECONDS = float(os.getenv("RECIPE_INDEX_REFRESH_SECONDS", "60"))
+RECIPE_INDEX_PAGE_SIZE = 500
+
+# Lightweight columns the index needs; full_recipe_json is fetched only for chosen hits
+INDEX_COLUMNS = (
+    "id, name, cuisine, meal_type, total_time, difficulty, dietary_tags, "
+    "primary_protein, main_ingredients, times_used, average_rating, requirement_key, updated_at"
+)
+
+
+@dataclass
+class IndexedRecipe:
+    id: str
+    name: str
+    cuisine: Optional[str]
+    meal_type: Optional[str]
+    total_time: Optional[int]
+    difficulty: Optional[str]
+    dietary_tags: List[str]
+    dietary_mask: int
+    primary_protein: Optional[str]
+    main_ingredients: List[str] = field(default_factory=list)
+    times_used: int = 0
+    average_rating: float = 0.0
+    requirement_key: Optional[str] = None
+    updated_at: Optional[str] = None
+
+    def popularity_key(self) -> Tuple[int, float]:
+        # Most used first, then best rated (matches `order("times_used", desc=True)`)
+        return (-self.times_used, -self.average_rating)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "name": self.name,
+            "cuisine": self.cuisine,
+            "meal_type": self.meal_type,
+            "total_time": self.total_time,
+            "difficulty": self.difficulty,
+            "dietary_tags": self.dietary_tags,
+            "primary_protein": self.primary_protein,
+            "main_ingredients": self.main_ingredients,
+            "times_used": self.times_used,
+        }
+
+    def mentions_any(self, terms: Iterable[str]) -> bool:
+        text = " ".join([self.name.lower(), self.primary_protein or "", *self.main_ingredients]).lower()
+        return any(term in text for term in terms)
+
+
+class RecipeIndex:
+    """
+    In-memory index over the `recipes` table.
+
+    Hash indexes on cuisine / meal_type / primary_protein, a sorted total_time
+    index, dietary tags as bitmasks and popularity ordering. Loaded at startup
+    and refreshed incrementally by `updated_at`.
+    """
+
+    def __init__(self):
+        self.loaded = False
+        self._recipes: Dict[str, IndexedRecipe] = {}
+        self._by_cuisine: Dict[str, Set[str]] = {}
+        self._by_meal_type: Dict[str, Set[str]] = {}
+        self._by_protein: Dict[str, Set[str]] = {}
+        self._by_requirement_key: Dict[str, Set[str]] = {}
+        self._by_time: List[Tuple[int, str]] = []
+        self._tag_bits: Dict[str, int] = {}
+        self._high_water: Optional[str] = None
+        self._high_water_id: Optional[str] = None  # last id read at the high-water timestamp
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._recipes)
+
+    # ---------- loading ----------
+
+    async def start(self) -> None:
+        """Load the index and keep it fresh in the background"""
+        if not RECIPE_INDEX_ENABLED:
+            return
+
+        try:
+            await self.refresh()
+            self.loaded = True
+            print(f"📚 Recipe index loaded with {len(self)} recipes")
+        except Exception as e:
+            print(f"⚠️ Recipe index load failed, falling back to database queries: {e}")
+
+        self._refresh_task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self) -> None:
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            try:
+                await self._refresh_task
+            except asyncio.CancelledError:
+                pass
+            self._refresh_task = None
+
+    async def _refresh_loop(self) -> None:
+        while True:
+            await asyncio.sleep(RECIPE_INDEX_REFRESH_SECONDS)
+            try:
+                await self.refresh()
+                self.loaded = True
+            except Exception as e:
+                print(f"⚠️ Recipe index refresh failed: {e}")
+
+    async def refresh(self) -> int:
+        """
+        Pull rows updated since the last refresh (everything on first load).
+        Pages are keyed on (updated_at, id): bulk writes give many rows the
+        same timestamp, so the rest of the high-water timestamp's rows are
+        read (by id) before moving on to later timestamps.
+        """
+        changed = 0
+        # Rows written since the last refresh may share its last timestamp
+        finishing_group = self._high_water is not None
+
+        while True:
+            query = db.table("recipes").select(INDEX_COLUMNS)
+            if finishing_group:
+                query = query.eq("updated_at", self._high_water).gt("id", self._high_water_id).order("id")
+            else:
+                if self._high_water is not None:
+                    query = query.gt("updated_at", self._high_water)
+                query = query.order("updated_at").order("id")
+            rows = (await query.limit(RECIPE_INDEX_PAGE_SIZE).execute()).data or []
+
+            for row in rows:
+                self.add(row)
+                # Rows arrive in key order. Only rows seen through refresh move the
+                # high-water mark, so a locally added row can't hide older rows
+                # written by other workers.
+                if row.get("updated_at"):
+                    self._high_water, self._high_water_id = row["updated_at"], str(row["id"])
+            changed += len(rows)
+
+            if len(rows) == RECIPE_INDEX_PAGE_SIZE:
+                finishing_group = True
+            elif finishing_group:
+                finishing_group = False
+            else:
+                break
+
+        if changed:
+            metrics.increment("recipe_index.rows_loaded", changed)
+        return changed
+
+    # ---------- maintenance ----------
+
+    def add(self, row: Dict[str, Any]) -> None:
+        """Insert or replace one `recipes` row"""
+        recipe_id = str(row["id"])
+        if recipe_id in self._recipes:
+            self._remove(recipe_id)
+
+        # Older rows predate canonical spellings, so normalise on the way in
+        tags = normalize_tags(row.get("dietary_tags") or [])
+        recipe = IndexedRecipe(
+            id=recipe_id,
+            name=row.get("name") or "",
+            cuisine=normalize_cuisine(row.get("cuisine")),
+            meal_type=normalize_meal_type(row.get("meal_type")) if row.get("meal_type") else None,
+            total_time=row.get("total_time"),
+            difficulty=row.get("difficulty"),
+            dietary_tags=tags,
+            dietary_mask=self._mask(tags, create=True),
+            primary_protein=row.get("primary_protein"),
+            main_ingredients=list(row.get("main_ingredients") or []),
+            times_used=row.get("times_used") or 0,
+            average_rating=float(row.get("average_rating") or 0),
+            requirement_key=row.get("requirement_key"),
+            updated_at=row.get("updated_at"),
+        )
+
+        self._recipes[recipe_id] = recipe
+        if recipe.cuisine:
+            self._by_cuisine.setdefault(recipe.cuisine, set()).add(recipe_id)
+        if recipe.meal_type:
+            self._by_meal_type.setdefault(recipe.meal_type, set()).add(recipe_id)
+        if recipe.primary_protein:
+            self._by_protein.setdefault(recipe.primary_protein, set()).add(recipe_id)
+        if recipe.requirement_key:
+            self._by_requirement_key.setdefault(recipe.requirement_key, set()).add(recipe_id)
+        if recipe.total_time is not None:
+            bisect.insort(self._by_time, (recipe.total_time, recipe_id))
+
+    def discard(self, recipe_id: str) -> None:
+        """Drop a recipe if it is indexed (e.g. a queued row that never reached the database)"""
+        if str(recipe_id) in self._recipes:
+            self._remove(str(recipe_id))
+
+    def _remove(self, recipe_id: str) -> None:
+        recipe = self._recipes.pop(recipe_id)
+        if recipe.cuisine:
+            self._by_cuisine.get(recipe.cuisine, set()).discard(recipe_id)
+        if recipe.meal_type:
+            self._by_meal_type.get(recipe.meal_type, set()).discard(recipe_id)
+        if recipe.primary_protein:
+            self._by_protein.get(recipe.primary_protein, set()).discard(recipe_id)
+        if recipe.requirement_key:
+            self._by_requirement_key.get(recipe.requirement_key, set()).discard(recipe_id)
+        if recipe.total_time is not None:
+            position = bisect.bisect_left(self._by_time, (recipe.total_time, recipe_id))
+            if position < len(self._by_time) and self._by_time[position] == (recipe.total_time, recipe_id):
+                del self._by_time[position]
+
+    def _mask(self, tags: Iterable[str], create: bool = False) -> Optional[int]:
+        mask = 0
+        for tag in tags:
+            bit = self._tag_bits.get(tag)
+            if bit is None:
+                if not create:
+                    return None  # no recipe carries this tag
+                bit = 1 << len(self._tag_bits)
+                self._tag_bits[tag] = bit
+            mask |= bit
+        return mask
+
+    # ---------- queries ----------
+
+    def get(self, recipe_id: str) -> Optional[IndexedRecipe]:
+        return self._recipes.get(recipe_id)
+
+    def search(
+        self,
+        cuisine: Optional[str] = None,
+        meal_type: Optional[str] = None,
+        max_time: Optional[int] = None,
+        dietary_tags: Optional[List[str]] = None,
+        primary_protein: Optional[str] = None,
+        limit: int = 10
+    ) -> List[IndexedRecipe]:
+        """Same semantics as the database query in RecipeService.search_cached_recipes"""
+        candidate_sets: List[Set[str]] = []
+
+        if cuisine:
+            candidate_sets.append(self._cuisine_ids(cuisine))
+        if meal_type:
+            candidate_sets.append(self._by_meal_type.get(normalize_meal_type(meal_type), set()))
+        if primary_protein:
+            candidate_sets.append(self._by_protein.get(primary_protein, set()))
+        if max_time and not candidate_sets:
+            # Only materialise the time range when no hash index narrowed things down
+            end = bisect.bisect_right(self._by_time, (max_time, "\uffff"))
+            candidate_sets.append({recipe_id for _, recipe_id in self._by_time[:end]})
+
+        if candidate_sets:
+            candidate_sets.sort(key=len)
+            candidates = set(candidate_sets[0])
+            for ids in candidate_sets[1:]:
+                candidates &= ids
+                if not candidates:
+                    break
+        else:
+            candidates = set(self._recipes)
+
+        required_mask = self._mask(normalize_tags(dietary_tags or []))
+        if required_mask is None:
+            return []
+
+        matches = (
+            recipe
+            for recipe in map(self._recipes.__getitem__, candidates)
+            if recipe.dietary_mask & required_mask == required_mask
+            and (not max_time or (recipe.total_time is not None and recipe.total_time <= max_time))
+        )
+        return heapq.nsmallest(limit, matches, key=IndexedRecipe.popularity_key)
+
+    def _cuisine_ids(self, cuisine: str) -> Set[str]:
+        # ilike '%cuisine%': union of every indexed cuisine containing the term
+        term = normalize_cuisine(cuisine) or ""
+        matching: Set[str] = set()
+        for name, ids in self._by_cuisine.items():
+            if term in name:
+                matching |= ids
+        return matching
+
+    def search_requirements(
+        self,
+        requirements: CanonicalRequirements,
+        limit: int = 10,
+        exclude_ids: Iterable[str] = (),
+        widen: bool = False
+    ) -> List[IndexedRecipe]:
+        """
+        Look up recipes for canonical requirements: exact requirement key first,
+        then by dimension. Recipes in `exclude_ids` are never returned, so an
+        exact bucket holding only excluded recipes falls through to the
+        dimension search. With `widen`, exact hits are followed by the other
+        dimension matches (a pool to choose from rather than one bucket).
+        Records which dimension emptied the candidate set so the cache hit
+        rate can be broken down per dimension.
+        """
+        avoid = dislike_terms(requirements.dislikes)
+        required_mask = self._mask(requirements.restrictions)
+        exclude_ids = set(exclude_ids)
+
+        metrics.increment("recipe_lookup.total")
+
+        exact = [
+            recipe
+            for recipe in map(self._recipes.__getitem__, self._by_requirement_key.get(requirements.key(), ()))
+            if recipe.id not in exclude_ids
+            and recipe.total_time is not None
+            and recipe.total_time <= requirements.max_time
+            and not recipe.mentions_any(avoid)
+        ]
+        exact = heapq.nsmallest(limit, exact, key=IndexedRecipe.popularity_key)
+        if exact:
+            metrics.increment("recipe_lookup.hit.requirement_key")
+            if not widen or len(exact) == limit:
+                return exact
+
+        filters = [
+            ("meal_type", lambda ids: ids & self._by_meal_type.get(requirements.meal_type, set())),
+            ("cuisine", lambda ids: ids & self._cuisine_ids(requirements.cuisine) if requirements.cuisine else ids),
+            ("restrictions", lambda ids: {
+                recipe_id for recipe_id in ids
+                if required_mask is not None
+                and self._recipes[recipe_id].dietary_mask & required_mask == required_mask
+            }),
+            ("time", lambda ids: {
+                recipe_id for recipe_id in ids
+                if self._recipes[recipe_id].total_time is not None
+                and self._recipes[recipe_id].total_time <= requirements.max_time
+            }),
+            ("dislikes", lambda ids: {
+                recipe_id for recipe_id in ids if not self._recipes[recipe_id].mentions_any(avoid)
+            }),
+        ]
+
+        candidates = set(self._recipes) - exclude_ids - {recipe.id for recipe in exact}
+        for dimension, narrow in filters:
+            candidates = narrow(candidates)
+            if not candidates:
+                if not exact:
+                    metrics.increment(f"recipe_lookup.miss.{dimension}")
+                return exact
+
+        if not exact:
+            metrics.increment("recipe_lookup.hit.dimensions")
+        return exact + heapq.nsmallest(
+            limit - len(exact), map(self._recipes.__getitem__, candidates), key=IndexedRecipe.popularity_key
+        )
+
+
+recipe_index = RecipeIndex()
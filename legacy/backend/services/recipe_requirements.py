@@ -0,0 +1,194 @@
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from models import DietaryRestriction
+
+# Spelling variants -> canonical cuisine name
+CUISINE_ALIASES = {
+    "tex mex": "mexican",
+    "latin": "mexican",
+    "asian fusion": "asian",
+    "pan asian": "asian",
+    "east asian": "asian",
+    "comfort": "american",
+    "comfort food": "american",
+    "southern": "american",
+    "bbq": "american",
+    "levantine": "middle eastern",
+    "lebanese": "middle eastern",
+    "persian": "middle eastern",
+}
+
+# Spelling variants -> canonical dietary tag (DietaryRestriction values use snake_case)
+DIETARY_TAG_ALIASES = {
+    "gf": "gluten_free",
+    "no gluten": "gluten_free",
+    "celiac": "gluten_free",
+    "no dairy": "dairy_free",
+    "lactose free": "dairy_free",
+    "lactose intolerant": "dairy_free",
+    "no nuts": "nut_free",
+    "peanut free": "nut_free",
+    "tree nut free": "nut_free",
+    "nut allergy": "nut_free",
+    "veggie": "vegetarian",
+    "plant based": "vegan",
+}
+
+# Tags a recipe must carry; anything else a household mentions is a soft dislike
+HARD_RESTRICTIONS = frozenset(restriction.value for restriction in DietaryRestriction) | {"pescatarian"}
+
+# A dislike also rules out the more specific ingredients it covers
+DISLIKE_EXPANSIONS = {
+    "fish": ("salmon", "tuna", "cod", "tilapia", "halibut", "trout"),
+    "seafood": ("fish", "salmon", "tuna", "cod", "shrimp", "crab", "lobster", "scallop", "mussel", "clam"),
+    "shellfish": ("shrimp", "crab", "lobster", "scallop", "mussel", "clam"),
+    "pork": ("bacon", "ham", "sausage", "prosciutto", "chorizo"),
+    "red meat": ("beef", "lamb", "pork", "veal"),
+    "mushroom": ("mushrooms", "shiitake", "portobello", "cremini"),
+}
+
+# Buckets keep near-identical requests on the same key. Time limits round down
+# (a recipe that fits the bucket fits the real limit), and limits below the
+# smallest bucket are keyed as given; servings round up.
+TIME_BUCKETS = (15, 20, 30, 45, 60, 90, 120)
+SERVINGS_BUCKETS = (2, 4, 6, 8, 12)
+
+
+def _clean(value: str) -> str:
+    value = re.sub(r"[-_/]+", " ", value.strip().lower())
+    return re.sub(r"\s+", " ", value)
+
+
+def normalize_cuisine(cuisine: Optional[str]) -> Optional[str]:
+    if not cuisine:
+        return None
+    cleaned = _clean(cuisine)
+    return CUISINE_ALIASES.get(cleaned, cleaned)
+
+
+def normalize_meal_type(meal_type: Optional[str]) -> str:
+    return _clean(meal_type or "dinner")
+
+
+def normalize_tag(tag: str) -> str:
+    cleaned = _clean(tag)
+    return DIETARY_TAG_ALIASES.get(cleaned, cleaned).replace(" ", "_")
+
+
+def normalize_tags(tags: Iterable[Any]) -> List[str]:
+    return sorted({normalize_tag(str(tag)) for tag in tags or [] if str(tag).strip()})
+
+
+def normalize_dislike(dislike: str) -> str:
+    # "No mushrooms" / "avoid mushrooms" -> "mushroom"
+    cleaned = re.sub(r"^(no|avoid|not|without) ", "", _clean(dislike))
+    if cleaned.endswith("s") and cleaned[:-1] in DISLIKE_EXPANSIONS:
+        cleaned = cleaned[:-1]
+    return cleaned
+
+
+def dislike_terms(dislikes: Iterable[str]) -> Tuple[str, ...]:
+    terms = set()
+    for dislike in dislikes:
+        terms.add(dislike)
+        terms.update(DISLIKE_EXPANSIONS.get(dislike, ()))
+    return tuple(sorted(terms))
+
+
+def time_bucket(max_minutes: Optional[int]) -> int:
+    if not max_minutes:
+        return TIME_BUCKETS[-1]
+    fitting = [bucket for bucket in TIME_BUCKETS if bucket <= max_minutes]
+    # Rounding a 10-minute limit up to 15 would serve recipes that don't fit it
+    return fitting[-1] if fitting else int(max_minutes)
+
+
+def servings_bucket(servings: Optional[int]) -> int:
+    for bucket in SERVINGS_BUCKETS:
+        if (servings or 0) <= bucket:
+            return bucket
+    return SERVINGS_BUCKETS[-1]
+
+
+@dataclass(frozen=True)
+class CanonicalRequirements:
+    meal_type: str
+    cuisine: Optional[str]
+    restrictions: Tuple[str, ...]  # hard: recipe must be tagged with all of these
+    dislikes: Tuple[str, ...]      # soft: avoid recipes that feature these
+    max_time: int
+    servings: int
+
+    def key(self) -> str:
+        """Stable key shared by cache lookup and recipe saves (dislikes deliberately excluded)"""
+        return "|".join([
+            self.meal_type,
+            self.cuisine or "any",
+            "+".join(self.restrictions) or "none",
+            f"t{self.max_time}",
+            f"s{self.servings}",
+        ])
+
+
+def canonicalize_requirements(
+    meal_type: str,
+    cuisine: Optional[str],
+    household_profile: Dict[str, Any],
+    max_cooking_time: Optional[int],
+    servings: Optional[int]
+) -> CanonicalRequirements:
+    """Build canonical requirements for a meal slot from a household profile"""
+    restrictions = set()
+    dislikes = {normalize_dislike(str(item)) for item in household_profile.get("dislikes", []) or [] if str(item).strip()}
+
+    for member in household_profile.get("members", []) or []:
+        for tag in normalize_tags(member.get("dietary_restrictions", [])):
+            if tag in HARD_RESTRICTIONS:
+                restrictions.add(tag)
+            else:
+                dislikes.add(normalize_dislike(tag))
+
+    return CanonicalRequirements(
+        meal_type=normalize_meal_type(meal_type),
+        cuisine=normalize_cuisine(cuisine),
+        restrictions=tuple(sorted(restrictions)),
+        dislikes=tuple(sorted(dislikes)),
+        max_time=time_bucket(max_cooking_time),
+        servings=servings_bucket(servings),
+    )
+
+
+def canonical_recipe_fields(row: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Fields of a stored `recipes` row that differ from their canonical form:
+    cuisine and dietary tags through the alias tables, plus a requirement_key
+    for rows that have none (see scripts/backfill_recipe_requirements.py)
+    """
+    changes: Dict[str, Any] = {}
+    cuisine = normalize_cuisine(row.get("cuisine"))
+    if cuisine != row.get("cuisine"):
+        changes["cuisine"] = cuisine
+    tags = normalize_tags(row.get("dietary_tags") or [])
+    if tags != list(row.get("dietary_tags") or []):
+        changes["dietary_tags"] = tags
+    if not row.get("requirement_key"):
+        changes["requirement_key"] = requirement_key_for_recipe({**row, **changes})
+    return changes
+
+
+def requirement_key_for_recipe(recipe: Dict[str, Any]) -> str:
+    """Key for a recipe saved without known requirements (e.g. pre-generated ones)"""
+    total_time = (recipe.get("prep_time") or 0) + (recipe.get("cook_time") or 0)
+    fitting = [bucket for bucket in TIME_BUCKETS if bucket >= total_time]
+    tags = [tag for tag in normalize_tags(recipe.get("dietary_tags", [])) if tag in HARD_RESTRICTIONS]
+
+    return CanonicalRequirements(
+        meal_type=normalize_meal_type(recipe.get("meal_type")),
+        cuisine=normalize_cuisine(recipe.get("cuisine")),
+        restrictions=tuple(tags),
+        dislikes=(),
+        max_time=fitting[0] if fitting else TIME_BUCKETS[-1],
+        servings=servings_bucket(recipe.get("servings") or 4),
+    ).key()
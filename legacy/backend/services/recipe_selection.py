@@ -0,0 +1,85 @@
+import os
+import math
+import random
+from typing import Any, Dict, Iterable, List, Optional
+
+from services.recipe_requirements import normalize_cuisine
+
+# Top cached matches the selector chooses among
+RECIPE_SELECTION_TOP_K = int(os.getenv("RECIPE_SELECTION_TOP_K", "8"))
+# Relevance (popularity rank) vs. novelty trade-off: 1.0 always takes the most used match
+RECIPE_SELECTION_LAMBDA = float(os.getenv("RECIPE_SELECTION_LAMBDA", "0.6"))
+# Softmax temperature over the scores; 0 picks the best score deterministically.
+# A little randomness keeps households with no history from all getting the same dish.
+RECIPE_SELECTION_TEMPERATURE = float(os.getenv("RECIPE_SELECTION_TEMPERATURE", "0.1"))
+# Likeness to the household's past plans counts this much relative to the current
+# week (serving the very same recipe again always counts in full)
+RECIPE_SELECTION_HISTORY_WEIGHT = float(os.getenv("RECIPE_SELECTION_HISTORY_WEIGHT", "0.5"))
+
+# How much each shared feature makes two recipes alike
+SIMILARITY_WEIGHTS = {"primary_protein": 0.4, "cuisine": 0.3, "main_ingredients": 0.3}
+
+
+def _features(recipe: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "id": recipe.get("id"),
+        "primary_protein": (recipe.get("primary_protein") or "").lower() or None,
+        "cuisine": normalize_cuisine(recipe.get("cuisine")),
+        "main_ingredients": {ingredient.lower() for ingredient in recipe.get("main_ingredients") or []},
+    }
+
+
+def similarity(a: Dict[str, Any], b: Dict[str, Any]) -> float:
+    """0..1 likeness of two recipe profiles (id, primary_protein, cuisine, main_ingredients)"""
+    if a["id"] is not None and a["id"] == b["id"]:
+        return 1.0
+
+    score = 0.0
+    if a["primary_protein"] and a["primary_protein"] == b["primary_protein"]:
+        score += SIMILARITY_WEIGHTS["primary_protein"]
+    if a["cuisine"] and a["cuisine"] == b["cuisine"]:
+        score += SIMILARITY_WEIGHTS["cuisine"]
+    if a["main_ingredients"] and b["main_ingredients"]:
+        shared = a["main_ingredients"] & b["main_ingredients"]
+        score += SIMILARITY_WEIGHTS["main_ingredients"] * len(shared) / len(a["main_ingredients"] | b["main_ingredients"])
+    return score
+
+
+def select_diverse(
+    candidates: List[Dict[str, Any]],
+    week: Iterable[Dict[str, Any]] = (),
+    history: Iterable[Dict[str, Any]] = (),
+    rng: Optional[random.Random] = None
+) -> Optional[Dict[str, Any]]:
+    """
+    Pick one of `candidates` (recipe summaries, most popular first) by
+    maximal marginal relevance: popularity rank traded off against the
+    closest match among the week's recipes and, weighted down, the
+    household's history. Profiles need id, primary_protein, cuisine and
+    main_ingredients; the chosen candidate is returned as given.
+    """
+    pool = candidates[:RECIPE_SELECTION_TOP_K]
+    if not pool:
+        return None
+
+    context = [(_features(recipe), 1.0) for recipe in week]
+    context += [(_features(recipe), RECIPE_SELECTION_HISTORY_WEIGHT) for recipe in history]
+    if not context and RECIPE_SELECTION_TEMPERATURE <= 0:
+        return pool[0]
+
+    scores = []
+    for rank, candidate in enumerate(pool):
+        relevance = 1 - rank / len(pool)
+        profile = _features(candidate)
+        redundancy = max(
+            (similarity(profile, seen) * (1.0 if profile["id"] == seen["id"] else weight) for seen, weight in context),
+            default=0.0
+        )
+        scores.append(RECIPE_SELECTION_LAMBDA * relevance - (1 - RECIPE_SELECTION_LAMBDA) * redundancy)
+
+    if RECIPE_SELECTION_TEMPERATURE <= 0:
+        return pool[max(range(len(pool)), key=scores.__getitem__)]
+
+    best = max(scores)
+    weights = [math.exp((score - best) / RECIPE_SELECTION_TEMPERATURE) for score in scores]
+    return (rng or random).choices(pool, weights=weights)[0]
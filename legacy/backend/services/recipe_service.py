@@ -1,11 +1,40 @@
 import json
 import os
+import copy
 import math
-from typing import Dict, List, Any, Optional
+import dataclasses
+from typing import Dict, Iterable, List, Any, Optional, Tuple
 from datetime import datetime
 import uuid
-from database import supabase
-from services.llm_gateway import chat_completion
+from services.repository import db
+from services.structured_output import OutputSchema, request_structured
+from services.llm_cache import payload_key
+from services import metrics
+from services.single_flight import SingleFlight
+from services.recipe_index import INDEX_COLUMNS, recipe_index
+from services.recipe_writer import recipe_writer
+from services.recipe_selection import RECIPE_SELECTION_TOP_K, select_diverse
+from services.deadline import require
+from services.recipe_requirements import (
+    CanonicalRequirements,
+    canonicalize_requirements,
+    dislike_terms,
+    normalize_cuisine,
+    normalize_tags,
+    requirement_key_for_recipe,
+    TIME_BUCKETS,
+)
+
+# Concurrent requests for the same meal slot requirements share one lookup/generation
+_slot_in_flight = SingleFlight("recipe_slot")
+
+# Don't start generating a recipe with less request budget left than this
+RECIPE_GENERATION_MIN_SECONDS = float(os.getenv("RECIPE_GENERATION_MIN_SECONDS", "15"))
+
+# Soft constraints a library-only lookup gives up, in this order, when nothing
+# fits. Dietary restrictions are never relaxed.
+LIBRARY_RELAXATIONS = ("cuisine", "recent", "time", "dislikes")
+LIBRARY_SEARCH_LIMIT = 20
 
 RECIPE_DEVELOPMENT_PROMPT = """
 You are a professional recipe developer and culinary expert. Create REAL, from-scratch recipes that home cooks actually want to make.
@@ -159,6 +188,20 @@ Instead of "Cook pasta and add sauce", write "Bring salted water to boil. Cook f
 Use the same JSON format with name, description, prep_time, cook_time, servings, difficulty, cuisine, ingredients (detailed list), instructions (step-by-step with timing), equipment_needed, dietary_tags, tips, and nutrition_per_serving.
 """
 
+# Expected JSON from each recipe agent (see services/structured_output.py)
+RECIPE_FIELDS = {"name": (str,), "ingredients": (list,), "instructions": (list,)}
+
+
+def _check_recipe(recipe: Dict[str, Any]) -> None:
+    for field in RECIPE_FIELDS:
+        if not recipe[field]:
+            raise ValueError(f"recipe has an empty {field}")
+
+
+RECIPE_SCHEMA = OutputSchema("recipe", RECIPE_FIELDS, _check_recipe)
+ADAPTED_RECIPE_SCHEMA = OutputSchema("adapted_recipe", RECIPE_FIELDS, _check_recipe)
+SOURCED_RECIPE_SCHEMA = OutputSchema("sourced_recipe", RECIPE_FIELDS, _check_recipe)
+
 class RecipeService:
     """
     Recipe Agent - Handles recipe sourcing, development, and adaptation
@@ -171,41 +214,72 @@ class RecipeService:
         }
         self.use_cache = True  # Enable recipe caching
 
-    async def save_recipe_to_database(self, recipe: Dict[str, Any]) -> str:
+    def _build_recipe_row(self, recipe: Dict[str, Any], requirement_key: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Build a `recipes` row for a generated recipe
+
+        `requirement_key` is the canonical key of the requirements the recipe was
+        generated for; without one, a key is derived from the recipe itself.
+        """
+        recipe_data = {
+            "name": recipe.get("name"),
+            "description": recipe.get("description"),
+            "cuisine": normalize_cuisine(recipe.get("cuisine")),
+            "meal_type": recipe.get("meal_type", "dinner"),
+            "prep_time": recipe.get("prep_time"),
+            "cook_time": recipe.get("cook_time"),
+            "total_time": (recipe.get("prep_time") or 0) + (recipe.get("cook_time") or 0),
+            "servings": recipe.get("servings", 4),
+            "difficulty": recipe.get("difficulty", "intermediate"),
+            "ingredients": recipe.get("ingredients", []),
+            "instructions": recipe.get("instructions", []),
+            "equipment_needed": recipe.get("equipment_needed", []),
+            "tips": recipe.get("tips", []),
+            "dietary_tags": normalize_tags(recipe.get("dietary_tags", [])),
+            "nutrition_per_serving": recipe.get("nutrition_per_serving"),
+            "full_recipe_json": recipe,
+
+            # Extract searchable fields
+            "keywords": self._extract_keywords(recipe),
+            "primary_protein": self._extract_primary_protein(recipe),
+            "main_ingredients": self._extract_main_ingredients(recipe),
+            "requirement_key": requirement_key or requirement_key_for_recipe(recipe),
+        }
+
+        # Generated recipes already carry a UUID; reuse it so upserts are idempotent
+        if recipe.get("id"):
+            recipe_data["id"] = recipe["id"]
+
+        return recipe_data
+
+    def queue_recipe_save(self, recipe: Dict[str, Any], requirement_key: Optional[str] = None) -> str:
+        """
+        Make a generated recipe searchable immediately and persist it in the background
+        Returns the recipe ID
+        """
+        if not recipe.get("id"):
+            recipe["id"] = str(uuid.uuid4())
+
+        recipe_data = self._build_recipe_row(recipe, requirement_key)
+        recipe_index.add(recipe_data)
+        recipe_writer.enqueue(recipe_data)
+        print(f"📝 Queued recipe '{recipe.get('name')}' for saving with ID: {recipe['id']}")
+        return recipe["id"]
+
+    async def save_recipe_to_database(self, recipe: Dict[str, Any], requirement_key: Optional[str] = None) -> str:
         """
         Save a generated recipe to the database for future reuse
         Returns the recipe ID
         """
         try:
-            # Extract key information for indexing
-            recipe_data = {
-                "name": recipe.get("name"),
-                "description": recipe.get("description"),
-                "cuisine": recipe.get("cuisine"),
-                "meal_type": recipe.get("meal_type", "dinner"),
-                "prep_time": recipe.get("prep_time"),
-                "cook_time": recipe.get("cook_time"),
-                "total_time": recipe.get("prep_time", 0) + recipe.get("cook_time", 0),
-                "servings": recipe.get("servings", 4),
-                "difficulty": recipe.get("difficulty", "intermediate"),
-                "ingredients": recipe.get("ingredients", []),
-                "instructions": recipe.get("instructions", []),
-                "equipment_needed": recipe.get("equipment_needed", []),
-                "tips": recipe.get("tips", []),
-                "dietary_tags": recipe.get("dietary_tags", []),
-                "nutrition_per_serving": recipe.get("nutrition_per_serving"),
-                "full_recipe_json": recipe,
-
-                # Extract searchable fields
-                "keywords": self._extract_keywords(recipe),
-                "primary_protein": self._extract_primary_protein(recipe),
-                "main_ingredients": self._extract_main_ingredients(recipe),
-            }
-
-            result = supabase.table("recipes").insert(recipe_data).execute()
+            recipe_data = self._build_recipe_row(recipe, requirement_key)
+
+            result = await db.table("recipes").insert(recipe_data).execute()
 
             if result.data and len(result.data) > 0:
                 recipe_id = result.data[0]['id']
+                # Make the new recipe searchable right away
+                recipe_index.add(result.data[0])
                 print(f"✅ Saved recipe '{recipe['name']}' to database with ID: {recipe_id}")
                 return recipe_id
             else:
@@ -225,10 +299,26 @@ class RecipeService:
         limit: int = 10
     ) -> List[Dict[str, Any]]:
         """
-        Search for existing recipes in the database that match criteria
+        Search for existing recipes that match criteria.
+
+        Returns lightweight summaries (id, name, cuisine, ...) ordered by
+        popularity; use load_recipe() to fetch the full recipe for the chosen hit.
+        Answered from the in-memory recipe index when it is loaded.
         """
+        if recipe_index.loaded:
+            matches = recipe_index.search(
+                cuisine=cuisine,
+                meal_type=meal_type,
+                max_time=max_time,
+                dietary_tags=dietary_restrictions,
+                limit=limit
+            )
+            metrics.increment("recipe_index.search")
+            print(f"🔍 Found {len(matches)} indexed recipes matching criteria")
+            return [match.summary() for match in matches]
+
         try:
-            query = supabase.table("recipes").select("*")
+            query = db.table("recipes").select(INDEX_COLUMNS)
 
             # Apply filters
             if cuisine:
@@ -244,11 +334,11 @@ class RecipeService:
             # Order by popularity (times_used) and limit results
             query = query.order("times_used", desc=True).limit(limit)
 
-            result = query.execute()
+            result = await query.execute()
 
             if result.data:
                 print(f"🔍 Found {len(result.data)} cached recipes matching criteria")
-                return [r["full_recipe_json"] for r in result.data]
+                return result.data
             else:
                 print(f"🔍 No cached recipes found matching criteria")
                 return []
@@ -257,12 +347,32 @@ class RecipeService:
             print(f"❌ Error searching cached recipes: {e}")
             return []
 
+    async def load_recipe(self, recipe_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Fetch the full recipe JSON for a single cached recipe
+        """
+        # Recipes waiting in the write-behind queue aren't in the database yet
+        queued = recipe_writer.pending(recipe_id)
+        if queued is not None:
+            return queued
+
+        try:
+            result = await db.table("recipes").select("full_recipe_json").eq("id", recipe_id).limit(1).execute()
+
+            if result.data:
+                return result.data[0]["full_recipe_json"]
+            return None
+
+        except Exception as e:
+            print(f"❌ Error loading cached recipe {recipe_id}: {e}")
+            return None
+
     async def increment_recipe_usage(self, recipe_id: str):
         """
         Increment the times_used counter for a recipe
         """
         try:
-            supabase.table("recipes").update({"times_used": supabase.rpc("increment", {"row_id": recipe_id})}).eq("id", recipe_id).execute()
+            await db.rpc("increment", {"row_id": recipe_id}).execute()
             print(f"📊 Incremented usage count for recipe {recipe_id}")
         except Exception as e:
             print(f"⚠️ Failed to increment recipe usage: {e}")
@@ -315,12 +425,26 @@ class RecipeService:
 
         return main_ingredients[:5]
 
+    def _selection_profile(self, recipe: Dict[str, Any]) -> Dict[str, Any]:
+        """Features recipe_selection compares: the index entry if there is one, else extracted from the recipe"""
+        indexed = recipe_index.get(str(recipe.get("id"))) if recipe.get("id") else None
+        if indexed is not None:
+            return indexed.summary()
+        return {
+            "id": recipe.get("id"),
+            "cuisine": recipe.get("cuisine"),
+            "primary_protein": recipe.get("primary_protein") or self._extract_primary_protein(recipe),
+            "main_ingredients": recipe.get("main_ingredients") or self._extract_main_ingredients(recipe),
+        }
+
     async def get_recipe_for_meal_slot(
         self,
         meal_type: str,
         cuisine: str,
         household_profile: Dict[str, Any],
-        special_requirements: Optional[Dict[str, Any]] = None
+        special_requirements: Optional[Dict[str, Any]] = None,
+        exclude: Optional[List[Dict[str, Any]]] = None,
+        history: Optional[List[Dict[str, Any]]] = None
     ) -> Dict[str, Any]:
         """
         Get a recipe for a specific meal slot in a meal plan
@@ -330,42 +454,118 @@ class RecipeService:
         1. First, try to find a cached recipe that matches criteria
         2. If found, return it (much faster!)
         3. If not found, generate a new recipe and save it for future use
+
+        Recipes in `exclude` (e.g. the rest of the week) are neither reused
+        from the cache nor repeated by a generated recipe. Among cached
+        matches, ones unlike `exclude` and the household's `history` are
+        preferred (see recipe_selection).
         """
+        canonical, requirements = self._slot_requirements(meal_type, cuisine, household_profile, special_requirements)
+        if exclude:
+            requirements["avoid_recipes"] = sorted({recipe.get("name") for recipe in exclude if recipe.get("name")})
 
-        # Calculate servings: 1.5x household size, rounded up
-        household_size = len(household_profile.get('members', [])) or 4
-        servings = math.ceil(household_size * 1.5)
+        recipe = await _slot_in_flight.do(
+            payload_key(requirements),
+            lambda: self._find_or_generate_recipe(canonical, requirements, household_profile, exclude, history)
+        )
 
-        dietary_restrictions = household_profile.get('dislikes', []) + self._extract_dietary_restrictions(household_profile)
-        max_cooking_time = household_profile.get('max_cooking_time', 30)
+        # Coalesced callers share one result object; hand each its own copy
+        return copy.deepcopy(recipe)
 
-        # Try to find a cached recipe first (if caching is enabled)
-        if self.use_cache:
-            print(f"🔍 Searching cache for {cuisine} {meal_type}...")
-            cached_recipes = await self.search_cached_recipes(
-                cuisine=cuisine,
-                meal_type=meal_type,
-                max_time=max_cooking_time,
-                dietary_restrictions=dietary_restrictions,
-                limit=5  # Get top 5 matches
-            )
+    async def get_cached_recipe_for_meal_slot(
+        self,
+        meal_type: str,
+        cuisine: str,
+        household_profile: Dict[str, Any],
+        special_requirements: Optional[Dict[str, Any]] = None,
+        exclude: Optional[List[Dict[str, Any]]] = None,
+        history: Optional[List[Dict[str, Any]]] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Cache-only get_recipe_for_meal_slot: the cached recipe for the slot, or None (never generates)"""
+        if not self.use_cache:
+            return None
+        canonical, _ = self._slot_requirements(meal_type, cuisine, household_profile, special_requirements)
+        recipe = await self._find_cached_recipe(canonical, exclude, history)
+        return copy.deepcopy(recipe) if recipe else None
 
-            if cached_recipes:
-                # Use the first matching recipe
-                recipe = cached_recipes[0]
-                print(f"✨ Using cached recipe: {recipe.get('name')}")
+    async def find_library_recipe(
+        self,
+        meal_type: str,
+        cuisine: str,
+        household_profile: Dict[str, Any],
+        special_requirements: Optional[Dict[str, Any]] = None,
+        week: Optional[List[Dict[str, Any]]] = None,
+        recent: Optional[List[Dict[str, Any]]] = None
+    ) -> Tuple[Optional[Dict[str, Any]], List[str]]:
+        """
+        Cached recipe summary for a meal slot, without any LLM call. Recipes
+        already in the `week` are never used; `recent` ones (the household's
+        past plans) are avoided unless nothing else fits. Soft constraints are
+        relaxed one at a time (LIBRARY_RELAXATIONS) until a recipe is found,
+        and the most diverse of the fitting recipes is chosen.
+
+        Returns the summary (None if even the fully relaxed slot has no
+        recipe) and the constraints that were relaxed.
+        """
+        canonical, _ = self._slot_requirements(meal_type, cuisine, household_profile, special_requirements)
+        week_profiles = [self._selection_profile(recipe) for recipe in week or []]
+        recent_profiles = [self._selection_profile(recipe) for recipe in recent or []]
+        exclude_ids = {profile["id"] for profile in week_profiles}
+        recent_ids = {profile["id"] for profile in recent_profiles}
+        relaxed: List[str] = []
+
+        for step in (None,) + LIBRARY_RELAXATIONS:
+            if step == "cuisine":
+                if canonical.cuisine is None:
+                    continue
+                canonical = dataclasses.replace(canonical, cuisine=None)
+            elif step == "recent":
+                if not recent_ids:
+                    continue
+            elif step == "time":
+                if canonical.max_time >= TIME_BUCKETS[-1]:
+                    continue
+                canonical = dataclasses.replace(canonical, max_time=TIME_BUCKETS[-1])
+            elif step == "dislikes":
+                if not canonical.dislikes:
+                    continue
+                canonical = dataclasses.replace(canonical, dislikes=())
+            if step:
+                relaxed.append(step)
+
+            skip = exclude_ids if "recent" in relaxed else exclude_ids | recent_ids
+            candidates = await self.find_cached_recipes(canonical, limit=LIBRARY_SEARCH_LIMIT, exclude_ids=skip)
+            if candidates:
+                return select_diverse(candidates, week_profiles, recent_profiles), relaxed
+
+        return None, relaxed
+
+    def _slot_requirements(
+        self,
+        meal_type: str,
+        cuisine: str,
+        household_profile: Dict[str, Any],
+        special_requirements: Optional[Dict[str, Any]]
+    ) -> Tuple[CanonicalRequirements, Dict[str, Any]]:
+        """Canonical (cache lookup) and full (generation) requirements for a meal slot"""
 
-                # TODO: Increment usage counter
-                # await self.increment_recipe_usage(recipe_id)
+        # Calculate servings: 1.5x household size, rounded up
+        household_size = len(household_profile.get('members', [])) or 4
+        servings = math.ceil(household_size * 1.5)
 
-                return recipe
+        max_cooking_time = household_profile.get('max_cooking_time') or 30
+        if special_requirements and special_requirements.get('max_cooking_time'):
+            max_cooking_time = min(max_cooking_time, special_requirements['max_cooking_time'])
+
+        # Canonical requirements: normalised spellings, hard restrictions split
+        # from soft dislikes, bucketed time/servings
+        canonical = canonicalize_requirements(meal_type, cuisine, household_profile, max_cooking_time, servings)
 
-        # No cached recipe found, generate a new one
-        print(f"🎨 Generating new {cuisine} {meal_type} recipe...")
         requirements = {
             "meal_type": meal_type,
             "cuisine": cuisine,
-            "dietary_restrictions": dietary_restrictions,
+            "dietary_restrictions": list(canonical.restrictions),
+            "dislikes": list(canonical.dislikes),
             "max_cooking_time": max_cooking_time,
             "skill_level": household_profile.get('cooking_skill', 'intermediate'),
             "servings": servings,
@@ -374,11 +574,127 @@ class RecipeService:
             "special_requests": special_requirements or {}
         }
 
+        return canonical, requirements
+
+    async def find_cached_recipes(
+        self,
+        canonical: CanonicalRequirements,
+        limit: int = 5,
+        exclude_ids: Iterable[str] = (),
+        widen: bool = False
+    ) -> List[Dict[str, Any]]:
+        """
+        Cached recipe summaries for canonical requirements, most popular first,
+        leaving out the recipes in `exclude_ids`. With `widen`, exact
+        requirement-key hits are followed by the other matching recipes.
+        """
+        exclude_ids = set(exclude_ids)
+        if recipe_index.loaded:
+            return [
+                match.summary()
+                for match in recipe_index.search_requirements(
+                    canonical, limit=limit, exclude_ids=exclude_ids, widen=widen
+                )
+            ]
+
+        # Database fallback: filter on the hard requirements, then drop excluded and disliked dishes
+        candidates = await self.search_cached_recipes(
+            cuisine=canonical.cuisine,
+            meal_type=canonical.meal_type,
+            max_time=canonical.max_time,
+            dietary_restrictions=list(canonical.restrictions),
+            limit=(limit + len(exclude_ids)) * 2
+        )
+        avoid = dislike_terms(canonical.dislikes)
+
+        def mentions_dislike(summary: Dict[str, Any]) -> bool:
+            text = " ".join([
+                summary.get("name") or "",
+                summary.get("primary_protein") or "",
+                *(summary.get("main_ingredients") or []),
+            ]).lower()
+            return any(term in text for term in avoid)
+
+        return [
+            summary for summary in candidates
+            if summary["id"] not in exclude_ids and not mentions_dislike(summary)
+        ][:limit]
+
+    async def _find_cached_recipe(
+        self,
+        canonical: CanonicalRequirements,
+        exclude: Optional[List[Dict[str, Any]]] = None,
+        history: Optional[List[Dict[str, Any]]] = None
+    ) -> Optional[Dict[str, Any]]:
+        print(f"🔍 Searching cache for {canonical.key()}...")
+        exclude = exclude or []
+        # Exact-key and dimension matches together, so there is a real choice
+        # even when the exact bucket holds a single recipe
+        cached_recipes = await self.find_cached_recipes(
+            canonical,
+            limit=RECIPE_SELECTION_TOP_K + len(exclude),
+            exclude_ids={recipe.get("id") for recipe in exclude if recipe.get("id")},
+            widen=True
+        )
+
+        if exclude:
+            # Saved copies of the same dish can have different ids
+            excluded_names = {(recipe.get("name") or "").lower() for recipe in exclude}
+            cached_recipes = [
+                summary for summary in cached_recipes
+                if (summary.get("name") or "").lower() not in excluded_names
+            ]
+
+        if cached_recipes:
+            # Rather than always the most used match, the one least like the rest
+            # of the week and the household's recent plans
+            chosen = select_diverse(
+                cached_recipes,
+                week=[self._selection_profile(recipe) for recipe in exclude],
+                history=[self._selection_profile(recipe) for recipe in history or []]
+            )
+            metrics.increment("recipe_selection.picks")
+            if chosen is not cached_recipes[0]:
+                metrics.increment("recipe_selection.diversified")
+            recipe = await self.load_recipe(chosen["id"])
+
+            if recipe:
+                print(f"✨ Using cached recipe: {recipe.get('name')}")
+
+                # TODO: Increment usage counter
+                # await self.increment_recipe_usage(recipe_id)
+
+                return recipe
+
+        return None
+
+    async def _find_or_generate_recipe(
+        self,
+        canonical: CanonicalRequirements,
+        requirements: Dict[str, Any],
+        household_profile: Dict[str, Any],
+        exclude: Optional[List[Dict[str, Any]]] = None,
+        history: Optional[List[Dict[str, Any]]] = None
+    ) -> Dict[str, Any]:
+        """Serve a meal slot from the recipe cache, or generate (and save) a new recipe"""
+
+        meal_type = requirements["meal_type"]
+        cuisine = requirements["cuisine"]
+
+        # Try to find a cached recipe first (if caching is enabled)
+        if self.use_cache:
+            recipe = await self._find_cached_recipe(canonical, exclude, history)
+            if recipe:
+                return recipe
+
+        # No cached recipe found, generate a new one (if it can finish in time)
+        require(RECIPE_GENERATION_MIN_SECONDS, f"{cuisine} {meal_type} recipe generation")
+        print(f"🎨 Generating new {cuisine} {meal_type} recipe...")
         recipe = await self.develop_recipe(requirements, household_profile)
 
-        # Save the generated recipe for future use
+        # Save the generated recipe for future use, off the request path
         if self.use_cache and recipe:
-            await self.save_recipe_to_database(recipe)
+            self.queue_recipe_save(recipe, requirement_key=canonical.key())
 
         return recipe
 
@@ -396,46 +712,28 @@ class RecipeService:
             household_context=json.dumps(household_context, indent=2)
         )
 
-        response = await chat_completion(
-            messages=[
+        recipe = await request_structured(
+            [
                 {
                     "role": "system",
                     "content": "You are a professional recipe developer. CRITICAL: Never use jarred sauces or pre-made mixes. Always build recipes from scratch with real ingredients. Be creative and avoid repetitive recipes. Respond with valid JSON only.",
                 },
                 {"role": "user", "content": prompt},
             ],
+            RECIPE_SCHEMA,
             model="gpt-5-mini",
             max_tokens=2000,
             temperature=0.7,
         )
 
-        try:
-            raw_content = response.get("message", {}).get("content", "")
-            print(f"📋 Raw AI response: {raw_content[:500]}...")  # Log first 500 chars
+        print(f"✅ Successfully parsed recipe JSON with keys: {recipe.keys()}")
 
-            # Strip markdown code blocks if present
-            if raw_content.startswith('```'):
-                # Remove ```json or ``` at start and ``` at end
-                raw_content = raw_content.split('```')[1]
-                if raw_content.startswith('json'):
-                    raw_content = raw_content[4:]
-                raw_content = raw_content.strip()
+        # Add metadata
+        recipe['id'] = str(uuid.uuid4())
+        recipe['created_at'] = datetime.now().isoformat()
+        recipe['source'] = 'recipe_agent_developed'
 
-            recipe = json.loads(raw_content)
-
-            print(f"✅ Successfully parsed recipe JSON with keys: {recipe.keys()}")
-
-            # Add metadata
-            recipe['id'] = str(uuid.uuid4())
-            recipe['created_at'] = datetime.now().isoformat()
-            recipe['source'] = 'recipe_agent_developed'
-
-            return recipe
-
-        except json.JSONDecodeError as e:
-            print(f"❌ JSON parsing failed: {e}")
-            print(f"❌ Raw content that failed: {raw_content}")
-            raise ValueError(f"Failed to parse recipe JSON: {e}")
+        return recipe
 
     async def adapt_recipe(
         self,
@@ -453,33 +751,27 @@ class RecipeService:
             household_context=json.dumps(household_context, indent=2)
         )
 
-        response = await chat_completion(
-            messages=[
+        adapted_recipe = await request_structured(
+            [
                 {
                     "role": "system",
                     "content": "You are a culinary expert specializing in recipe adaptation. Always respond with valid JSON only.",
                 },
                 {"role": "user", "content": prompt},
             ],
+            ADAPTED_RECIPE_SCHEMA,
             model="gpt-5-mini",
             max_tokens=1500,
             temperature=0.6,
         )
 
-        try:
-            raw_content = response.get("message", {}).get("content", "")
-            adapted_recipe = json.loads(raw_content)
-
-            # Add metadata
-            adapted_recipe['id'] = str(uuid.uuid4())
-            adapted_recipe['adapted_from'] = original_recipe.get('id', 'unknown')
-            adapted_recipe['adapted_at'] = datetime.now().isoformat()
-            adapted_recipe['source'] = 'recipe_agent_adapted'
+        # Add metadata
+        adapted_recipe['id'] = str(uuid.uuid4())
+        adapted_recipe['adapted_from'] = original_recipe.get('id', 'unknown')
+        adapted_recipe['adapted_at'] = datetime.now().isoformat()
+        adapted_recipe['source'] = 'recipe_agent_adapted'
 
-            return adapted_recipe
-
-        except json.JSONDecodeError as e:
-            raise ValueError(f"Failed to parse adapted recipe JSON: {e}. Raw content: {raw_content}")
+        return adapted_recipe
 
     async def find_recipe_by_criteria(
         self,
@@ -507,40 +799,26 @@ class RecipeService:
             household_profile=json.dumps(household_profile, indent=2)
         )
 
-        response = await chat_completion(
-            messages=[
+        recipe = await request_structured(
+            [
                 {
                     "role": "system",
                     "content": "You are a recipe research specialist. CRITICAL: Never use jarred sauces, canned soups, or pre-made mixes. Build everything from scratch with real ingredients. Be creative and avoid repetitive recipes. Always respond with valid JSON only.",
                 },
                 {"role": "user", "content": prompt},
             ],
+            SOURCED_RECIPE_SCHEMA,
             model="gpt-5-mini",
             max_tokens=2000,
             temperature=0.7,
         )
 
-        try:
-            raw_content = response.get("message", {}).get("content", "")
-
-            # Strip markdown code blocks if present
-            if raw_content.startswith('```'):
-                raw_content = raw_content.split('```')[1]
-                if raw_content.startswith('json'):
-                    raw_content = raw_content[4:]
-                raw_content = raw_content.strip()
-
-            recipe = json.loads(raw_content)
+        # Add metadata
+        recipe['id'] = str(uuid.uuid4())
+        recipe['created_at'] = datetime.now().isoformat()
+        recipe['source'] = 'recipe_agent_sourced'
 
-            # Add metadata
-            recipe['id'] = str(uuid.uuid4())
-            recipe['created_at'] = datetime.now().isoformat()
-            recipe['source'] = 'recipe_agent_sourced'
-
-            return recipe
-
-        except json.JSONDecodeError as e:
-            raise ValueError(f"Failed to parse sourced recipe JSON: {e}. Raw content: {raw_content}")
+        return recipe
 
     async def search_external_recipes(self, query: str, dietary_filters: List[str] = None) -> List[Dict[str, Any]]:
         """
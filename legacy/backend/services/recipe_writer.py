@@ -0,0 +1,133 @@
+import os
+import asyncio
+from typing import Any, Dict, List, Optional
+
+from services.repository import db
+from services.recipe_index import recipe_index
+from services import metrics
+
+RECIPE_WRITE_BATCH_SIZE = int(os.getenv("RECIPE_WRITE_BATCH_SIZE", "25"))
+RECIPE_WRITE_FLUSH_SECONDS = float(os.getenv("RECIPE_WRITE_FLUSH_SECONDS", "2"))
+RECIPE_WRITE_MAX_ATTEMPTS = int(os.getenv("RECIPE_WRITE_MAX_ATTEMPTS", "5"))
+RECIPE_WRITE_BACKOFF_SECONDS = 1.0
+
+
+class RecipeWriter:
+    """
+    Write-behind queue for generated recipes.
+
+    Rows are buffered and written as bulk upserts (keyed on the recipe id, so a
+    retried batch never duplicates rows). Until a row is written its full
+    recipe stays available through `pending()`. `stop()` flushes what is left.
+    """
+
+    def __init__(self):
+        self._buffer: List[Dict[str, Any]] = []
+        self._attempts: Dict[str, int] = {}
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._flush_lock = asyncio.Lock()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the background loop and write everything still buffered"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        if self._flush_lock is None:
+            return
+
+        # Failed rows are re-queued until they run out of attempts, so this ends
+        while self._buffer:
+            if not await self.flush():
+                await asyncio.sleep(RECIPE_WRITE_BACKOFF_SECONDS)
+
+    def enqueue(self, row: Dict[str, Any]) -> None:
+        """Queue one `recipes` row (must carry its id) for a background upsert"""
+        self.start()
+        self._buffer.append(row)
+        self._pending[str(row["id"])] = row.get("full_recipe_json") or {}
+        metrics.increment("recipe_writer.enqueued")
+        if len(self._buffer) >= RECIPE_WRITE_BATCH_SIZE:
+            self._wakeup.set()
+
+    def pending(self, recipe_id: str) -> Optional[Dict[str, Any]]:
+        """Full recipe JSON for a row that hasn't reached the database yet"""
+        return self._pending.get(str(recipe_id))
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=RECIPE_WRITE_FLUSH_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+            while self._buffer:
+                if not await self.flush():
+                    # Back off before retrying the failed batch
+                    await asyncio.sleep(RECIPE_WRITE_BACKOFF_SECONDS)
+                    break
+
+    async def flush(self) -> bool:
+        """Upsert one batch; returns False if it failed and was re-queued"""
+        async with self._flush_lock:
+            batch = self._buffer[:RECIPE_WRITE_BATCH_SIZE]
+            if not batch:
+                return True
+            del self._buffer[:len(batch)]
+
+            try:
+                await db.table("recipes").upsert(batch).execute()
+            except Exception as e:
+                print(f"⚠️ Recipe batch write failed ({len(batch)} recipes): {e}")
+                metrics.increment("recipe_writer.failed_batches")
+                self._requeue(batch)
+                return False
+
+            for row in batch:
+                recipe_id = str(row["id"])
+                self._pending.pop(recipe_id, None)
+                self._attempts.pop(recipe_id, None)
+            metrics.increment("recipe_writer.written", len(batch))
+            print(f"✅ Saved {len(batch)} recipes to database")
+            return True
+
+    def _requeue(self, batch: List[Dict[str, Any]]) -> None:
+        retry = []
+        for row in batch:
+            recipe_id = str(row["id"])
+            attempts = self._attempts.get(recipe_id, 0) + 1
+            if attempts >= RECIPE_WRITE_MAX_ATTEMPTS:
+                print(f"❌ Giving up on saving recipe '{row.get('name')}' after {attempts} attempts")
+                metrics.increment("recipe_writer.dropped")
+                self._attempts.pop(recipe_id, None)
+                self._pending.pop(recipe_id, None)
+                # Indexed when queued; the index mustn't serve a recipe that can't be loaded
+                recipe_index.discard(recipe_id)
+                continue
+            self._attempts[recipe_id] = attempts
+            retry.append(row)
+        # Failed rows go back to the front so ordering is preserved
+        self._buffer[:0] = retry
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "buffered": len(self._buffer),
+            "pending": len(self._pending),
+            "counters": metrics.snapshot("recipe_writer."),
+        }
+
+
+recipe_writer = RecipeWriter()
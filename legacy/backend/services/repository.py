@@ -0,0 +1,91 @@
+import os
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Optional
+
+from database import get_supabase_client
+from services import metrics
+
+# supabase-py is synchronous; its calls run on this many dedicated threads
+# instead of on the event loop (or the shared default executor)
+DB_MAX_WORKERS = int(os.getenv("DB_MAX_WORKERS", "16"))
+
+
+class AsyncQuery:
+    """
+    Wraps a supabase-py query builder. Builder methods (select, eq, order, ...)
+    chain exactly as before; only `execute()` changes, and must be awaited.
+    """
+
+    def __init__(self, repository: "Repository", builder: Any, table: str):
+        self._repository = repository
+        self._builder = builder
+        self._table = table
+
+    def __getattr__(self, name: str) -> Any:
+        attribute = getattr(self._builder, name)
+        if not callable(attribute):
+            return attribute
+
+        def chained(*args, **kwargs):
+            result = attribute(*args, **kwargs)
+            # Builders return new (or the same) builders; keep them wrapped
+            if hasattr(result, "execute"):
+                return AsyncQuery(self._repository, result, self._table)
+            return result
+
+        return chained
+
+    async def execute(self) -> Any:
+        return await self._repository.run(self._builder.execute, self._table)
+
+
+class Repository:
+    """
+    Non-blocking access to Supabase for async code.
+
+    `await db.table("meal_plans").select("*").eq("id", plan_id).execute()`
+    builds the query as usual and runs the PostgREST round trip on a bounded
+    thread pool, so the event loop keeps serving other requests meanwhile.
+    """
+
+    def __init__(self, max_workers: int = DB_MAX_WORKERS):
+        self.max_workers = max_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._in_flight = 0
+
+    @property
+    def client(self) -> Any:
+        return get_supabase_client()
+
+    def table(self, name: str) -> AsyncQuery:
+        return AsyncQuery(self, self.client.table(name), name)
+
+    def rpc(self, function: str, params: Optional[dict] = None) -> AsyncQuery:
+        return AsyncQuery(self, self.client.rpc(function, params or {}), f"rpc.{function}")
+
+    async def run(self, call, label: str = "query") -> Any:
+        """Run a blocking database call on the repository's thread pool"""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="db")
+
+        self._in_flight += 1
+        started = time.monotonic()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, call)
+        finally:
+            self._in_flight -= 1
+            metrics.increment(f"db.{label}.calls")
+            metrics.increment(f"db.{label}.seconds", time.monotonic() - started)
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def stats(self) -> dict:
+        return {"max_workers": self.max_workers, "in_flight": self._in_flight}
+
+
+db = Repository()
@@ -0,0 +1,203 @@
+import os
+import time
+import socket
+import asyncio
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from services.repository import db
+from services.chat_message_store import CHAT_HISTORY_WINDOW, SESSION_COLUMNS, chat_message_store, message_count
+from services.history_compaction import RollingSummary
+from services import metrics
+
+CHAT_SESSION_CACHE_ENABLED = os.getenv("CHAT_SESSION_CACHE_ENABLED", "true").lower() == "true"
+CHAT_SESSION_CACHE_MAX_ENTRIES = int(os.getenv("CHAT_SESSION_CACHE_MAX_ENTRIES", "1000"))
+CHAT_SESSION_CACHE_TTL_SECONDS = float(os.getenv("CHAT_SESSION_CACHE_TTL_SECONDS", "900"))
+
+# Optional affinity hint for multi-worker deployments: responses name the worker
+# holding the session so a proxy can route the next turn back to it. Without it,
+# a cached session is checked against the database's message_count before use.
+CHAT_STICKY_SESSIONS = os.getenv("CHAT_STICKY_SESSIONS", "false").lower() == "true"
+AFFINITY_HEADER = "X-Session-Affinity"
+WORKER_ID = os.getenv("WORKER_ID") or f"{socket.gethostname()}-{os.getpid()}"
+
+
+@dataclass
+class CachedSession:
+    session: Dict[str, Any]          # SESSION_COLUMNS row; message_count includes unsaved messages
+    recent: List[Dict[str, str]]     # last CHAT_HISTORY_WINDOW messages, oldest first
+    persisted_count: int             # messages already in chat_messages
+    expires_at: float
+    pending_messages: List[Dict[str, str]] = field(default_factory=list)
+    pending_update: Dict[str, Any] = field(default_factory=dict)
+    summary: Optional[RollingSummary] = None  # older messages folded into a rolling summary
+    summarizing: bool = False
+    # Structured data (onboarding profile, weekly constraints) extracted as the user answers
+    draft: Optional[Dict[str, Any]] = None
+    draft_through: int = 0  # session messages the draft has seen
+    draft_task: Optional["asyncio.Task[None]"] = None
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+
+    @property
+    def dirty(self) -> bool:
+        return bool(self.pending_messages or self.pending_update)
+
+    @property
+    def first_sequence(self) -> int:
+        """Session sequence number of the first message in `recent`"""
+        return message_count(self.session) - len(self.recent)
+
+
+class SessionCache:
+    """
+    LRU/TTL cache of active chat sessions with write-behind persistence.
+
+    A turn served by the same worker as the previous one skips both database
+    reads (session row and message window); without sticky sessions a
+    one-column message_count read confirms no other worker has moved the
+    session on, and a stale entry is reloaded. Turn writes are recorded in memory
+    and persisted by `flush()`, normally from a background task after the
+    response has gone out; several unsaved turns are written together. A miss
+    (restart, eviction, another worker) falls back to the database.
+    """
+
+    def __init__(self, max_entries: int = CHAT_SESSION_CACHE_MAX_ENTRIES, ttl_seconds: float = CHAT_SESSION_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, CachedSession]" = OrderedDict()
+
+    @property
+    def write_behind(self) -> bool:
+        return CHAT_SESSION_CACHE_ENABLED
+
+    def remember(self, session: Dict[str, Any], recent: Optional[List[Dict[str, str]]] = None) -> CachedSession:
+        """Cache a session row (e.g. one just created)"""
+        session = {column.strip(): session.get(column.strip()) for column in SESSION_COLUMNS.split(",")}
+        entry = CachedSession(
+            session=session,
+            recent=list(recent or [])[-CHAT_HISTORY_WINDOW:],
+            persisted_count=message_count(session),
+            expires_at=time.monotonic() + self.ttl_seconds,
+        )
+        if CHAT_SESSION_CACHE_ENABLED:
+            self._entries[session["id"]] = entry
+            self._entries.move_to_end(session["id"])
+            self._evict()
+        return entry
+
+    async def load(self, session_id: str) -> Optional[CachedSession]:
+        """Cached session state, or the database copy on a miss (None if the session doesn't exist)"""
+        entry = self._entries.get(session_id)
+        if entry is not None:
+            if (entry.dirty or entry.expires_at > time.monotonic()) and await self._current(session_id, entry):
+                entry.expires_at = time.monotonic() + self.ttl_seconds
+                self._entries.move_to_end(session_id)
+                metrics.increment("session_cache.hit")
+                return entry
+            if entry.dirty:
+                # Save our unsaved turns before reading the session back
+                await self.flush_quietly(session_id)
+            if self._entries.get(session_id) is entry:
+                del self._entries[session_id]
+
+        metrics.increment("session_cache.miss")
+        result = await db.table("chat_sessions").select(SESSION_COLUMNS).eq("id", session_id).execute()
+        if not result.data:
+            return None
+
+        session = result.data[0]
+        recent = await chat_message_store.recent(session_id, CHAT_HISTORY_WINDOW) if message_count(session) else []
+
+        return self.remember(session, recent)
+
+    async def _current(self, session_id: str, entry: CachedSession) -> bool:
+        """Whether the cached entry still reflects every message in the database"""
+        if CHAT_STICKY_SESSIONS:
+            return True  # the proxy sends this session's turns to this worker only
+        result = await db.table("chat_sessions").select("message_count").eq("id", session_id).execute()
+        if result.data and message_count(result.data[0]) == entry.persisted_count:
+            return True
+        metrics.increment("session_cache.stale")
+        return False
+
+    def record_turn(self, entry: CachedSession, messages: List[Dict[str, str]], update: Dict[str, Any]) -> None:
+        """Apply a turn to the cached state and queue it for persistence"""
+        entry.pending_messages.extend(messages)
+        entry.pending_update.update(update)
+        entry.session.update(update)
+        entry.session["message_count"] = message_count(entry.session) + len(messages)
+        entry.recent = (entry.recent + messages)[-CHAT_HISTORY_WINDOW:]
+
+    async def flush(self, session_id: str, entry: Optional[CachedSession] = None) -> None:
+        """Write a session's unsaved messages and latest session fields to the database"""
+        entry = entry or self._entries.get(session_id)
+        if entry is None:
+            return
+
+        async with entry.lock:
+            messages, update = entry.pending_messages, entry.pending_update
+            if not messages and not update:
+                return
+            entry.pending_messages, entry.pending_update = [], {}
+
+            try:
+                entry.persisted_count = await chat_message_store.append(session_id, entry.persisted_count, messages)
+                messages = []
+                await db.table("chat_sessions").update(
+                    {**update, "message_count": entry.persisted_count}
+                ).eq("id", session_id).execute()
+            except Exception as e:
+                # Keep what didn't make it for the next flush, ahead of anything newer
+                entry.pending_messages = messages + entry.pending_messages
+                entry.pending_update = {**update, **entry.pending_update}
+                metrics.increment("session_cache.flush_failed")
+                print(f"⚠️ Failed to persist chat session {session_id}: {e}")
+                if messages:
+                    await self._resync(session_id, entry)
+                raise
+
+            metrics.increment("session_cache.flushed")
+
+    async def _resync(self, session_id: str, entry: CachedSession) -> None:
+        # Another worker may have logged turns for this session (no affinity);
+        # continue the sequence after whatever is in the database now
+        try:
+            result = await db.table("chat_sessions").select("message_count").eq("id", session_id).execute()
+            if result.data:
+                entry.persisted_count = message_count(result.data[0])
+        except Exception:
+            pass
+
+    async def flush_quietly(self, session_id: str) -> None:
+        """Background-task flavour of `flush`: failures stay queued for the next flush"""
+        try:
+            await self.flush(session_id)
+        except Exception:
+            pass
+
+    async def flush_all(self) -> None:
+        for session_id, entry in list(self._entries.items()):
+            if entry.dirty:
+                await self.flush_quietly(session_id)
+
+    def _evict(self) -> None:
+        # Oldest clean entries go first; sessions with unsaved turns stay until flushed
+        for session_id in list(self._entries):
+            if len(self._entries) <= self.max_entries:
+                break
+            if not self._entries[session_id].dirty:
+                del self._entries[session_id]
+                metrics.increment("session_cache.evicted")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": CHAT_SESSION_CACHE_ENABLED,
+            "entries": len(self._entries),
+            "dirty": sum(1 for entry in self._entries.values() if entry.dirty),
+            "worker_id": WORKER_ID,
+            "counters": metrics.snapshot("session_cache."),
+        }
+
+
+session_cache = SessionCache()
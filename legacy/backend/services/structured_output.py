@@ -0,0 +1,277 @@
+import json
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from services.llm_gateway import chat_completion, forget_completion
+from services.llm_cache import CachePolicy
+from services.llm_scheduler import Priority
+from services.history_compaction import CHARS_PER_TOKEN
+from services import metrics
+
+# How many cut points to try when salvaging a truncated response
+MAX_REPAIR_ATTEMPTS = 20
+
+REASK_PROMPT = """Your previous answer was cut off or incomplete. These fields were usable:
+{partial}
+
+Respond with ONLY a JSON object containing the missing fields: {missing}
+Keep them consistent with the fields above and follow the format from the original instructions."""
+
+
+class StructuredOutputError(ValueError):
+    """The model's output couldn't be turned into the expected JSON object"""
+
+
+@dataclass
+class OutputSchema:
+    """
+    Expected shape of one agent's JSON output: required top-level fields and
+    their types, plus an optional `check` that raises ValueError for anything
+    type checks can't express (including fields that mustn't be empty).
+    """
+    name: str
+    required: Dict[str, Tuple[type, ...]] = field(default_factory=dict)
+    check: Optional[Callable[[Dict[str, Any]], None]] = None
+
+
+@dataclass
+class ParsedOutput:
+    data: Dict[str, Any]
+    missing: List[str]   # required fields absent, mistyped or cut off
+    repaired: bool       # the JSON itself needed fixing (truncation, trailing commas)
+
+
+def _strip_trailing_comma(out: List[str]) -> bool:
+    while out and out[-1].isspace():
+        out.pop()
+    if out and out[-1] == ",":
+        out.pop()
+        return True
+    return False
+
+
+def _closing(stack: List[str]) -> str:
+    return "".join("}" if opener == "{" else "]" for opener in reversed(stack))
+
+
+@dataclass
+class _Scan:
+    json: str                # cleaned text of the first JSON value
+    complete: bool
+    stack: List[str]         # brackets still open where the text ran out
+    in_string: bool          # ran out inside a string
+    top_key: Optional[str]   # top-level field being written where the text ran out
+    # Points a truncated document can be closed at: output length, open brackets,
+    # and the top-level field left incomplete by cutting there
+    cuts: List[Tuple[int, List[str], Optional[str]]]
+    fixed_commas: bool = False  # trailing commas were dropped
+
+
+def _scan(text: str) -> _Scan:
+    """Walk the first JSON object or array in `text`, dropping trailing commas"""
+    start = min((i for i in (text.find("{"), text.find("[")) if i >= 0), default=-1)
+    if start < 0:
+        raise StructuredOutputError("no JSON object in the response")
+
+    out: List[str] = []
+    stack: List[str] = []
+    cuts: List[Tuple[int, List[str], Optional[str]]] = []
+    in_string = escape = False
+    string_start = 0
+    top_key: Optional[str] = None
+    expecting_key = False
+    fixed_commas = False
+
+    for ch in text[start:]:
+        if in_string:
+            out.append(ch)
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+                if expecting_key and len(stack) == 1 and stack[0] == "{":
+                    top_key = json.loads("".join(out[string_start:]))
+                    expecting_key = False
+            continue
+
+        if ch == '"':
+            in_string = True
+            string_start = len(out)
+        elif ch in "{[":
+            stack.append(ch)
+            expecting_key = ch == "{" and len(stack) == 1
+        elif ch in "}]":
+            fixed_commas = _strip_trailing_comma(out) or fixed_commas
+            out.append(ch)
+            if stack:
+                stack.pop()
+            if not stack:
+                return _Scan("".join(out), True, [], False, None, cuts, fixed_commas)
+            continue
+        elif ch == ",":
+            # Everything before a comma is a complete element of its container
+            cuts.append((len(out), list(stack), top_key if len(stack) > 1 else None))
+            expecting_key = len(stack) == 1 and stack[0] == "{"
+        out.append(ch)
+
+    return _Scan("".join(out), False, stack, in_string, top_key, cuts, fixed_commas)
+
+
+def _repair(scan: _Scan) -> Tuple[Any, Optional[str]]:
+    """Close a truncated document; returns the data and the top-level field that was cut off"""
+    # Cheapest first: close the open brackets where the text stopped
+    candidates = []
+    if not scan.in_string:
+        out = list(scan.json)
+        _strip_trailing_comma(out)
+        candidates.append(("".join(out) + _closing(scan.stack), scan.top_key))
+    # Otherwise back up to the last complete element
+    for length, open_stack, key in reversed(scan.cuts[-MAX_REPAIR_ATTEMPTS:]):
+        candidates.append((scan.json[:length] + _closing(open_stack), key))
+
+    for candidate, cut_key in candidates:
+        try:
+            return json.loads(candidate), cut_key
+        except json.JSONDecodeError:
+            continue
+    raise StructuredOutputError("truncated JSON could not be repaired")
+
+
+def parse_structured(text: str, schema: OutputSchema) -> ParsedOutput:
+    """
+    Find the JSON object in a model response (code fences, surrounding prose),
+    fix trailing commas and close a truncated document, then validate it
+    against `schema`. Raises StructuredOutputError if nothing usable is there.
+    """
+    scan = _scan(text or "")
+
+    cut_key = None
+    if scan.complete:
+        try:
+            data = json.loads(scan.json)
+        except json.JSONDecodeError as e:
+            raise StructuredOutputError(f"invalid JSON: {e}")
+    else:
+        data, cut_key = _repair(scan)
+
+    if not isinstance(data, dict):
+        raise StructuredOutputError("response is not a JSON object")
+
+    # A field that was still being written when the output stopped is incomplete
+    if cut_key is not None:
+        data.pop(cut_key, None)
+
+    # Absent or mistyped only: an empty value can be a legitimate answer
+    missing = [
+        name for name, types in schema.required.items()
+        if name not in data or not isinstance(data[name], types)
+    ]
+    for name in missing:
+        data.pop(name, None)
+
+    if schema.check is not None and not missing:
+        try:
+            schema.check(data)
+        except ValueError as e:
+            raise StructuredOutputError(str(e))
+
+    # Code fences and surrounding prose are expected; they don't count as a repair
+    return ParsedOutput(data=data, missing=missing, repaired=not scan.complete or scan.fixed_commas)
+
+
+async def request_structured(
+    messages: List[Dict[str, str]],
+    schema: OutputSchema,
+    *,
+    model: str = "gpt-5-mini",
+    max_tokens: Optional[int] = None,
+    temperature: Optional[float] = None,
+    cache: Optional[CachePolicy] = None,
+    priority: Optional[Priority] = None
+) -> Dict[str, Any]:
+    """
+    chat_completion that returns the validated JSON object from the response.
+
+    A response with some required fields missing or cut off is completed by a
+    short follow-up call asking for just those fields, rather than generating
+    everything again. A cached response that can't be used is dropped from
+    the cache when StructuredOutputError is raised. Counters
+    (structured_output.<schema>.*) feed `structured_output_stats()`.
+    """
+    prefix = f"structured_output.{schema.name}"
+    metrics.increment(f"{prefix}.calls")
+
+    response = await chat_completion(
+        messages=messages, model=model, max_tokens=max_tokens,
+        temperature=temperature, cache=cache, priority=priority,
+    )
+    raw = response.get("message", {}).get("content", "")
+
+    async def forget_response() -> None:
+        # The gateway caches any non-empty response; don't serve this one again
+        if cache is not None:
+            await forget_completion(messages, model=model, max_tokens=max_tokens, temperature=temperature)
+
+    try:
+        parsed = parse_structured(raw, schema)
+    except StructuredOutputError as e:
+        metrics.increment(f"{prefix}.failed")
+        print(f"❌ {schema.name} output unusable: {e}")
+        print(f"❌ Raw content that failed: {raw}")
+        await forget_response()
+        raise
+
+    if not parsed.repaired and not parsed.missing:
+        metrics.increment(f"{prefix}.clean")
+    if parsed.repaired:
+        metrics.increment(f"{prefix}.repaired")
+    if not parsed.missing:
+        if parsed.repaired:
+            # Without the repair this output would have been thrown away and regenerated
+            metrics.increment(f"{prefix}.tokens_saved", len(raw) // CHARS_PER_TOKEN)
+        return parsed.data
+
+    print(f"🔁 {schema.name} output missing {parsed.missing}; asking for just those fields")
+    metrics.increment(f"{prefix}.reasked")
+    followup = await chat_completion(
+        messages=messages + [{
+            "role": "user",
+            "content": REASK_PROMPT.format(partial=json.dumps(parsed.data, indent=2), missing=", ".join(parsed.missing)),
+        }],
+        model=model, max_tokens=max_tokens, temperature=temperature, priority=priority,
+    )
+    followup_raw = followup.get("message", {}).get("content", "")
+
+    try:
+        patch = parse_structured(followup_raw, OutputSchema(name=schema.name))
+        merged = {**parsed.data, **patch.data}
+        result = parse_structured(json.dumps(merged), schema)
+    except StructuredOutputError as e:
+        metrics.increment(f"{prefix}.failed")
+        await forget_response()
+        raise StructuredOutputError(f"{schema.name} output still incomplete after follow-up: {e}")
+    if result.missing:
+        metrics.increment(f"{prefix}.failed")
+        await forget_response()
+        raise StructuredOutputError(f"{schema.name} output still missing {result.missing}")
+
+    metrics.increment(f"{prefix}.tokens_saved", max(0, len(raw) - len(followup_raw)) // CHARS_PER_TOKEN)
+    return result.data
+
+
+def structured_output_stats() -> Dict[str, Any]:
+    """Per-schema parse outcomes: how often raw output needed repair, a follow-up, or failed"""
+    counters = metrics.snapshot("structured_output.")
+    stats: Dict[str, Dict[str, float]] = {}
+    for name, value in counters.items():
+        schema, counter = name[len("structured_output."):].rsplit(".", 1)
+        stats.setdefault(schema, {})[counter] = value
+
+    for values in stats.values():
+        calls = values.get("calls", 0)
+        if calls:
+            values["raw_parse_failure_rate"] = round(1 - values.get("clean", 0) / calls, 3)
+            values["failure_rate"] = round(values.get("failed", 0) / calls, 3)
+    return stats
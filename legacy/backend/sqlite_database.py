@@ -0,0 +1,475 @@
+"""
+Local SQLite storage backend.
+
+Implements the subset of the supabase-py table API the backend uses
+(select/eq/neq/gt/gte/lt/lte/like/ilike/contains/in_/is_/order/limit,
+insert/update/upsert/delete) on top of SQLite and its JSON1 functions, so the
+app can run, be benchmarked and load-tested with no network.
+
+The schema is built from schema.sql and migrations/*.sql: Postgres types are
+mapped to SQLite ones (JSONB and TEXT[] columns are stored as JSON text and
+decoded on read), and statements SQLite can't express (functions, triggers,
+row level security, views, GIN indexes, data backfills) are skipped. The
+stored functions the backend calls through rpc() are reimplemented in
+SQLITE_RPC_FUNCTIONS; like an unknown table, an unknown function is a ValueError.
+"""
+
+import os
+import re
+import json
+import glob
+import uuid
+import sqlite3
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+SCHEMA_FILES = [os.path.join(BACKEND_DIR, "schema.sql")] + sorted(
+    glob.glob(os.path.join(BACKEND_DIR, "migrations", "*.sql"))
+)
+
+_IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _identifier(name: str) -> str:
+    name = name.strip()
+    if not _IDENTIFIER.match(name):
+        raise ValueError(f"Invalid column or table name: {name!r}")
+    return f'"{name}"'
+
+
+@dataclass
+class TableInfo:
+    columns: List[str] = field(default_factory=list)
+    json_columns: set = field(default_factory=set)
+    bool_columns: set = field(default_factory=set)
+    uuid_columns: set = field(default_factory=set)  # DEFAULT gen_random_uuid()
+    now_columns: set = field(default_factory=set)   # DEFAULT NOW()
+
+
+@dataclass
+class SQLiteResponse:
+    """Same shape as postgrest's APIResponse"""
+    data: List[Dict[str, Any]]
+    count: Optional[int] = None
+
+
+# ---------- schema translation ----------
+
+def _split_top_level(body: str) -> List[str]:
+    parts, depth, current = [], 0, []
+    for char in body:
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        if char == "," and depth == 0:
+            parts.append("".join(current).strip())
+            current = []
+        else:
+            current.append(char)
+    if "".join(current).strip():
+        parts.append("".join(current).strip())
+    return parts
+
+
+def _translate_column(definition: str, info: TableInfo) -> str:
+    name = definition.split()[0]
+    upper = definition.upper()
+
+    if name.upper() in ("PRIMARY", "FOREIGN", "UNIQUE", "CHECK", "CONSTRAINT"):
+        return definition
+
+    info.columns.append(name)
+    if "JSONB" in upper or "[]" in upper:
+        info.json_columns.add(name)
+    if "BOOLEAN" in upper:
+        info.bool_columns.add(name)
+    if "GEN_RANDOM_UUID()" in upper or "UUID_GENERATE_V4()" in upper:
+        info.uuid_columns.add(name)
+    if "NOW()" in upper:
+        info.now_columns.add(name)
+
+    translated = definition
+    substitutions = [
+        (r"DEFAULT\s+(gen_random_uuid|uuid_generate_v4|NOW)\(\)", ""),
+        (r"'([^']*)'::jsonb", r"'\1'"),
+        (r"\bTEXT\[\]", "TEXT"),
+        (r"\bJSONB\b", "TEXT"),
+        (r"\bUUID\b", "TEXT"),
+        (r"\bTIMESTAMP WITH TIME ZONE\b", "TEXT"),
+        (r"\bDATE\b", "TEXT"),
+        (r"\bDECIMAL\(\d+,\s*\d+\)", "REAL"),
+        (r"\bBOOLEAN\b", "INTEGER"),
+        (r"\bDEFAULT\s+FALSE\b", "DEFAULT 0"),
+        (r"\bDEFAULT\s+TRUE\b", "DEFAULT 1"),
+    ]
+    for pattern, replacement in substitutions:
+        translated = re.sub(pattern, replacement, translated, flags=re.IGNORECASE)
+    return re.sub(r"\s+", " ", translated).strip()
+
+
+def _statements(sql: str) -> List[str]:
+    sql = re.sub(r"\$\$.*?\$\$", "", sql, flags=re.DOTALL)  # function bodies
+    sql = re.sub(r"--[^\n]*", "", sql)
+    return [statement.strip() for statement in sql.split(";") if statement.strip()]
+
+
+def translate_schema(sql_texts: Sequence[str]) -> Tuple[List[str], Dict[str, TableInfo], List[Tuple[str, str, str]]]:
+    """
+    Translate Postgres DDL into (create statements, table info, added columns).
+    Added columns (ALTER TABLE ... ADD COLUMN) are returned separately because
+    SQLite has no ADD COLUMN IF NOT EXISTS.
+    """
+    creates: List[str] = []
+    indexes: List[str] = []
+    added_columns: List[Tuple[str, str, str]] = []
+    tables: Dict[str, TableInfo] = {}
+
+    for sql in sql_texts:
+        for statement in _statements(sql):
+            create = re.match(
+                r"CREATE TABLE (?:IF NOT EXISTS )?(\w+)\s*\((.*)\)\s*$", statement, re.IGNORECASE | re.DOTALL
+            )
+            if create:
+                name, body = create.groups()
+                info = tables.setdefault(name, TableInfo())
+                columns = [_translate_column(part, info) for part in _split_top_level(body)]
+                creates.append(f"CREATE TABLE IF NOT EXISTS {name} (\n    " + ",\n    ".join(columns) + "\n)")
+                continue
+
+            alter = re.match(
+                r"ALTER TABLE (\w+) ADD COLUMN (?:IF NOT EXISTS )?(.*)$", statement, re.IGNORECASE | re.DOTALL
+            )
+            if alter:
+                table, definition = alter.groups()
+                # The table may be created by a later file; its info is shared either way
+                info = tables.setdefault(table, TableInfo())
+                added_columns.append((table, definition.split()[0], _translate_column(definition, info)))
+                continue
+
+            index = re.match(
+                r"CREATE INDEX (?:IF NOT EXISTS )?(\w+) ON (\w+)\s*\((.*)\)\s*$", statement, re.IGNORECASE | re.DOTALL
+            )
+            if index and "USING" not in statement.upper():
+                name, table, columns = index.groups()
+                indexes.append(f"CREATE INDEX IF NOT EXISTS {name} ON {table}({columns})")
+
+    return creates + indexes, tables, added_columns
+
+
+# ---------- client ----------
+
+class SQLiteClient:
+    """Drop-in for the supabase-py client, backed by one SQLite database"""
+
+    def __init__(self, path: str = ":memory:", schema_files: Sequence[str] = SCHEMA_FILES):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA foreign_keys = ON")
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode = WAL")
+        self.tables: Dict[str, TableInfo] = {}
+        self._apply_schema(schema_files)
+
+    def _apply_schema(self, schema_files: Sequence[str]) -> None:
+        sql_texts = []
+        for schema_file in schema_files:
+            with open(schema_file) as f:
+                sql_texts.append(f.read())
+
+        statements, self.tables, added_columns = translate_schema(sql_texts)
+
+        with self._lock:
+            creates = [statement for statement in statements if statement.startswith("CREATE TABLE")]
+            for statement in creates:
+                self._conn.execute(statement)
+            for table, column, definition in added_columns:
+                existing = {row[1] for row in self._conn.execute(f"PRAGMA table_info({table})")}
+                if column not in existing:
+                    self._conn.execute(f"ALTER TABLE {table} ADD COLUMN {definition}")
+            for statement in statements:
+                if statement not in creates:
+                    self._conn.execute(statement)
+            self._conn.commit()
+
+    def table(self, name: str) -> "SQLiteQuery":
+        if name not in self.tables:
+            raise ValueError(f"Unknown table: {name}")
+        return SQLiteQuery(self, name)
+
+    def rpc(self, function: str, params: Optional[dict] = None) -> "SQLiteRPC":
+        if function not in SQLITE_RPC_FUNCTIONS:
+            raise ValueError(f"Unknown function: {function} (defined: {', '.join(sorted(SQLITE_RPC_FUNCTIONS))})")
+        return SQLiteRPC(self, function, params or {})
+
+    def execute(self, sql: str, params: Union[Sequence[Any], Dict[str, Any]]) -> List[sqlite3.Row]:
+        with self._lock:
+            try:
+                rows = self._conn.execute(sql, params).fetchall()
+                self._conn.commit()
+            except Exception:
+                self._conn.rollback()
+                raise
+        return rows
+
+
+# Postgres functions (migrations/*.sql) as SQL statements taking their named params.
+# Like postgrest, the response data is the function's return value.
+SQLITE_RPC_FUNCTIONS = {
+    # migrations/add_increment_function.sql; also bumps updated_at like the recipes trigger
+    "increment": (
+        "UPDATE recipes SET times_used = COALESCE(times_used, 0) + 1, updated_at = :now "
+        "WHERE id = :row_id RETURNING times_used"
+    ),
+}
+
+
+class SQLiteRPC:
+    def __init__(self, client: "SQLiteClient", function: str, params: Dict[str, Any]):
+        self._client = client
+        self.function = function
+        self.params = params
+
+    def execute(self) -> SQLiteResponse:
+        rows = self._client.execute(SQLITE_RPC_FUNCTIONS[self.function], {**self.params, "now": _now()})
+        return SQLiteResponse(data=rows[0][0] if rows else None)
+
+
+class SQLiteQuery:
+    """Chainable query builder mirroring postgrest's SyncRequestBuilder"""
+
+    def __init__(self, client: SQLiteClient, table: str):
+        self._client = client
+        self._table = table
+        self._info = client.tables[table]
+        self._operation = "select"
+        self._columns = "*"
+        self._count: Optional[str] = None
+        self._payload: Any = None
+        self._on_conflict = "id"
+        self._filters: List[Tuple[str, List[Any]]] = []
+        self._order: List[str] = []
+        self._limit: Optional[int] = None
+        self._offset: Optional[int] = None
+
+    # ---------- operations ----------
+
+    def select(self, *columns: str, count: Optional[str] = None) -> "SQLiteQuery":
+        self._operation = "select"
+        self._columns = ",".join(columns) or "*"
+        self._count = count
+        return self
+
+    def insert(self, data: Any, **kwargs) -> "SQLiteQuery":
+        self._operation = "insert"
+        self._payload = data
+        return self
+
+    def upsert(self, data: Any, on_conflict: str = "id", **kwargs) -> "SQLiteQuery":
+        self._operation = "upsert"
+        self._payload = data
+        self._on_conflict = on_conflict or "id"
+        return self
+
+    def update(self, data: Dict[str, Any], **kwargs) -> "SQLiteQuery":
+        self._operation = "update"
+        self._payload = data
+        return self
+
+    def delete(self, **kwargs) -> "SQLiteQuery":
+        self._operation = "delete"
+        return self
+
+    # ---------- filters ----------
+
+    def _filter(self, sql: str, *params: Any) -> "SQLiteQuery":
+        self._filters.append((sql, list(params)))
+        return self
+
+    def eq(self, column: str, value: Any) -> "SQLiteQuery":
+        return self._filter(f"{_identifier(column)} = ?", self._encode(column, value))
+
+    def neq(self, column: str, value: Any) -> "SQLiteQuery":
+        return self._filter(f"{_identifier(column)} != ?", self._encode(column, value))
+
+    def gt(self, column: str, value: Any) -> "SQLiteQuery":
+        return self._filter(f"{_identifier(column)} > ?", value)
+
+    def gte(self, column: str, value: Any) -> "SQLiteQuery":
+        return self._filter(f"{_identifier(column)} >= ?", value)
+
+    def lt(self, column: str, value: Any) -> "SQLiteQuery":
+        return self._filter(f"{_identifier(column)} < ?", value)
+
+    def lte(self, column: str, value: Any) -> "SQLiteQuery":
+        return self._filter(f"{_identifier(column)} <= ?", value)
+
+    def like(self, column: str, pattern: str) -> "SQLiteQuery":
+        glob_pattern = pattern.replace("*", "[*]").replace("?", "[?]").replace("%", "*").replace("_", "?")
+        return self._filter(f"{_identifier(column)} GLOB ?", glob_pattern)
+
+    def ilike(self, column: str, pattern: str) -> "SQLiteQuery":
+        return self._filter(f"LOWER({_identifier(column)}) LIKE LOWER(?)", pattern)
+
+    def contains(self, column: str, values: Any) -> "SQLiteQuery":
+        # Postgres `@>` on a JSON array: every wanted element is present
+        return self._filter(
+            f"NOT EXISTS (SELECT 1 FROM json_each(?) AS wanted WHERE wanted.value NOT IN "
+            f"(SELECT value FROM json_each(COALESCE({_identifier(column)}, '[]'))))",
+            json.dumps(list(values)),
+        )
+
+    def in_(self, column: str, values: Sequence[Any]) -> "SQLiteQuery":
+        values = [self._encode(column, value) for value in values]
+        if not values:
+            return self._filter("0")
+        return self._filter(f"{_identifier(column)} IN ({', '.join('?' * len(values))})", *values)
+
+    def is_(self, column: str, value: Any) -> "SQLiteQuery":
+        if value is None or str(value).lower() == "null":
+            return self._filter(f"{_identifier(column)} IS NULL")
+        return self._filter(f"{_identifier(column)} IS ?", self._encode(column, value))
+
+    # ---------- modifiers ----------
+
+    def order(self, column: str, desc: bool = False, nullsfirst: Optional[bool] = None, **kwargs) -> "SQLiteQuery":
+        # Postgres puts NULLs last ascending and first descending
+        nulls_first = desc if nullsfirst is None else nullsfirst
+        self._order.append(
+            f"{_identifier(column)} {'DESC' if desc else 'ASC'} NULLS {'FIRST' if nulls_first else 'LAST'}"
+        )
+        return self
+
+    def limit(self, size: int, **kwargs) -> "SQLiteQuery":
+        self._limit = int(size)
+        return self
+
+    def range(self, start: int, end: int, **kwargs) -> "SQLiteQuery":
+        self._offset = int(start)
+        self._limit = int(end) - int(start) + 1
+        return self
+
+    # ---------- execution ----------
+
+    def execute(self) -> SQLiteResponse:
+        handler = getattr(self, f"_execute_{self._operation}")
+        return handler()
+
+    def _where(self) -> Tuple[str, List[Any]]:
+        if not self._filters:
+            return "", []
+        return " WHERE " + " AND ".join(sql for sql, _ in self._filters), [
+            param for _, params in self._filters for param in params
+        ]
+
+    def _execute_select(self) -> SQLiteResponse:
+        columns = "*" if self._columns.strip() == "*" else ", ".join(
+            _identifier(column) for column in self._columns.split(",")
+        )
+        where, params = self._where()
+        sql = f"SELECT {columns} FROM {self._table}{where}"
+        if self._order:
+            sql += " ORDER BY " + ", ".join(self._order)
+        if self._limit is not None or self._offset is not None:
+            sql += f" LIMIT {self._limit if self._limit is not None else -1} OFFSET {self._offset or 0}"
+
+        data = [self._decode(row) for row in self._client.execute(sql, params)]
+
+        count = None
+        if self._count:
+            count = self._client.execute(f"SELECT COUNT(*) FROM {self._table}{where}", params)[0][0]
+        return SQLiteResponse(data=data, count=count)
+
+    def _prepare_rows(self) -> List[Dict[str, Any]]:
+        rows = self._payload if isinstance(self._payload, list) else [self._payload]
+        prepared = []
+        for row in rows:
+            row = dict(row)
+            for column in self._info.uuid_columns:
+                if row.get(column) is None:
+                    row[column] = str(uuid.uuid4())
+            for column in self._info.now_columns:
+                if row.get(column) is None:
+                    row[column] = _now()
+            prepared.append(row)
+        return prepared
+
+    def _execute_insert(self) -> SQLiteResponse:
+        return self._write_rows(conflict_clause="")
+
+    def _execute_upsert(self) -> SQLiteResponse:
+        return self._write_rows(conflict_clause=f" ON CONFLICT({_identifier(self._on_conflict)}) DO UPDATE SET {{updates}}")
+
+    def _write_rows(self, conflict_clause: str) -> SQLiteResponse:
+        data = []
+        for row in self._prepare_rows():
+            columns = list(row)
+            sql = (
+                f"INSERT INTO {self._table} ({', '.join(_identifier(column) for column in columns)}) "
+                f"VALUES ({', '.join('?' * len(columns))})"
+            )
+            if conflict_clause:
+                updates = ", ".join(
+                    f"{_identifier(column)} = excluded.{_identifier(column)}"
+                    for column in columns if column != self._on_conflict
+                )
+                sql += conflict_clause.format(updates=updates)
+            sql += " RETURNING *"
+            params = [self._encode(column, row[column]) for column in columns]
+            data.extend(self._decode(result) for result in self._client.execute(sql, params))
+        return SQLiteResponse(data=data)
+
+    def _execute_update(self) -> SQLiteResponse:
+        updates = dict(self._payload)
+        if "updated_at" in self._info.now_columns and "updated_at" not in updates:
+            updates["updated_at"] = _now()  # mirrors the recipes updated_at trigger
+
+        where, where_params = self._where()
+        sql = (
+            f"UPDATE {self._table} SET "
+            + ", ".join(f"{_identifier(column)} = ?" for column in updates)
+            + f"{where} RETURNING *"
+        )
+        params = [self._encode(column, value) for column, value in updates.items()] + where_params
+        return SQLiteResponse(data=[self._decode(row) for row in self._client.execute(sql, params)])
+
+    def _execute_delete(self) -> SQLiteResponse:
+        where, params = self._where()
+        rows = self._client.execute(f"DELETE FROM {self._table}{where} RETURNING *", params)
+        return SQLiteResponse(data=[self._decode(row) for row in rows])
+
+    # ---------- value conversion ----------
+
+    def _encode(self, column: str, value: Any) -> Any:
+        if value is None:
+            return None
+        if column in self._info.json_columns or isinstance(value, (dict, list)):
+            return json.dumps(value)
+        if isinstance(value, bool):
+            return int(value)
+        return value
+
+    def _decode(self, row: sqlite3.Row) -> Dict[str, Any]:
+        decoded = dict(row)
+        for column, value in decoded.items():
+            if value is None:
+                continue
+            if column in self._info.json_columns and isinstance(value, str):
+                decoded[column] = json.loads(value)
+            elif column in self._info.bool_columns:
+                decoded[column] = bool(value)
+        return decoded
+
+
+def create_sqlite_client(path: str) -> SQLiteClient:
+    print(f"🗄️ Using local SQLite storage at {path}")
+    return SQLiteClient(path)
@@ -0,0 +1,8 @@
+import os
+import sys
+
+# Tests run against the local SQLite backend, never Supabase
+os.environ.setdefault("STORAGE_BACKEND", "sqlite")
+os.environ.setdefault("SQLITE_DB_PATH", ":memory:")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,96 @@
+import asyncio
+import json
+
+import pytest
+
+import chat
+from services import concurrency
+from services.concurrency import ClientDisconnected, run_until_disconnected
+
+HOUSEHOLD = {"members": [{"name": "A"}], "cooking_skill": "beginner", "favorite_cuisines": ["Thai"]}
+
+
+def test_recipes_finished_before_a_disconnect_are_still_cached(monkeypatch):
+    monkeypatch.setattr(concurrency, "CLIENT_DISCONNECT_POLL_SECONDS", 0.01)
+    titles = {"monday": "Pad Thai", "tuesday": "Green Curry", "wednesday": "Dining Out"}
+    saved = []
+
+    async def menu(messages, schema, **kwargs):
+        return titles
+
+    async def develop_recipe(requirements, household_profile):
+        slow = "Green Curry" in requirements["special_requests"]
+        await asyncio.sleep(5 if slow else 0)
+        return {"name": requirements["special_requests"]}
+
+    monkeypatch.setattr(chat, "request_structured", menu)
+    monkeypatch.setattr(chat.recipe_service, "develop_recipe", develop_recipe)
+    monkeypatch.setattr(chat.recipe_service, "queue_recipe_save", lambda recipe: saved.append(recipe["name"]))
+    checks = []
+
+    async def is_disconnected():
+        checks.append(1)
+        return len(checks) > 3
+
+    async def scenario():
+        with pytest.raises(ClientDisconnected):
+            await run_until_disconnected(chat.generate_weekly_menu(HOUSEHOLD, {}), is_disconnected, "test")
+
+    asyncio.run(scenario())
+    # Monday's recipe was done and is kept for later plans; Tuesday's was cut off
+    assert len(saved) == 1 and "Pad Thai" in saved[0]
+
+
+def _replies(monkeypatch, *contents):
+    """Stub the gateway with canned assistant replies; returns the prompts it was sent"""
+    prompts = []
+    queued = list(contents)
+
+    async def chat_completion(messages, **kwargs):
+        prompts.append(messages)
+        return {"message": {"content": queued.pop(0)}}
+
+    monkeypatch.setattr(chat, "chat_completion", chat_completion)
+    return prompts
+
+
+def test_combined_turn_returns_the_reply_and_the_updated_profile(monkeypatch):
+    profile = {"members": [{"name": "Sam"}], "cooking_skill": "beginner", "favorite_cuisines": ["thai"], "dislikes": []}
+    prompts = _replies(monkeypatch, json.dumps({"reply": "Great, all set!", "completed": True, "data": profile}))
+
+    result = asyncio.run(chat.process_chat_turn_combined(
+        "I'm a beginner", [], "onboarding", state={"members": [{"name": "Sam"}]},
+    ))
+
+    assert result["message"] == "Great, all set!"
+    assert result["completed"] is True
+    assert result["structured"] == profile
+    # One call, and the model saw what was known before this turn
+    assert len(prompts) == 1
+    assert '{"members": [{"name": "Sam"}]}' in prompts[0][0]["content"]
+    assert prompts[0][-1] == {"role": "user", "content": "I'm a beginner"}
+
+
+def test_the_sentinel_in_a_combined_reply_still_completes_the_chat(monkeypatch):
+    _replies(monkeypatch, json.dumps({"reply": "Thanks! PROFILE_COMPLETE", "completed": False, "data": {}}))
+
+    result = asyncio.run(chat.process_chat_turn_combined("that's all", [], "onboarding"))
+
+    assert result["message"] == "Thanks!"
+    assert result["completed"] is True
+
+
+def test_unusable_combined_turns_fall_back_to_a_plain_reply(monkeypatch):
+    unusable = [
+        "Sure! Tell me more about your family.",
+        json.dumps({"reply": "Noted", "completed": False, "data": {"cooking_skill": "chef"}}),
+        json.dumps({"reply": "Noted", "completed": False, "data": {"someday": {}}}),
+    ]
+    for content, chat_type in zip(unusable, ["onboarding", "onboarding", "weekly_planning"]):
+        prompts = _replies(monkeypatch, content, "Plain reply")
+
+        result = asyncio.run(chat.process_chat_turn_combined("hello", [], chat_type))
+
+        assert result["message"] == "Plain reply"
+        assert "structured" not in result
+        assert len(prompts) == 2
@@ -0,0 +1,65 @@
+import asyncio
+import time
+
+from routes import chat as chat_routes
+from services.household_service import HouseholdService
+from services.session_cache import CachedSession
+
+
+def _entry(message_count, draft=None):
+    return CachedSession(
+        session={"id": "session-1", "message_count": message_count},
+        recent=[],
+        persisted_count=message_count,
+        expires_at=time.monotonic() + 60,
+        draft=draft,
+        draft_through=message_count + 1 if draft else 0,
+    )
+
+
+def test_completed_onboarding_household_is_readable_by_id_on_reply(monkeypatch):
+    async def no_extraction(chat_history):
+        raise AssertionError("the drafted profile should have been used")
+
+    monkeypatch.setattr(chat_routes, "extract_onboarding_data", no_extraction)
+    draft = {"members": [{"name": "A"}], "cooking_skill": "beginner"}
+    update_data, result = {}, {}
+
+    async def scenario():
+        await chat_routes._complete_onboarding(_entry(4, draft), [], "user-1", update_data, result)
+        # The reply carries the ID only once the row is written, so a plain read finds it
+        return await HouseholdService().get_household_profile(update_data["household_id"])
+
+    household = asyncio.run(scenario())
+    assert household["user_id"] == "user-1"
+    assert household["cooking_skill"] == "beginner"
+    assert result["extracted_data"]["id"] == update_data["household_id"]
+
+
+def test_structured_data_becomes_the_draft_only_if_the_draft_kept_up():
+    # The draft has seen the first 4 messages; this turn's user message is the 5th
+    entry = _entry(4, {"members": [{"name": "A"}]})
+    result = {"structured": {"members": [{"name": "A"}, {"name": "B"}]}}
+    chat_routes._apply_structured(entry, result)
+    assert entry.draft["members"][1]["name"] == "B"
+    assert entry.draft_through == 5
+    assert "structured" not in result
+
+    # A fresh entry has no draft history: the reply's data may have missed earlier turns
+    stale = _entry(4)
+    chat_routes._apply_structured(stale, {"structured": {"members": [{"name": "B"}]}})
+    assert stale.draft is None
+
+
+def test_drafted_profile_is_used_only_when_current_and_complete():
+    complete = {"members": [{"name": "A"}], "cooking_skill": "beginner"}
+    required = chat_routes.ONBOARDING_REQUIRED_FIELDS
+
+    async def drafted(entry):
+        return await chat_routes._drafted(entry, "onboarding", 5, required)
+
+    assert asyncio.run(drafted(_entry(4, complete))) == complete
+    assert asyncio.run(drafted(_entry(4, {"members": [{"name": "A"}]}))) is None
+    behind = _entry(4, complete)
+    behind.draft_through = 3
+    assert asyncio.run(drafted(behind)) is None
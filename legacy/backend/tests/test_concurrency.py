@@ -0,0 +1,120 @@
+import asyncio
+
+import pytest
+
+from services import concurrency
+from services.concurrency import ClientDisconnected, run_bounded, run_until_disconnected
+from services.deadline import DeadlineExceeded, call_timeout, deadline_scope, remaining
+
+
+def _sleeper(seconds, started, key):
+    async def job():
+        started.append(key)
+        await asyncio.sleep(seconds)
+        return key
+    return job
+
+
+def test_nested_deadline_scope_only_shortens_the_budget():
+    with deadline_scope(10):
+        with deadline_scope(60):
+            assert remaining() <= 10
+        with deadline_scope(1):
+            assert remaining() <= 1
+    assert remaining() is None
+    assert call_timeout(30) == 30
+
+
+def test_call_timeout_refuses_to_start_without_the_minimum_budget():
+    with deadline_scope(0.5):
+        assert call_timeout(30, minimum=0.1) <= 0.5
+        with pytest.raises(DeadlineExceeded):
+            call_timeout(30, minimum=1)
+
+
+def test_jobs_whose_turn_comes_after_the_deadline_do_not_run():
+    started = []
+    jobs = {key: _sleeper(0.2, started, key) for key in ("a", "b", "c")}
+
+    async def scenario():
+        with deadline_scope(0.1):
+            return await run_bounded(jobs, limit=1, timeout=5)
+
+    results = asyncio.run(scenario())
+    # The first job is cut at the deadline; the others never start
+    assert isinstance(results["a"], TimeoutError)
+    assert isinstance(results["b"], DeadlineExceeded)
+    assert isinstance(results["c"], DeadlineExceeded)
+    assert started == ["a"]
+
+
+def test_a_slow_job_times_out_without_failing_its_siblings():
+    started = []
+    jobs = {"slow": _sleeper(1, started, "slow"), "fast": _sleeper(0, started, "fast")}
+    reported = []
+
+    async def scenario():
+        return await run_bounded(jobs, limit=2, timeout=0.05, on_result=lambda key, result: reported.append(key))
+
+    results = asyncio.run(scenario())
+    assert isinstance(results["slow"], TimeoutError)
+    assert results["fast"] == "fast"
+    assert list(results) == ["slow", "fast"]
+    assert reported == ["fast", "slow"]
+
+
+def _client(connected_for):
+    """is_disconnected for a client that goes away after `connected_for` seconds"""
+    gone_at = None
+
+    async def is_disconnected():
+        nonlocal gone_at
+        loop = asyncio.get_running_loop()
+        gone_at = gone_at or loop.time() + connected_for
+        return loop.time() >= gone_at
+    return is_disconnected
+
+
+def test_disconnect_cancels_every_outstanding_job(monkeypatch):
+    monkeypatch.setattr(concurrency, "CLIENT_DISCONNECT_POLL_SECONDS", 0.01)
+    started, finished = [], []
+
+    def job(key, seconds):
+        async def run():
+            started.append(key)
+            await asyncio.sleep(seconds)
+            finished.append(key)
+        return run
+
+    jobs = {"quick": job("quick", 0), "slow": job("slow", 5), "queued": job("queued", 5)}
+
+    async def scenario():
+        with pytest.raises(ClientDisconnected):
+            await run_until_disconnected(run_bounded(jobs, limit=2), _client(0.05), "test")
+        # Give any job that survived the cancellation a chance to start
+        await asyncio.sleep(0.05)
+
+    asyncio.run(scenario())
+    assert finished == ["quick"]
+    assert "slow" in started
+
+
+def test_connected_client_gets_the_result(monkeypatch):
+    monkeypatch.setattr(concurrency, "CLIENT_DISCONNECT_POLL_SECONDS", 0.01)
+
+    async def work():
+        await asyncio.sleep(0.05)
+        return "plan"
+
+    assert asyncio.run(run_until_disconnected(work(), _client(5), "test")) == "plan"
+
+
+def test_a_broken_disconnect_check_does_not_cancel_the_work(monkeypatch):
+    async def is_disconnected():
+        raise RuntimeError("no request")
+
+    async def work():
+        await asyncio.sleep(0.02)
+        return "plan"
+
+    assert asyncio.run(run_until_disconnected(work(), is_disconnected, "test")) == "plan"
@@ -0,0 +1,63 @@
+from services import history_compaction
+from services.history_compaction import RollingSummary, compact_history, estimate_tokens, summary_target
+
+
+def _messages(count, start=0, size=10):
+    return [
+        {"role": "user" if i % 2 == 0 else "assistant", "content": f"{i:03d}" + "x" * size}
+        for i in range(start, start + count)
+    ]
+
+
+def _numbers(messages):
+    return [int(message["content"][:3]) for message in messages if message["role"] != "system"]
+
+
+def test_history_within_budget_and_without_summary_is_sent_as_is():
+    history = _messages(6)
+    compacted = compact_history(history, "onboarding")
+    assert compacted.messages == history
+    assert compacted.tokens_saved == 0
+
+
+def test_summary_replaces_the_messages_it_covers():
+    history = _messages(12)
+    compacted = compact_history(history, "onboarding", summary=RollingSummary(text="- two adults", through=4))
+
+    assert compacted.messages[0] == {"role": "system", "content": "Summary of the earlier conversation:\n- two adults"}
+    assert _numbers(compacted.messages) == list(range(4, 12))
+
+
+def test_summary_never_replaces_the_verbatim_turns():
+    history = _messages(10)
+    # Onboarding keeps its last 4 turns (8 messages) verbatim even if the summary covers them
+    compacted = compact_history(history, "onboarding", summary=RollingSummary(text="- facts", through=10))
+    assert _numbers(compacted.messages) == list(range(2, 10))
+
+
+def test_summary_coverage_counts_from_the_windows_first_sequence():
+    # The cached window holds session messages 20..31; the summary covers the first 24
+    history = _messages(12, start=20)
+    compacted = compact_history(history, "weekly_planning", summary=RollingSummary(text="- busy tuesday", through=24), first_sequence=20)
+    assert _numbers(compacted.messages) == list(range(24, 32))
+
+
+def test_over_budget_drops_the_oldest_messages_but_keeps_the_latest_exchange(monkeypatch):
+    history = _messages(8, size=80)  # ~24 tokens each
+    monkeypatch.setitem(history_compaction.HISTORY_TOKEN_BUDGETS, "onboarding", 80)
+
+    compacted = compact_history(history, "onboarding")
+    assert _numbers(compacted.messages) == [5, 6, 7]
+    assert compacted.tokens_before == estimate_tokens(history)
+    assert compacted.tokens_after == estimate_tokens(compacted.messages) <= 80
+
+    monkeypatch.setitem(history_compaction.HISTORY_TOKEN_BUDGETS, "onboarding", 1)
+    assert _numbers(compact_history(history, "onboarding").messages) == [6, 7]
+
+
+def test_summary_is_rolled_forward_only_once_enough_messages_age_out():
+    # Weekly planning keeps 6 messages verbatim and waits for 4 new ones
+    assert summary_target("weekly_planning", 9, None) is None
+    assert summary_target("weekly_planning", 10, None) == 4
+    assert summary_target("weekly_planning", 13, RollingSummary(text="- facts", through=4)) is None
+    assert summary_target("weekly_planning", 14, RollingSummary(text="- facts", through=4)) == 8
@@ -0,0 +1,104 @@
+import asyncio
+
+import pytest
+
+from services import llm_gateway
+from services.deadline import DeadlineExceeded, deadline_scope
+
+
+def test_short_deadline_does_not_cut_a_shared_call(monkeypatch):
+    posts = []
+
+    async def slow_post(payload, key, cache):
+        posts.append(key)
+        await asyncio.sleep(0.3)
+        return {"message": {"content": "done"}}
+
+    monkeypatch.setattr(llm_gateway, "_post_completion", slow_post)
+    monkeypatch.setattr(llm_gateway, "DEADLINE_MIN_CALL_SECONDS", 0.0)
+    messages = [{"role": "user", "content": "hi"}]
+
+    async def hurried():
+        with deadline_scope(0.1):
+            return await llm_gateway.chat_completion(messages)
+
+    async def scenario():
+        leader = asyncio.create_task(hurried())
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(llm_gateway.chat_completion(messages))
+
+        with pytest.raises(DeadlineExceeded):
+            await leader
+        # The leader gave up, but the call it started still serves the follower
+        assert (await follower)["message"]["content"] == "done"
+        assert len(posts) == 1
+
+    asyncio.run(scenario())
+
+
+class _FakeStreamResponse:
+    status_code = 200
+
+    def __init__(self, events, delay):
+        self.events = events
+        self.delay = delay
+
+    async def aiter_lines(self):
+        for event in self.events:
+            await asyncio.sleep(self.delay)
+            yield f"data: {event}"
+
+
+class _FakeStreamClient:
+    def __init__(self, events, delay=0.0):
+        self.events = events
+        self.delay = delay
+        self.payloads = []
+
+    def stream(self, method, url, json):
+        client = self
+
+        class _Context:
+            async def __aenter__(self):
+                client.payloads.append(json)
+                return _FakeStreamResponse(client.events, client.delay)
+
+            async def __aexit__(self, *exc):
+                return False
+
+        return _Context()
+
+
+def _stream_events(*deltas):
+    return [f'{{"delta": "{delta}"}}' for delta in deltas] + ['{"done": true}']
+
+
+def test_stream_sends_the_same_payload_as_a_plain_call(monkeypatch):
+    client = _FakeStreamClient(_stream_events("Hel", "lo"))
+    monkeypatch.setattr(llm_gateway, "get_gateway_client", lambda: client)
+    messages = [{"role": "user", "content": "hi"}]
+
+    async def scenario():
+        return [delta async for delta in llm_gateway.chat_completion_stream(messages, max_tokens=50, temperature=0.2)]
+
+    assert asyncio.run(scenario()) == ["Hel", "lo"]
+    assert client.payloads == [
+        llm_gateway._completion_payload(messages, "gpt-5-mini", "openai", 50, 0.2)
+    ]
+
+
+def test_stream_is_bounded_by_the_request_deadline(monkeypatch):
+    client = _FakeStreamClient(_stream_events("a", "b", "c", "d"), delay=0.1)
+    monkeypatch.setattr(llm_gateway, "get_gateway_client", lambda: client)
+    monkeypatch.setattr(llm_gateway, "DEADLINE_MIN_CALL_SECONDS", 0.0)
+    received = []
+
+    async def scenario():
+        with deadline_scope(0.25):
+            async for delta in llm_gateway.chat_completion_stream([{"role": "user", "content": "hi"}]):
+                received.append(delta)
+
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(scenario())
+    # Deltas that arrived within the budget were still delivered
+    assert received == ["a", "b"]
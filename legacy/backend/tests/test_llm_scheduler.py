@@ -0,0 +1,54 @@
+import asyncio
+
+from services import llm_scheduler as scheduler_module
+from services.llm_scheduler import AdaptiveLimiter, Priority
+
+
+def test_interactive_caller_takes_the_reserved_slot_past_queued_background_work(monkeypatch):
+    monkeypatch.setattr(scheduler_module, "LLM_CONCURRENCY_INITIAL", 3)
+    monkeypatch.setattr(scheduler_module, "LLM_INTERACTIVE_RESERVE", 1)
+
+    async def scenario():
+        limiter = AdaptiveLimiter("test", max_limit=3)
+        # Background work fills the non-reserved capacity...
+        await limiter.acquire(Priority.BACKGROUND)
+        await limiter.acquire(Priority.BACKGROUND)
+        # ...and one more background caller queues behind it
+        queued = asyncio.create_task(limiter.acquire(Priority.BACKGROUND))
+        await asyncio.sleep(0)
+        assert not queued.done()
+
+        # The chat turn gets the reserved slot without waiting for a release
+        await asyncio.wait_for(limiter.acquire(Priority.INTERACTIVE), timeout=0.1)
+        assert limiter.in_flight == 3
+        assert not queued.done()
+        queued.cancel()
+
+    asyncio.run(scenario())
+
+
+def test_queued_callers_are_served_in_priority_order(monkeypatch):
+    monkeypatch.setattr(scheduler_module, "LLM_CONCURRENCY_INITIAL", 2)
+    monkeypatch.setattr(scheduler_module, "LLM_INTERACTIVE_RESERVE", 1)
+
+    async def scenario():
+        limiter = AdaptiveLimiter("test", max_limit=2)
+        await limiter.acquire(Priority.INTERACTIVE)
+        await limiter.acquire(Priority.INTERACTIVE)
+        order = []
+
+        async def wait(priority):
+            await limiter.acquire(priority)
+            order.append(priority)
+
+        waiters = [asyncio.create_task(wait(p)) for p in (Priority.BACKGROUND, Priority.PLAN_GENERATION)]
+        await asyncio.sleep(0)
+        limiter.release()
+        limiter.release()
+        await asyncio.sleep(0)
+        # One non-reserved slot: plan generation goes before background work
+        assert order == [Priority.PLAN_GENERATION]
+        for waiter in waiters:
+            waiter.cancel()
+
+    asyncio.run(scenario())
@@ -0,0 +1,84 @@
+import asyncio
+
+from services.meal_plan_jobs import InProcessJobStore, MealPlanJobQueue, SQLiteJobStore
+
+
+def test_sqlite_store_requeues_running_jobs(tmp_path):
+    async def scenario():
+        store = SQLiteJobStore(str(tmp_path / "jobs.db"))
+        queue = MealPlanJobQueue(store=store)
+
+        job = await queue.submit("household-1", {"busy_days": ["monday"]})
+        claimed = await store.claim_next()
+        assert claimed["id"] == job["id"]
+        await store.update(job["id"], {"days_completed": 3, "completed_days": ["monday", "tuesday", "wednesday"]})
+
+        # A restart finds the job still running and hands it back to the queue
+        assert await store.requeue_running() == 1
+
+        requeued = await store.get(job["id"])
+        assert requeued["status"] == "queued"
+        assert requeued["days_completed"] == 0
+        assert requeued["completed_days"] == []
+        assert requeued["weekly_context"] == {"busy_days": ["monday"]}
+
+    asyncio.run(scenario())
+
+
+def test_sqlite_job_file_has_one_owner(tmp_path):
+    async def scenario():
+        path = str(tmp_path / "jobs.db")
+        owner = SQLiteJobStore(path)
+        await owner.open()
+        try:
+            await SQLiteJobStore(path).open()
+        except RuntimeError as e:
+            assert "in use by another process" in str(e)
+        else:
+            raise AssertionError("a second owner was allowed")
+
+    asyncio.run(scenario())
+
+
+def test_worker_survives_a_store_failure(tmp_path):
+    async def scenario():
+        queue = MealPlanJobQueue(store=SQLiteJobStore(str(tmp_path / "jobs.db")), workers=1)
+        runs = []
+
+        async def failing_run(job):
+            runs.append(job["id"])
+            raise RuntimeError("database is locked")
+
+        queue._run = failing_run
+        await queue.start()
+        try:
+            await queue.submit("household-1", {})
+            await queue.submit("household-2", {})
+            for _ in range(50):
+                if len(runs) == 2:
+                    break
+                await asyncio.sleep(0.02)
+        finally:
+            await queue.stop()
+
+        assert len(runs) == 2
+
+    asyncio.run(scenario())
+
+
+def test_memory_store_forgets_finished_jobs_after_retention():
+    async def scenario():
+        store = InProcessJobStore(retention_seconds=0.05)
+        queue = MealPlanJobQueue(store=store)
+        done = await queue.submit("household-1", {})
+        waiting = await queue.submit("household-2", {})
+        await store.claim_next()
+        await store.update(done["id"], {"status": "completed"})
+
+        assert (await store.get(done["id"]))["status"] == "completed"
+        await asyncio.sleep(0.06)
+        assert await store.get(done["id"]) is None
+        # Unfinished jobs are kept however old they are
+        assert (await store.get(waiting["id"]))["status"] == "queued"
+
+    asyncio.run(scenario())
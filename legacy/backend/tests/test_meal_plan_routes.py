@@ -0,0 +1,93 @@
+import asyncio
+import json
+
+from routes import meal_plans as meal_plan_routes
+from services.deadline import DeadlineExceeded
+from services.meal_planning_service import PLAN_DAYS, MealPlanningService
+from services.repository import db
+
+
+async def _events(response):
+    return [json.loads(chunk[len("data: "):]) async for chunk in response.body_iterator]
+
+
+def test_days_stream_as_they_are_ready_then_the_final_event():
+    async def produce(on_day):
+        await on_day("monday", {"name": "M"})
+        await asyncio.sleep(0.01)
+        await on_day("tuesday", {"name": "T"})
+        return {"meal_plan_id": "plan-1"}
+
+    events = asyncio.run(_events(meal_plan_routes._stream_days(produce, "test")))
+    assert events == [
+        {"day": "monday", "meal": {"name": "M"}},
+        {"day": "tuesday", "meal": {"name": "T"}},
+        {"done": True, "meal_plan_id": "plan-1"},
+    ]
+
+
+def test_running_out_of_time_ends_the_stream_with_a_504_event():
+    async def produce(on_day):
+        await on_day("monday", {"name": "M"})
+        raise DeadlineExceeded("no budget left")
+
+    events = asyncio.run(_events(meal_plan_routes._stream_days(produce, "test")))
+    assert events[0] == {"day": "monday", "meal": {"name": "M"}}
+    assert events[-1] == {"error": "no budget left", "status": 504}
+
+
+def test_leaving_the_stream_cancels_the_generation():
+    cancelled = []
+
+    async def produce(on_day):
+        await on_day("monday", {"name": "M"})
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    async def scenario():
+        events = meal_plan_routes._stream_days(produce, "test").body_iterator
+        await events.__anext__()
+        await events.aclose()
+        await asyncio.sleep(0)
+
+    asyncio.run(scenario())
+    assert cancelled == [True]
+
+
+def test_cached_days_stream_first_and_the_plan_is_saved_complete(monkeypatch):
+    service = MealPlanningService()
+    cached_days = {"wednesday", "saturday"}
+    service._meal_slot = lambda day, household_profile, weekly_context: {
+        "meal_type": day, "cuisine": "thai", "household_profile": household_profile,
+    }
+
+    async def cached_recipe(meal_type, cuisine, household_profile, exclude=None, history=None):
+        return {"name": f"Cached {meal_type}"} if meal_type in cached_days else None
+
+    async def new_recipe(meal_type, cuisine, household_profile, exclude=None, history=None):
+        await asyncio.sleep(0.01)
+        return {"name": f"New {meal_type}"}
+
+    service.recipe_service.get_cached_recipe_for_meal_slot = cached_recipe
+    service.recipe_service.get_recipe_for_meal_slot = new_recipe
+    monkeypatch.setattr(meal_plan_routes, "meal_planning_service", service)
+
+    async def scenario():
+        household = (await db.table("household_profiles").insert({
+            "members": [{"name": "A"}], "cooking_skill": "beginner", "favorite_cuisines": ["thai"],
+        }).execute()).data[0]
+        request = meal_plan_routes.MealPlanRequest(household_id=household["id"], weekly_context={})
+        events = await _events(await meal_plan_routes.stream_meal_plan(request))
+        saved = await service.get_meal_plan(events[-1]["meal_plan_id"])
+        return events, saved
+
+    events, saved = asyncio.run(scenario())
+    streamed = [event["day"] for event in events[:-1]]
+    assert set(streamed[:2]) == cached_days
+    assert sorted(streamed) == sorted(PLAN_DAYS)
+    assert events[-1]["done"] is True
+    assert saved["meals"]["wednesday"]["name"] == "Cached wednesday"
+    assert saved["meals"]["monday"]["name"] == "New monday"
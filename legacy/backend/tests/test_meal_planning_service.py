@@ -0,0 +1,127 @@
+import asyncio
+
+import pytest
+
+from services import concurrency, meal_planning_service as planning_module
+from services.concurrency import ClientDisconnected, run_until_disconnected
+from services.meal_planning_service import PLAN_DAYS, MealPlanningService
+from services.repository import db
+from services.deadline import deadline_scope
+
+
+async def _plan(service):
+    household = (await db.table("household_profiles").insert({
+        "members": [{"name": "A"}], "cooking_skill": "beginner", "favorite_cuisines": ["thai"],
+    }).execute()).data[0]
+    meals = {day: {"id": f"old-{day}", "name": f"Old {day}"} for day in PLAN_DAYS}
+    return await service._save_meal_plan(household["id"], {}, meals)
+
+
+def _service(generation_seconds, refreshed):
+    """MealPlanningService whose recipe generation and grocery refresh are stubbed per day"""
+    service = MealPlanningService()
+    # Tag each slot with its day so the stubbed generation knows which one it serves
+    service._meal_slot = lambda day, household_profile, weekly_context: {
+        "meal_type": day, "cuisine": "thai", "household_profile": household_profile,
+    }
+
+    async def new_recipe(meal_type, cuisine, household_profile, exclude=None, history=None):
+        await asyncio.sleep(generation_seconds.get(meal_type, 0))
+        return {"id": f"new-{meal_type}", "name": f"New {meal_type}"}
+
+    async def refresh_grocery_list(meal_plan_id, meals):
+        await asyncio.sleep(0.01)
+        refreshed.append({day: meal["name"] for day, meal in meals.items()})
+        return "grocery-list"
+
+    service.recipe_service.get_recipe_for_meal_slot = new_recipe
+    service.grocery_service.refresh_grocery_list = refresh_grocery_list
+    return service
+
+
+def test_concurrent_day_swaps_keep_each_other_and_refresh_the_final_week():
+    refreshed = []
+    # Monday's generation is slower, so Tuesday's swap is written first
+    service = _service({"monday": 0.05}, refreshed)
+
+    async def scenario():
+        meal_plan_id = await _plan(service)
+        results = await asyncio.gather(
+            service.regenerate_day(meal_plan_id, "monday"),
+            service.regenerate_day(meal_plan_id, "tuesday"),
+        )
+        assert [result["grocery_list_id"] for result in results] == ["grocery-list", "grocery-list"]
+
+        meals = (await service.get_meal_plan(meal_plan_id))["meals"]
+        # Each swap re-read the plan under the lock, so neither overwrote the other
+        assert meals["monday"]["name"] == "New monday"
+        assert meals["tuesday"]["name"] == "New tuesday"
+        # The last grocery refresh saw the final week
+        assert refreshed[-1]["monday"] == "New monday"
+        assert refreshed[-1]["tuesday"] == "New tuesday"
+
+    asyncio.run(scenario())
+
+
+def test_swaps_in_different_plans_do_not_wait_on_each_other():
+    service = _service({}, [])
+
+    async def scenario():
+        busy_plan, other_plan = await _plan(service), await _plan(service)
+        async with planning_module._meals_write_lock(busy_plan):
+            result = await asyncio.wait_for(service.regenerate_day(other_plan, "friday"), timeout=1)
+        assert result["meal"]["name"] == "New friday"
+
+    asyncio.run(scenario())
+
+
+def test_days_that_miss_the_request_deadline_fall_back_and_the_week_is_saved():
+    # Monday's generation would outlast the whole request budget
+    service = _service({"monday": 5}, [])
+
+    async def no_cached_recipe(**slot):
+        return None
+
+    service.recipe_service.get_cached_recipe_for_meal_slot = no_cached_recipe
+    streamed = []
+
+    async def on_day(day, meal):
+        streamed.append(day)
+
+    async def scenario():
+        household = (await db.table("household_profiles").insert({
+            "members": [{"name": "A"}], "cooking_skill": "beginner", "favorite_cuisines": ["thai"],
+        }).execute()).data[0]
+        with deadline_scope(0.3):
+            meal_plan_id = await service.generate_meal_plan(household["id"], {}, on_day=on_day)
+        return (await service.get_meal_plan(meal_plan_id))["meals"]
+
+    meals = asyncio.run(scenario())
+    assert sorted(streamed) == sorted(PLAN_DAYS)
+    assert meals["monday"] == service._create_fallback_recipe("monday", {"members": [{"name": "A"}]})
+    assert meals["tuesday"]["name"] == "New tuesday"
+
+
+def test_disconnected_generation_never_saves_the_plan(monkeypatch):
+    monkeypatch.setattr(concurrency, "CLIENT_DISCONNECT_POLL_SECONDS", 0.01)
+    service = _service({"monday": 5}, [])
+
+    async def no_cached_recipe(**slot):
+        return None
+
+    service.recipe_service.get_cached_recipe_for_meal_slot = no_cached_recipe
+    checks = []
+
+    async def is_disconnected():
+        checks.append(1)
+        return len(checks) > 3
+
+    async def scenario():
+        household = (await db.table("household_profiles").insert({
+            "members": [{"name": "A"}], "cooking_skill": "beginner", "favorite_cuisines": ["thai"],
+        }).execute()).data[0]
+        with pytest.raises(ClientDisconnected):
+            await run_until_disconnected(service.generate_meal_plan(household["id"], {}), is_disconnected, "test")
+        return await service.get_household_meal_plans(household["id"])
+
+    assert asyncio.run(scenario()) == []
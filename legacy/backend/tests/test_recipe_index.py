@@ -0,0 +1,64 @@
+import asyncio
+
+from services import recipe_index as recipe_index_module
+from services.recipe_index import RecipeIndex
+from services.repository import db
+from services.recipe_requirements import canonicalize_requirements
+
+HOUSEHOLD = {"members": [{"name": "A"}], "max_cooking_time": 30}
+
+
+def _thai_dinner(recipe_id, requirement_key=None, times_used=0):
+    return {
+        "id": recipe_id, "name": f"Thai {recipe_id}", "cuisine": "Thai", "meal_type": "dinner",
+        "total_time": 20, "dietary_tags": [], "times_used": times_used, "requirement_key": requirement_key,
+    }
+
+
+def test_excluded_exact_hits_fall_through_to_dimension_search():
+    canonical = canonicalize_requirements("dinner", "Thai", HOUSEHOLD, 30, 2)
+    index = RecipeIndex()
+    index.add(_thai_dinner("exact", canonical.key()))
+    index.add(_thai_dinner("other"))
+
+    assert [recipe.id for recipe in index.search_requirements(canonical)] == ["exact"]
+    # The only exact hit is excluded, but a same-cuisine recipe still fits
+    assert [recipe.id for recipe in index.search_requirements(canonical, exclude_ids={"exact"})] == ["other"]
+
+
+def test_widened_search_adds_dimension_matches_after_exact_hits():
+    canonical = canonicalize_requirements("dinner", "Thai", HOUSEHOLD, 30, 2)
+    index = RecipeIndex()
+    index.add(_thai_dinner("exact", canonical.key()))
+    index.add(_thai_dinner("popular", times_used=5))
+    index.add(_thai_dinner("other"))
+
+    pool = [recipe.id for recipe in index.search_requirements(canonical, widen=True)]
+    assert pool == ["exact", "popular", "other"]
+    assert [recipe.id for recipe in index.search_requirements(canonical, limit=1, widen=True)] == ["exact"]
+
+
+def test_refresh_pages_through_rows_sharing_one_timestamp(monkeypatch):
+    monkeypatch.setattr(recipe_index_module, "RECIPE_INDEX_PAGE_SIZE", 3)
+    stamp = "2030-01-01T00:00:00+00:00"
+
+    def rows(prefix, count):
+        return [
+            {"id": f"{prefix}-{i}", "name": f"Batch {prefix} {i}", "meal_type": "dinner",
+             "ingredients": ["x"], "instructions": ["y"], "updated_at": stamp}
+            for i in range(count)
+        ]
+
+    async def scenario():
+        index = RecipeIndex()
+        # A bulk write: more than a page of rows with the very same updated_at
+        await db.table("recipes").insert(rows("bulk", 7)).execute()
+        await index.refresh()
+        assert all(index.get(f"bulk-{i}") for i in range(7))
+
+        # A later write that lands on the same timestamp is still picked up
+        await db.table("recipes").insert(rows("late", 2)).execute()
+        await index.refresh()
+        assert all(index.get(f"late-{i}") for i in range(2))
+
+    asyncio.run(scenario())
@@ -0,0 +1,75 @@
+import asyncio
+
+from scripts.backfill_recipe_requirements import backfill
+from services.recipe_requirements import (
+    TIME_BUCKETS,
+    canonical_recipe_fields,
+    canonicalize_requirements,
+    dislike_terms,
+    requirement_key_for_recipe,
+    servings_bucket,
+    time_bucket,
+)
+from services.repository import db
+
+
+def test_backfill_applies_the_alias_tables_and_fills_requirement_keys():
+    async def scenario():
+        inserted = (await db.table("recipes").insert({
+            "name": "Old Tacos", "cuisine": "Tex-Mex", "meal_type": "dinner", "prep_time": 10, "cook_time": 15,
+            "servings": 4, "dietary_tags": ["GF", "Lactose Free"], "ingredients": ["x"], "instructions": ["y"],
+        }).execute()).data[0]
+
+        assert await backfill() >= 1
+        row = (await db.table("recipes").select("*").eq("id", inserted["id"]).execute()).data[0]
+        assert row["cuisine"] == "mexican"
+        assert row["dietary_tags"] == ["dairy_free", "gluten_free"]
+        assert row["requirement_key"] == "dinner|mexican|dairy_free+gluten_free|t30|s4"
+        # A second run has nothing left to do for this row
+        assert canonical_recipe_fields(row) == {}
+
+    asyncio.run(scenario())
+
+
+def test_existing_requirement_keys_are_kept():
+    row = {"cuisine": "thai", "dietary_tags": [], "requirement_key": "dinner|thai|none|t20|s2"}
+    assert canonical_recipe_fields(row) == {}
+    assert requirement_key_for_recipe({"cuisine": "Thai", "prep_time": 5, "cook_time": 10}) == "dinner|thai|none|t15|s4"
+
+
+def test_time_limits_round_down_to_a_bucket():
+    assert time_bucket(None) == TIME_BUCKETS[-1]
+    assert time_bucket(15) == 15
+    assert time_bucket(29) == 20
+    assert time_bucket(30) == 30
+    assert time_bucket(500) == 120
+
+
+def test_time_limits_below_the_smallest_bucket_keep_their_own_key():
+    assert time_bucket(10) == 10
+    canonical = canonicalize_requirements("dinner", "thai", {}, 10, 2)
+    assert canonical.key() == "dinner|thai|none|t10|s2"
+
+
+def test_servings_round_up_to_a_bucket():
+    assert servings_bucket(1) == 2
+    assert servings_bucket(5) == 6
+    assert servings_bucket(40) == 12
+
+
+def test_aliases_share_one_key():
+    vegan_household = {"members": [{"dietary_restrictions": ["Plant-Based", "GF"]}]}
+    assert (
+        canonicalize_requirements("Dinner", "Tex-Mex", vegan_household, 30, 4).key()
+        == canonicalize_requirements("dinner", "mexican", {"members": [{"dietary_restrictions": ["vegan", "gluten_free"]}]}, 30, 4).key()
+        == "dinner|mexican|gluten_free+vegan|t30|s4"
+    )
+
+
+def test_soft_preferences_become_dislikes_with_expansions():
+    household = {"dislikes": ["No mushrooms"], "members": [{"dietary_restrictions": ["seafood"]}]}
+    canonical = canonicalize_requirements("dinner", None, household, 30, 4)
+    assert canonical.restrictions == ()
+    assert canonical.dislikes == ("mushroom", "seafood")
+    assert "shrimp" in dislike_terms(canonical.dislikes)
+    assert "portobello" in dislike_terms(canonical.dislikes)
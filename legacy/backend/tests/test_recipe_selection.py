@@ -0,0 +1,61 @@
+import random
+
+import pytest
+
+from services import recipe_selection
+from services.recipe_selection import select_diverse, similarity
+
+
+def _recipe(recipe_id, protein="chicken", cuisine="Thai", ingredients=("rice", "basil")):
+    return {"id": recipe_id, "primary_protein": protein, "cuisine": cuisine, "main_ingredients": list(ingredients)}
+
+
+@pytest.fixture
+def deterministic(monkeypatch):
+    monkeypatch.setattr(recipe_selection, "RECIPE_SELECTION_TEMPERATURE", 0.0)
+    monkeypatch.setattr(recipe_selection, "RECIPE_SELECTION_LAMBDA", 0.6)
+    monkeypatch.setattr(recipe_selection, "RECIPE_SELECTION_HISTORY_WEIGHT", 0.5)
+
+
+def test_similarity_weighs_protein_cuisine_and_shared_ingredients():
+    profile = recipe_selection._features
+    assert similarity(profile(_recipe("a")), profile(_recipe("a", protein="tofu"))) == 1.0
+    assert similarity(profile(_recipe("a")), profile(_recipe("b"))) == pytest.approx(1.0)
+    assert similarity(profile(_recipe("a")), profile(_recipe("b", ingredients=("rice", "lime")))) == pytest.approx(0.8)
+    assert similarity(profile(_recipe("a")), profile(_recipe("b", "beef", "Mexican", ("beans",)))) == 0.0
+
+
+def test_without_context_the_most_popular_match_wins(deterministic):
+    candidates = [_recipe("popular"), _recipe("other", "beef", "Mexican")]
+    assert select_diverse(candidates)["id"] == "popular"
+    assert select_diverse([]) is None
+
+
+def test_a_near_copy_of_this_weeks_recipe_loses_to_a_different_dish(deterministic):
+    candidates = [_recipe("popular"), _recipe("different", "beef", "Mexican", ("beans",))]
+    week = [_recipe("monday")]
+    assert select_diverse(candidates, week=week)["id"] == "different"
+
+
+def test_history_counts_less_than_the_week_unless_it_is_the_same_recipe(deterministic):
+    candidates = [_recipe("popular"), _recipe("different", "beef", "Mexican", ("beans",))]
+    # A look-alike from a past plan is only a weak reason to skip the favourite
+    assert select_diverse(candidates, history=[_recipe("last-month")])["id"] == "popular"
+    # Serving the very same recipe again counts in full
+    assert select_diverse(candidates, history=[_recipe("popular")])["id"] == "different"
+
+
+def test_only_the_top_candidates_are_considered(deterministic, monkeypatch):
+    monkeypatch.setattr(recipe_selection, "RECIPE_SELECTION_TOP_K", 2)
+    candidates = [_recipe("a"), _recipe("b"), _recipe("fresh", "beef", "Mexican", ("beans",))]
+    assert select_diverse(candidates, week=[_recipe("monday")])["id"] in {"a", "b"}
+
+
+def test_sampling_favours_the_best_score_but_varies(monkeypatch):
+    monkeypatch.setattr(recipe_selection, "RECIPE_SELECTION_TEMPERATURE", 0.1)
+    candidates = [_recipe("first"), _recipe("second", "beef"), _recipe("third", "pork")]
+    rng = random.Random(7)
+
+    picks = [select_diverse(candidates, rng=rng)["id"] for _ in range(300)]
+
+    assert picks.count("first") > picks.count("second") > picks.count("third") > 0
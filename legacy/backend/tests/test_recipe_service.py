@@ -0,0 +1,109 @@
+import asyncio
+
+from services.meal_planning_service import PLAN_DAYS, MealPlanningService
+from services.recipe_requirements import TIME_BUCKETS
+from services.recipe_service import RecipeService
+from services.repository import db
+
+HOUSEHOLD = {
+    "members": [{"name": "A", "dietary_restrictions": ["vegetarian"]}],
+    "dislikes": ["mushrooms"],
+    "max_cooking_time": 20,
+}
+
+
+def _summary(recipe_id):
+    return {"id": recipe_id, "cuisine": "italian", "primary_protein": "tofu", "main_ingredients": [recipe_id]}
+
+
+def _library(service, fits):
+    """Stub the library search: `fits(canonical, exclude_ids)` decides whether anything matches"""
+    searches = []
+
+    async def find_cached_recipes(canonical, limit=5, exclude_ids=(), widen=False):
+        searches.append((canonical, set(exclude_ids)))
+        return [_summary("found")] if fits(canonical, set(exclude_ids)) else []
+
+    service.find_cached_recipes = find_cached_recipes
+    return searches
+
+
+def test_library_lookup_relaxes_soft_constraints_in_order_and_never_restrictions():
+    service = RecipeService()
+    searches = _library(service, lambda canonical, skip: not canonical.dislikes)
+
+    summary, relaxed = asyncio.run(service.find_library_recipe(
+        "dinner", "Thai", HOUSEHOLD, week=[_summary("week-1")], recent=[_summary("recent-1")],
+    ))
+
+    assert summary["id"] == "found"
+    assert relaxed == ["cuisine", "recent", "time", "dislikes"]
+    first, *_, last = [canonical for canonical, _ in searches]
+    assert first.cuisine == "thai" and first.max_time == 20 and first.dislikes
+    assert last.cuisine is None and last.max_time == TIME_BUCKETS[-1] and not last.dislikes
+    assert all(canonical.restrictions == ("vegetarian",) for canonical, _ in searches)
+    # Recent recipes are skipped until "recent" is relaxed; the week's never are
+    assert [skip for _, skip in searches] == [
+        {"week-1", "recent-1"}, {"week-1", "recent-1"}, {"week-1"}, {"week-1"}, {"week-1"},
+    ]
+
+
+def test_library_lookup_stops_at_the_first_relaxation_that_fits():
+    service = RecipeService()
+    searches = _library(service, lambda canonical, skip: canonical.cuisine is None)
+
+    summary, relaxed = asyncio.run(service.find_library_recipe("dinner", "Thai", HOUSEHOLD))
+
+    assert summary["id"] == "found"
+    assert relaxed == ["cuisine"]
+    assert len(searches) == 2
+
+
+def test_library_lookup_skips_relaxations_that_change_nothing():
+    service = RecipeService()
+    _library(service, lambda canonical, skip: False)
+    household = {"members": [{"name": "A"}], "max_cooking_time": TIME_BUCKETS[-1]}
+
+    summary, relaxed = asyncio.run(service.find_library_recipe("dinner", "Thai", household))
+
+    assert summary is None
+    # No recent recipes, no time limit below the largest bucket, no dislikes
+    assert relaxed == ["cuisine"]
+
+
+def test_instant_plan_uses_each_library_recipe_once_and_falls_back_when_the_library_runs_dry():
+    service = MealPlanningService()
+    library = [f"recipe-{i}" for i in range(5)]
+    weeks = []
+
+    async def find_library_recipe(meal_type, cuisine, household_profile, special_requirements=None, week=None, recent=None):
+        weeks.append([recipe["id"] for recipe in week])
+        unused = [recipe_id for recipe_id in library if recipe_id not in weeks[-1]]
+        return (_summary(unused[0]), ["cuisine"] if len(weeks) > 3 else []) if unused else (None, ["cuisine", "time"])
+
+    async def load_recipe(recipe_id):
+        return {"id": recipe_id, "name": recipe_id}
+
+    service.recipe_service.find_library_recipe = find_library_recipe
+    service.recipe_service.load_recipe = load_recipe
+    streamed = []
+
+    async def on_day(day, meal):
+        streamed.append(day)
+
+    async def scenario():
+        household = (await db.table("household_profiles").insert({
+            "members": [{"name": "A"}], "cooking_skill": "beginner", "favorite_cuisines": ["thai"],
+        }).execute()).data[0]
+        result = await service.assemble_instant_meal_plan(household["id"], {}, on_day=on_day)
+        return result, (await service.get_meal_plan(result["meal_plan_id"]))["meals"]
+
+    result, meals = asyncio.run(scenario())
+    assert [meals[day]["id"] for day in PLAN_DAYS[:5]] == library
+    assert weeks[-1] == library
+    assert streamed == list(PLAN_DAYS)
+    # The days past the library get the fallback; only relaxed days are upgradable
+    assert result["relaxed"][PLAN_DAYS[5]] == ["library"]
+    assert result["relaxed"][PLAN_DAYS[3]] == ["cuisine"]
+    assert PLAN_DAYS[0] not in result["relaxed"]
+    assert result["upgradable_days"] == list(PLAN_DAYS[3:])
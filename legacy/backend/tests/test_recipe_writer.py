@@ -0,0 +1,16 @@
+from services import recipe_writer as writer_module
+from services.recipe_index import recipe_index
+from services.recipe_writer import RecipeWriter
+
+
+def test_dropped_row_leaves_the_recipe_index(monkeypatch):
+    monkeypatch.setattr(writer_module, "RECIPE_WRITE_MAX_ATTEMPTS", 1)
+    row = {"id": "never-saved", "name": "Soup", "cuisine": "thai", "meal_type": "dinner", "total_time": 20}
+    recipe_index.add(row)
+    writer = RecipeWriter()
+
+    # The batch holding the row failed on its last attempt
+    writer._requeue([row])
+
+    assert recipe_index.get("never-saved") is None
+    assert writer.pending("never-saved") is None
@@ -0,0 +1,24 @@
+import asyncio
+import uuid
+
+from services.repository import db
+from services.session_cache import SessionCache
+
+
+def test_turns_from_another_worker_invalidate_the_cached_session():
+    async def scenario():
+        session_id = str(uuid.uuid4())
+        result = await db.table("chat_sessions").insert({"id": session_id, "session_type": "onboarding"}).execute()
+        first, second = SessionCache(), SessionCache()  # two workers, no sticky sessions
+        first.remember(result.data[0])
+
+        entry = await second.load(session_id)
+        second.record_turn(entry, [{"role": "user", "content": "hi"}, {"role": "assistant", "content": "hello"}], {})
+        await second.flush(session_id)
+
+        # The first worker's copy predates that turn, so it is read back from the database
+        reloaded = await first.load(session_id)
+        assert [message["content"] for message in reloaded.recent] == ["hi", "hello"]
+        assert reloaded.persisted_count == 2
+
+    asyncio.run(scenario())
@@ -0,0 +1,25 @@
+import asyncio
+
+from services.single_flight import SingleFlight
+
+
+def test_abandoned_call_is_not_joined_by_a_new_caller():
+    flight = SingleFlight("test")
+    started = []
+
+    async def work():
+        started.append(len(started))
+        await asyncio.sleep(0.05)
+        return len(started)
+
+    async def scenario():
+        first = asyncio.create_task(flight.do("key", work))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        assert flight.in_flight() == 0
+
+        # Arrives before the abandoned task has finished cancelling
+        assert await flight.do("key", work) == 2
+
+    asyncio.run(scenario())
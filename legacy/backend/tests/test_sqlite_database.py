@@ -0,0 +1,24 @@
+import asyncio
+
+import pytest
+
+from services.recipe_service import RecipeService
+from services.repository import db
+
+
+def test_increment_rpc_counts_recipe_usage():
+    async def scenario():
+        recipes = RecipeService()
+        recipe_id = await recipes.save_recipe_to_database({
+            "name": "Soup", "cuisine": "thai", "meal_type": "dinner",
+            "ingredients": ["water"], "instructions": ["boil"],
+        })
+        await recipes.increment_recipe_usage(recipe_id)
+        assert (await db.rpc("increment", {"row_id": recipe_id}).execute()).data == 2
+
+    asyncio.run(scenario())
+
+
+def test_unknown_rpc_fails_when_built():
+    with pytest.raises(ValueError, match="Unknown function: exec_sql"):
+        db.client.rpc("exec_sql", {"query": "select 1"})
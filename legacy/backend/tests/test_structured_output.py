@@ -0,0 +1,67 @@
+import asyncio
+
+import pytest
+
+from services import llm_gateway
+from services.llm_cache import EXTRACTION_CACHE, response_cache
+from services.structured_output import (
+    OutputSchema,
+    StructuredOutputError,
+    request_structured,
+)
+
+
+class _FakeResponse:
+    def __init__(self, content):
+        self._content = content
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return {"message": {"content": self._content}}
+
+
+class _FakeClient:
+    def __init__(self, contents):
+        self.contents = list(contents)
+
+    async def post(self, path, json):
+        return _FakeResponse(self.contents.pop(0))
+
+
+def test_unusable_response_is_not_served_from_cache(monkeypatch):
+    client = _FakeClient(["not json at all", '{"name": "Soup"}'])
+    monkeypatch.setattr(llm_gateway, "get_gateway_client", lambda: client)
+    schema = OutputSchema("cached_name", {"name": (str,)})
+    messages = [{"role": "user", "content": "name a dish"}]
+
+    async def scenario():
+        response_cache.clear()
+        with pytest.raises(StructuredOutputError):
+            await request_structured(messages, schema, temperature=0.1, cache=EXTRACTION_CACHE)
+        # The retry reaches the gateway instead of replaying the bad response
+        assert await request_structured(messages, schema, temperature=0.1, cache=EXTRACTION_CACHE) == {"name": "Soup"}
+
+    asyncio.run(scenario())
+
+
+def test_recipe_generation_is_never_served_from_the_response_cache(monkeypatch):
+    from services.recipe_service import RecipeService
+
+    client = _FakeClient([
+        '{"name": "Green Curry", "ingredients": ["curry paste"], "instructions": ["simmer"]}',
+        '{"name": "Pad Thai", "ingredients": ["noodles"], "instructions": ["fry"]}',
+    ])
+    monkeypatch.setattr(llm_gateway, "get_gateway_client", lambda: client)
+    requirements = {"meal_type": "dinner", "cuisine": "thai"}
+
+    async def scenario():
+        response_cache.clear()
+        recipes = RecipeService()
+        first = await recipes.develop_recipe(requirements, {})
+        # Same prompt again (e.g. regenerating a day): a fresh dish, not a replay
+        second = await recipes.develop_recipe(requirements, {})
+        assert (first["name"], second["name"]) == ("Green Curry", "Pad Thai")
+
+    asyncio.run(scenario())
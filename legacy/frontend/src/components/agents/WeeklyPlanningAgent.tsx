@@ -69,7 +69,7 @@ export default function WeeklyPlanningAgent({
           { role: 'assistant' as const, content: data.message }
         ]
         console.log('📋 Full chat history for meal plan generation:', fullChatHistory.length, 'messages')
-        generateMealPlanMutation.mutate(fullChatHistory)
+        generateMealPlanMutation.mutate({ chatHistory: fullChatHistory, weeklyConstraints: data.extracted_data })
       }
     },
     onError: (error) => {
@@ -86,7 +86,7 @@ export default function WeeklyPlanningAgent({
 
   // Generate meal plan mutation using three-agent workflow
   const generateMealPlanMutation = useMutation({
-    mutationFn: async (chatHistory: any) => {
+    mutationFn: async ({ chatHistory, weeklyConstraints }: { chatHistory: any; weeklyConstraints?: any }) => {
       console.log('🍳 Starting meal plan generation...')
       setIsGeneratingMealPlan(true)
 
@@ -95,7 +95,7 @@ export default function WeeklyPlanningAgent({
       console.log('✅ Household profile fetched:', householdProfile)
 
       // Step 2: Use three-agent workflow to generate comprehensive meal plan
-      const generateResult = await MealPlanAPI.generateComprehensiveMealPlan(householdId, chatHistory, householdProfile)
+      const generateResult = await MealPlanAPI.generateComprehensiveMealPlan(householdId, chatHistory, householdProfile, weeklyConstraints)
       console.log('✅ Comprehensive meal plan generated:', generateResult)
 
       return generateResult
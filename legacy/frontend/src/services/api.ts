@@ -54,18 +54,33 @@ export class MealPlanAPI {
 
   // Meal plan endpoints
   static async generateMealPlan(householdId: string, weeklyContext: any): Promise<{ meal_plan_id: string }> {
+    // Generation runs as a background job; poll until it finishes
     const response = await api.post('/meal-plans/generate', {
       household_id: householdId,
       weekly_context: weeklyContext
     })
+    let job = response.data
+    while (job.status === 'queued' || job.status === 'running') {
+      await new Promise(resolve => setTimeout(resolve, 2000))
+      job = await MealPlanAPI.getMealPlanJob(job.job_id)
+    }
+    if (job.status !== 'completed') {
+      throw new Error(job.error || 'Meal plan generation failed')
+    }
+    return { meal_plan_id: job.meal_plan_id }
+  }
+
+  static async getMealPlanJob(jobId: string) {
+    const response = await api.get(`/meal-plans/jobs/${jobId}`)
     return response.data
   }
 
-  static async generateComprehensiveMealPlan(householdId: string, chatHistory: any[], householdProfile: any) {
+  static async generateComprehensiveMealPlan(householdId: string, chatHistory: any[], householdProfile: any, weeklyConstraints?: any) {
     const response = await api.post('/meal-plans/generate-comprehensive', {
       household_id: householdId,
       chat_history: chatHistory,
-      household_profile: householdProfile
+      household_profile: householdProfile,
+      weekly_constraints: weeklyConstraints ?? null
     })
     return response.data
   }